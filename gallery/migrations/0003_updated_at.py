@@ -0,0 +1,34 @@
+# Generated by Django 3.1.8 on 2026-10-18 20:26
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Images are not modified after the upload, and the best guess for an album is the upload of its newest image
+    Image = apps.get_model('gallery', 'Image')
+    Album = apps.get_model('gallery', 'Album')
+    Image.objects.update(updated_at=F('date_uploaded'))
+    for album in Album.objects.annotate(newest_image=Max('images__date_uploaded')).filter(newest_image__isnull=False):
+        Album.objects.filter(pk=album.pk).update(updated_at=album.newest_image)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0002_auto_20200329_1759'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,7 @@ import pytz
 from django.db import models
 from django.utils import timezone
 from django.utils.text import slugify
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_delete, m2m_changed
 from django.dispatch.dispatcher import receiver
 from django.urls import reverse
 from django.utils.functional import cached_property
@@ -51,6 +51,7 @@ class Image(models.Model):
                                   format='JPEG',
                                   options={'quality': settings.GALLERY_RESIZE_QUALITY})
     date_uploaded = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     # Cached EXIF data
     title = models.CharField(max_length=256)
@@ -154,6 +155,7 @@ class Album(models.Model):
                                      on_delete=models.SET_NULL,
                                      )
     order = models.PositiveIntegerField(default=0, blank=False, null=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta(object):
         ordering = ['order', '-pk']
@@ -178,3 +180,23 @@ class Album(models.Model):
 
     def __str__(self):
         return self.title
+
+
+@receiver(m2m_changed, sender=Album.images.through)
+def touch_album_images(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """ Adding or removing images changes the pages of both the albums and the images """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if pk_set is None:
+        related = instance.image_albums.all() if reverse else instance.images.all()
+    else:
+        related = model.objects.filter(pk__in=pk_set)
+    now = timezone.now()
+    type(instance).objects.filter(pk=instance.pk).update(updated_at=now)
+    related.update(updated_at=now)
+
+
+@receiver(pre_delete, sender=Image)
+def touch_albums_of_deleted_image(sender, instance, **kwargs):
+    """ The images are removed from the albums without sending m2m_changed """
+    instance.image_albums.update(updated_at=timezone.now())
@@ -24,3 +24,5 @@ GALLERY_HDPI_FACTOR = getattr(settings, 'GALLERY_HDPI_FACTOR', 2)
 GALLERY_IMAGE_MARGIN = getattr(settings, 'GALLERY_IMAGE_MARGIN', 6.0)
 # CSS Color Styling
 GALLERY_THEME_COLOR = getattr(settings, 'GALLERY_THEME_COLOR', "black")
+# Seconds for which browsers may reuse the pages shown to anonymous users without revalidating them
+GALLERY_CACHE_MAX_AGE = getattr(settings, 'GALLERY_CACHE_MAX_AGE', 60)
@@ -111,6 +111,36 @@ class ImageTests(TestCase):
         self.assertEqual(response.status_code, 200, "Error testing album view")
         self.assertContains(response, self.image.title, count=2, msg_prefix="Error testing image in album view")
 
+    # Test conditional requests of the album and image pages
+    def test_conditional_get(self):
+
+        album_url = reverse('gallery:album_detail', kwargs={'pk': self.album.pk, 'slug': self.album.title})
+        image_url = reverse('gallery:album_image_detail',
+                            kwargs={'pk': self.image.pk, 'slug': self.image.title, 'apk': self.album.pk})
+        # The first visit gives the browser a CSRF token, the pages can be revalidated afterwards
+        self.assertFalse(self.client.get(album_url).has_header('ETag'))
+        album_response = self.client.get(album_url)
+        image_response = self.client.get(image_url)
+        self.assertIn('private', album_response['Cache-Control'])
+        for url, response in ((album_url, album_response), (image_url, image_response)):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            self.assertFalse(response.has_header('Last-Modified'))
+
+        # Removing an image changes both the album and the remaining images
+        self.album.images.remove(self.images[1])
+        for url, response in ((album_url, album_response), (image_url, image_response)):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+        # The page of a logged in user differs (e.g. the upload links of admins)
+        album_response = self.client.get(album_url)
+        self.client.login(username=self.username, password=self.password)
+        self.assertEqual(self.client.get(album_url, HTTP_IF_NONE_MATCH=album_response['ETag']).status_code, 200)
+        response = self.client.get(album_url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(album_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.album.images.clear()
+        self.assertEqual(self.client.get(album_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
     def test_image_properties(self):
 
         image = Image.objects.all()[0]
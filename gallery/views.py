@@ -1,4 +1,9 @@
+import hashlib
+
+from django.db.models import Count, Max
 from django.http.response import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views.generic import DetailView, ListView, FormView
 from django.urls import reverse
 from django.contrib import messages
@@ -27,9 +32,64 @@ class GallerySettingsMixin(object):
         return context
 
 
-class ImageView(GallerySettingsMixin, DetailView):
+class ConditionalDetailMixin(object):
+    """ Respond with 304 Not Modified if the client already has the current version of the page """
+
+    def get_validators(self):
+        """ Return the ETag and the modification time of the page, or None if it has to be rendered anyway """
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        # One-time messages are shown on the page, and visitors without a CSRF token get a new one
+        if len(messages.get_messages(request)) or 'CSRF_COOKIE' not in request.META:
+            validators = None
+        else:
+            validators = self.get_validators()
+        if validators is None:
+            context = self.get_context_data(object=self.object)
+            return self.render_to_response(context)
+
+        # The page contains the CSRF token, and the upload links depend on the permissions of the user. The token isn't
+        # reflected in the modification time, so only the ETag is used.
+        etag_parts = [validators[0], validators[1].timestamp(), request.user.pk,
+                      request.user.has_perm('gallery.add_image'), request.META['CSRF_COOKIE']]
+        etag = quote_etag(hashlib.sha1(repr(etag_parts).encode('utf-8')).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            context = self.get_context_data(object=self.object)
+            response = self.render_to_response(context)
+        response['ETag'] = etag
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            # Not public, the page contains the CSRF token of the visitor
+            patch_cache_control(response, private=True, max_age=settings.GALLERY_CACHE_MAX_AGE)
+        return response
+
+
+def album_images_validators(album):
+    """ The number of images in the album and the last time the album or any of them changed """
+    images = album.images.aggregate(count=Count('pk'), updated_at=Max('updated_at'))
+    return images['count'], max(album.updated_at, images['updated_at'] or album.updated_at)
+
+
+class ImageView(ConditionalDetailMixin, GallerySettingsMixin, DetailView):
     model = Image
 
+    def get_validators(self):
+        if self.kwargs.get('apk'):
+            album = Album.objects.filter(pk=self.kwargs['apk']).first()
+            if album is None:
+                return None
+            count, last_modified = album_images_validators(album)
+        else:
+            albums = self.object.image_albums.aggregate(count=Count('pk'), updated_at=Max('updated_at'))
+            count, last_modified = albums['count'], albums['updated_at'] or self.object.updated_at
+        last_modified = max(self.object.updated_at, last_modified)
+        etag = '{}-{}-{}-{}'.format(self.object.pk, self.kwargs.get('apk'), count, last_modified.timestamp())
+        return etag, last_modified
+
     def get_context_data(self, **kwargs):
         context = super(ImageView, self).get_context_data(**kwargs)
         context['album_images'] = []
@@ -99,9 +159,16 @@ class ImageCreate(GallerySettingsMixin, PermissionRequiredMixin, FormView):
         #    return response
 
 
-class AlbumView(GallerySettingsMixin, DetailView):
+class AlbumView(ConditionalDetailMixin, GallerySettingsMixin, DetailView):
     model = Album
 
+    def get_validators(self):
+        count, last_modified = album_images_validators(self.object)
+        # Empty albums show a placeholder to the users who can upload images
+        can_upload = self.request.user.has_perm('gallery.add_image')
+        etag = '{}-{}-{}-{}'.format(self.object.pk, count, can_upload, last_modified.timestamp())
+        return etag, last_modified
+
     def get_queryset(self):
         album = super(AlbumView, self).get_queryset()
         return album
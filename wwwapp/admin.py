@@ -7,10 +7,12 @@ from django.contrib.auth.models import User
 from django.db.models.base import Model
 from django.forms.models import BaseInlineFormSet
 from django.http.request import HttpRequest
+from django.utils import timezone
 
 from .models import Article, UserProfile, ArticleContentHistory, \
     WorkshopCategory, Workshop, WorkshopType, WorkshopParticipant, \
-    WorkshopUserProfile, ResourceYearPermission, Camp, Solution, SolutionFile
+    WorkshopUserProfile, ResourceYearPermission, Camp, Solution, SolutionFile, QueuedMail, QueuedMailRecipient, \
+    invalidate_participation, invalidate_program_of_year, invalidate_link_list
 
 admin.site.unregister(User)
 
@@ -54,20 +56,30 @@ admin.site.register(UserProfile, UserProfileAdmin)
 
 
 class WorkshopAdmin(admin.ModelAdmin):
+    @staticmethod
+    def set_status(queryset, status):
+        # QuerySet.update() neither sends the signals nor sets the auto_now fields
+        year_ids = set(queryset.values_list('year_id', flat=True))
+        queryset.update(status=status, updated_at=timezone.now())
+        invalidate_participation(Workshop)
+        invalidate_link_list(Workshop)
+        for year_id in year_ids:
+            invalidate_program_of_year(year_id)
+
     def make_acccepted(self, _request, queryset):
-        queryset.update(status='Z')
+        self.set_status(queryset, 'Z')
     make_acccepted.short_description = "Zmień status na Zaakceptowane"
 
     def make_refused(self, _request, queryset):
-        queryset.update(status='O')
+        self.set_status(queryset, 'O')
     make_refused.short_description = "Zmień status na Odrzucone"
 
     def make_cancelled(self, _request, queryset):
-        queryset.update(status='X')
+        self.set_status(queryset, 'X')
     make_cancelled.short_description = "Zmień status na Odwołane"
 
     def make_clear(self, _request, queryset):
-        queryset.update(status=None)
+        self.set_status(queryset, None)
     make_clear.short_description = "Zmień status na Null"
 
     actions = [make_acccepted, make_refused, make_cancelled, make_clear]
@@ -191,3 +203,23 @@ admin.site.register(WorkshopUserProfile)
 admin.site.register(Solution, SolutionAdmin)
 
 admin.site.register(ResourceYearPermission)
+
+
+class QueuedMailRecipientInline(admin.TabularInline):
+    model = QueuedMailRecipient
+    fields = ('email', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'last_error')
+    readonly_fields = ('email', 'attempts', 'sent_at', 'last_error')
+    extra = 0
+
+    def has_add_permission(self, request: HttpRequest, obj: Optional[Model] = ...) -> bool:
+        return False
+
+
+class QueuedMailAdmin(admin.ModelAdmin):
+    model = QueuedMail
+    inlines = [QueuedMailRecipientInline]
+    list_display = ('subject', 'recipients_description', 'created_by', 'created_at')
+    readonly_fields = ('created_by', 'created_at')
+
+
+admin.site.register(QueuedMail, QueuedMailAdmin)
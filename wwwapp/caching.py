@@ -0,0 +1,30 @@
+import uuid
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def get_generation(name: str) -> str:
+    """
+    Returns the current generation token for a group of cached values. All keys
+    that depend on the group should include this token, so that bumping the
+    generation invalidates all of them at once in every worker process.
+    """
+    return cache.get_or_set('generation:' + name, lambda: uuid.uuid4().hex, None)
+
+
+def bump_generation(name: str) -> None:
+    cache.set('generation:' + name, uuid.uuid4().hex, None)
+
+
+def cached(key: str, compute: Callable[[], Any], timeout: Optional[int] = None) -> Any:
+    """
+    Returns the value stored under key, computing and storing it if it's missing.
+    Values are kept for at most CACHE_SAFETY_TIMEOUT seconds, which limits the
+    damage if a change is made in a way that does not fire model signals
+    (e.g. QuerySet.update()).
+    """
+    if timeout is None:
+        timeout = settings.CACHE_SAFETY_TIMEOUT
+    return cache.get_or_set(key, compute, timeout)
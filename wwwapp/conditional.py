@@ -0,0 +1,93 @@
+import datetime
+import hashlib
+from functools import wraps
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib import messages
+from django.http import HttpRequest
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .caching import get_generation
+from .models import NAVIGATION_GENERATION, PERMISSIONS_GENERATION, RESOURCE_PERMISSIONS_GENERATION, \
+    PARTICIPATION_GENERATION
+
+"""
+Conditional GET support for the public pages. A view decorated with conditional_page computes the validators of the
+page (an ETag and, where possible, the modification time) with a few cheap queries before doing any of the real work,
+and responds with 304 Not Modified if the client already has the current version. The validators of the pages of
+wwwapp are built with page_validators, which adds the parts shared by all pages (the navigation, the CSRF token and,
+for logged in users, everything about the user that is shown on every page).
+"""
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime.datetime]
+
+
+def page_validators(request: HttpRequest, etag_parts: Iterable,
+                    generations: Iterable[str] = ()) -> Optional[Validators]:
+    """
+    Validators of a page rendered with base.html. Every such page contains the CSRF token of the visitor, which isn't
+    reflected in any modification time, so only the ETag is sent.
+    :param etag_parts: values that together determine the content of the page, apart from the generations
+    :param generations: names of the cache generations that are bumped when the content of the page changes
+    :return: None if the page can't be validated, because it shows one-time messages or the visitor doesn't have
+        a CSRF token yet (a new one is made while rendering)
+    """
+    if len(messages.get_messages(request)) > 0:
+        return None
+    # The token changes on login, and a page with the old one would fail every form submission
+    csrf_secret = request.META.get('CSRF_COOKIE')
+    if csrf_secret is None:
+        return None
+
+    generations = [NAVIGATION_GENERATION] + list(generations)
+    etag_parts = list(etag_parts) + [get_generation(name) for name in generations] + [csrf_secret]
+    if request.user.is_authenticated:
+        # The menu depends on the permissions and the participation of the user
+        etag_parts += [request.user.pk] + [get_generation(name) for name in (
+            PERMISSIONS_GENERATION, RESOURCE_PERMISSIONS_GENERATION, PARTICIPATION_GENERATION)]
+
+    etag = hashlib.sha1(repr(etag_parts).encode('utf-8')).hexdigest()
+    return Validators(etag, None)
+
+
+def conditional_page(validators_func: Callable[..., Optional[Validators]]):
+    """
+    Decorator for the views that support conditional requests. validators_func is called with the arguments of the
+    view and returns the Validators of the page, or None if the page should always be rendered (in particular when
+    the view would respond with an error).
+
+    The pages contain the CSRF token of the visitor, so only the browser may keep them. Pages for anonymous users may
+    be reused for PAGE_CACHE_MAX_AGE seconds, pages of logged in users have to be revalidated every time.
+    """
+    def get_validators(request, *args, **kwargs) -> Optional[Validators]:
+        if not hasattr(request, '_page_validators'):
+            request._page_validators = validators_func(request, *args, **kwargs)
+        return request._page_validators
+
+    def etag_func(request, *args, **kwargs) -> Optional[str]:
+        validators = get_validators(request, *args, **kwargs)
+        return validators.etag if validators else None
+
+    def last_modified_func(request, *args, **kwargs) -> Optional[datetime.datetime]:
+        validators = get_validators(request, *args, **kwargs)
+        return validators.last_modified if validators else None
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if get_validators(request, *args, **kwargs) is not None and response.status_code in (200, 304):
+                if request.user.is_authenticated:
+                    patch_cache_control(response, private=True, no_cache=True)
+                else:
+                    patch_cache_control(response, private=True, max_age=settings.PAGE_CACHE_MAX_AGE)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,92 @@
+import functools
+import operator
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Union
+
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import BaseExpression
+from django.http import HttpRequest, JsonResponse, HttpResponseBadRequest, HttpResponse
+
+"""
+Server-side processing for DataTables (https://datatables.net/manual/server-side).
+Filtering, ordering and paging is done by the database, only the rows on the current page are rendered.
+"""
+
+MAX_PAGE_LENGTH = 1000
+
+
+class DataTablesColumn(NamedTuple):
+    # Fields or expressions to order by, the column is not orderable if empty
+    order_by: Sequence[Union[str, BaseExpression]] = ()
+    # Builds the filter for a single search word, the column is not searchable if None
+    search: Optional[Callable[[str], Q]] = None
+
+
+def icontains_search(*fields: str) -> Callable[[str], Q]:
+    return lambda word: functools.reduce(operator.or_, (Q(**{field + '__icontains': word}) for field in fields))
+
+
+def _order_expression(field: Union[str, BaseExpression], descending: bool):
+    if isinstance(field, str):
+        return '-' + field if descending else field
+    return field.desc(nulls_last=True) if descending else field.asc(nulls_last=True)
+
+
+def _search_filter(columns: Sequence[DataTablesColumn], value: str) -> Q:
+    """
+    Every word of the search value has to match at least one of the columns
+    """
+    q = Q()
+    for word in value.split():
+        q &= functools.reduce(operator.or_, (column.search(word) for column in columns))
+    return q
+
+
+def datatables_response(request: HttpRequest, queryset: QuerySet, columns: Sequence[DataTablesColumn],
+                        render_rows: Callable[[List[Any]], List[List[str]]]) -> HttpResponse:
+    params = request.GET
+    try:
+        draw = int(params.get('draw', 0))
+        start = max(int(params.get('start', 0)), 0)
+        length = int(params.get('length', 10))
+        order = []
+        i = 0
+        while 'order[{}][column]'.format(i) in params:
+            order.append((int(params['order[{}][column]'.format(i)]), params.get('order[{}][dir]'.format(i)) == 'desc'))
+            i += 1
+    except ValueError:
+        return HttpResponseBadRequest()
+    if length < 0 or length > MAX_PAGE_LENGTH:
+        length = MAX_PAGE_LENGTH
+
+    records_total = queryset.count()
+
+    search = Q()
+    searchable = [column for column in columns if column.search is not None]
+    search_value = params.get('search[value]', '')
+    if search_value.strip() and searchable:
+        search &= _search_filter(searchable, search_value)
+    for i, column in enumerate(columns):
+        column_search_value = params.get('columns[{}][search][value]'.format(i), '')
+        if column_search_value.strip() and column.search is not None:
+            search &= _search_filter([column], column_search_value)
+
+    if search:
+        queryset = queryset.filter(search)
+        records_filtered = queryset.count()
+    else:
+        records_filtered = records_total
+
+    order_by = []
+    for column_index, descending in order:
+        if 0 <= column_index < len(columns):
+            order_by += [_order_expression(field, descending) for field in columns[column_index].order_by]
+    # Make the order deterministic, so that pages don't overlap
+    order_by.append('pk')
+    page = list(queryset.order_by(*order_by)[start:start + length])
+
+    return JsonResponse({
+        'draw': draw,
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'data': render_rows(page),
+    })
@@ -0,0 +1,157 @@
+import csv
+import datetime
+import decimal
+import io
+import itertools
+import re
+import zipfile
+from typing import Any, Iterable, Iterator, List, Sequence, TypeVar
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+
+"""
+Streaming CSV and XLSX writers. Both consume the rows lazily and yield the file in chunks,
+so that the memory usage doesn't depend on the size of the exported table.
+"""
+
+
+T = TypeVar('T')
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Splits the iterable into lists of at most size elements. Useful with QuerySet.iterator(), which ignores
+    prefetch_related(), to load the related data for a whole batch at once.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class _Echo:
+    """
+    File-like object that returns the written value instead of buffering it (see the Django docs on streaming CSV)
+    """
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_csv(rows: Iterable[Sequence[Any]]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    # BOM, so that Excel detects the encoding correctly
+    yield '\ufeff'
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """
+    Unseekable stream collecting the data written by ZipFile until it's taken out with pop()
+    """
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_XLSX_CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>'''
+
+_XLSX_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+
+_XLSX_WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>'''
+
+_XLSX_WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>'''
+
+_XLSX_SHEET_START = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'''
+
+_XLSX_SHEET_END = '</sheetData></worksheet>'
+
+# Characters that are not allowed in XML 1.0
+_XML_ILLEGAL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_column(index: int) -> str:
+    name = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(ord('A') + remainder) + name
+    return name
+
+
+def _xlsx_cell(ref: str, value: Any) -> str:
+    if value is None or value == '':
+        return ''
+    if isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool):
+        return '<c r="{}"><v>{}</v></c>'.format(ref, value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.isoformat()
+    text = escape(_XML_ILLEGAL_RE.sub('', str(value)))
+    return '<c r="{}" t="inlineStr"><is><t xml:space="preserve">{}</t></is></c>'.format(ref, text)
+
+
+def stream_xlsx(rows: Iterable[Sequence[Any]], sheet_name: str = 'Arkusz1') -> Iterator[bytes]:
+    """
+    Minimal single-sheet XLSX writer. Cells are written as inline strings or numbers (no shared strings
+    or styles), which lets the sheet be compressed and sent row by row.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _XLSX_RELS)
+        archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(name=escape(sheet_name, {'"': '&quot;'})))
+        archive.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(_XLSX_SHEET_START.encode())
+            for row_number, row in enumerate(rows, start=1):
+                cells = ''.join(_xlsx_cell('{}{}'.format(_xlsx_column(i), row_number), value)
+                                for i, value in enumerate(row))
+                sheet.write('<row r="{}">{}</row>'.format(row_number, cells).encode())
+                yield buffer.pop()
+            sheet.write(_XLSX_SHEET_END.encode())
+    yield buffer.pop()
+
+
+def streaming_csv_response(rows: Iterable[Sequence[Any]], filename: str) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    return response
+
+
+def streaming_xlsx_response(rows: Iterable[Sequence[Any]], filename: str) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(
+        stream_xlsx(rows),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    return response
@@ -24,7 +24,7 @@ from django.contrib.staticfiles.storage import staticfiles_storage
 
 from .templatetags.wwwtags import qualified_mark
 from .models import UserProfile, Article, Workshop, WorkshopCategory, \
-    WorkshopType, WorkshopUserProfile, WorkshopParticipant, Camp, Solution, SolutionFile
+    WorkshopType, WorkshopUserProfile, WorkshopParticipant, Camp, Solution, SolutionFile, QueuedMail
 
 
 class InitializedTinyMCE(tinymce.widgets.TinyMCE):
@@ -518,7 +518,8 @@ class MailFilterForm(Form):
         self.helper = FormHelper(self)
         self.helper.include_media = False
         self.helper.layout.fields.append(FormActions(
-            StrictButton('Filtruj', type='submit', css_class='btn-outline-primary mx-1 my-3 w-100'),
+            StrictButton('Policz', type='submit', name='count', css_class='btn-outline-secondary mx-1 my-3'),
+            StrictButton('Filtruj', type='submit', css_class='btn-outline-primary mx-1 my-3 w-75'),
             css_class='text-right',
         ))
 
@@ -532,4 +533,18 @@ class MailFilterForm(Form):
 
     @property
     def filter_name(self):
-        return self.filter_methods[self.cleaned_data['filter']][1]
\ No newline at end of file
+        return self.filter_methods[self.cleaned_data['filter']][1]
+
+
+class QueuedMailForm(ModelForm):
+    class Meta:
+        model = QueuedMail
+        fields = ['subject', 'body']
+        labels = {'subject': 'Temat', 'body': 'Treść'}
+        widgets = {'body': Textarea(attrs={'rows': 8})}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.helper = FormHelper()
+        self.helper.form_tag = False  # handled in template, together with the chosen filter
+        self.helper.include_media = False
@@ -0,0 +1,97 @@
+import logging
+import os
+import shutil
+import uuid
+from typing import List, Optional
+
+from django.conf import settings
+
+"""
+The pages of past camps don't change, so they can be frozen into static HTML with the freeze_camp command and served
+by nginx without reaching Django. The output mirrors the URLs: the page at /<year>/program/ is stored in
+<MEDIA_ROOT>/<FROZEN_CAMPS_DIR>/<year>/program/index.html, and the qualification problems in index.pdf in the same way,
+so nginx can look for them first with
+    try_files /media/frozen$uri/index.html /media/frozen$uri/index.pdf @django;
+The pages are rendered for anonymous users, so logged in users (with the sessionid cookie) should still get them from
+Django (see nginx.conf).
+
+When anything shown on the frozen pages of a camp changes, the model signals call unfreeze_camps. The outdated files are
+removed immediately, so Django serves the pages until they are frozen again. Rendering all the pages is too slow to be
+done in the web request that made the change, so the camps that should stay frozen are remembered with a marker file
+(<year>.frozen next to the directory of the camp), and freeze_camp --stale (e.g. run from cron) freezes again the ones
+whose pages were removed.
+"""
+
+logger = logging.getLogger('wwwapp.freezing')
+
+
+def frozen_camps_root() -> str:
+    return os.path.join(settings.MEDIA_ROOT, settings.FROZEN_CAMPS_DIR)
+
+
+def frozen_camp_dir(year_id: int) -> str:
+    return os.path.join(frozen_camps_root(), str(year_id))
+
+
+def frozen_camp_marker(year_id: int) -> str:
+    return os.path.join(frozen_camps_root(), '{}.frozen'.format(year_id))
+
+
+def mark_camp_frozen(year_id: int) -> None:
+    os.makedirs(frozen_camps_root(), exist_ok=True)
+    with open(frozen_camp_marker(year_id), 'w'):
+        pass
+
+
+def frozen_camp_ids() -> List[int]:
+    """
+    The camps that were frozen with freeze_camp, including the ones whose pages were removed after a change
+    """
+    if not os.path.isdir(frozen_camps_root()):
+        return []
+    return sorted(int(name[:-len('.frozen')]) for name in os.listdir(frozen_camps_root())
+                  if name.endswith('.frozen') and name[:-len('.frozen')].isdigit())
+
+
+def stale_camp_ids() -> List[int]:
+    """
+    The frozen camps whose pages were removed and have to be frozen again
+    """
+    return [year_id for year_id in frozen_camp_ids() if not os.path.isdir(frozen_camp_dir(year_id))]
+
+
+def unfreeze_camp(year_id: int, forget: bool = False) -> bool:
+    """
+    Removes the frozen pages of the camp
+    :param forget: also forget that the camp was frozen, so that freeze_camp --stale doesn't freeze it again
+    :return: True if the camp was frozen
+    """
+    was_frozen = os.path.exists(frozen_camp_marker(year_id))
+    if forget:
+        try:
+            os.remove(frozen_camp_marker(year_id))
+        except FileNotFoundError:
+            pass
+
+    path = frozen_camp_dir(year_id)
+    removed_path = '{}.removed-{}'.format(path, uuid.uuid4().hex)
+    try:
+        # Renamed first, so that the pages stop being served at once, and concurrent calls don't remove the same files
+        os.rename(path, removed_path)
+    except FileNotFoundError:
+        return was_frozen
+    shutil.rmtree(removed_path, ignore_errors=True)
+    return True
+
+
+def unfreeze_camps(year_id: Optional[int] = None) -> None:
+    """
+    Removes the frozen pages of the camp (of all frozen camps if year_id is None), after a change in the data shown on
+    them. Errors are only logged, the change itself must not fail because of the static files.
+    """
+    year_ids = frozen_camp_ids() if year_id is None else [year_id]
+    for frozen_year_id in year_ids:
+        try:
+            unfreeze_camp(frozen_year_id)
+        except OSError:
+            logger.exception('Could not remove the frozen pages of %s, they are out of date', frozen_year_id)
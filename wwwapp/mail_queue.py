@@ -0,0 +1,142 @@
+import datetime
+import smtplib
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import QueuedMail, QueuedMailRecipient
+
+"""
+Background sending of e-mails to groups of people. enqueue_mail() (called from the web requests) only stores the
+message and its recipients in the database; MailQueueWorker (run by the send_queued_mail command) sends them in
+batches over a single SMTP connection, respecting the rate limit, and records the result for every recipient.
+"""
+
+
+def enqueue_mail(subject: str, body: str, emails: Iterable[str], created_by: Optional[User] = None,
+                 recipients_description: str = '') -> QueuedMail:
+    """
+    Stores a message in the queue. Empty and duplicate addresses are skipped
+    """
+    with transaction.atomic():
+        mail = QueuedMail.objects.create(subject=subject, body=body, created_by=created_by,
+                                         recipients_description=recipients_description)
+        QueuedMailRecipient.objects.bulk_create(
+            [QueuedMailRecipient(mail=mail, email=email) for email in sorted(set(emails)) if email],
+            batch_size=1000)
+    return mail
+
+
+class MailQueueWorker:
+    def __init__(self, connection=None, batch_size: Optional[int] = None, send_interval: Optional[float] = None,
+                 max_attempts: Optional[int] = None, retry_delay: Optional[float] = None,
+                 lease: Optional[float] = None, sleep=time.sleep, clock=time.monotonic):
+        self.connection = connection or get_connection()
+        self.batch_size = batch_size if batch_size is not None else settings.MAIL_QUEUE_BATCH_SIZE
+        self.send_interval = send_interval if send_interval is not None else settings.MAIL_QUEUE_SEND_INTERVAL
+        self.max_attempts = max_attempts if max_attempts is not None else settings.MAIL_QUEUE_MAX_ATTEMPTS
+        self.retry_delay = retry_delay if retry_delay is not None else settings.MAIL_QUEUE_RETRY_DELAY
+        self.lease = lease if lease is not None else settings.MAIL_QUEUE_LEASE
+        self.sleep = sleep
+        self.clock = clock
+        self.last_sent_at = None
+        if self.batch_size * self.send_interval >= self.lease:
+            # The rest of the batch would be claimed (and sent) again by another worker
+            raise ValueError('Sending a batch of {} messages every {} seconds takes longer than the lease of {} seconds'
+                             .format(self.batch_size, self.send_interval, self.lease))
+
+    def claim_batch(self) -> List[QueuedMailRecipient]:
+        """
+        Takes the recipients that are due. They are hidden from the other workers for the duration of the lease, so
+        if the worker dies in the middle of a batch, the messages it didn't send are retried after the lease expires.
+        Recipients that already used up all their attempts that way are marked as failed instead.
+        """
+        now = timezone.now()
+        due = QueuedMailRecipient.objects.filter(status=QueuedMailRecipient.STATUS_PENDING, next_attempt_at__lte=now)
+        with transaction.atomic():
+            # E.g. the message kills the worker every time it's sent
+            due.filter(attempts__gte=self.max_attempts).update(status=QueuedMailRecipient.STATUS_FAILED)
+            batch = list(due
+                         .select_for_update(skip_locked=True, of=('self',))
+                         .filter(attempts__lt=self.max_attempts)
+                         .select_related('mail')
+                         .order_by('next_attempt_at', 'pk')[:self.batch_size])
+            QueuedMailRecipient.objects.filter(pk__in=[recipient.pk for recipient in batch]) \
+                .update(attempts=F('attempts') + 1, next_attempt_at=now + datetime.timedelta(seconds=self.lease))
+        for recipient in batch:
+            recipient.attempts += 1
+        return batch
+
+    def wait_for_rate_limit(self) -> None:
+        if self.last_sent_at is not None:
+            remaining = self.last_sent_at + self.send_interval - self.clock()
+            if remaining > 0:
+                self.sleep(remaining)
+        self.last_sent_at = self.clock()
+
+    def send(self, recipient: QueuedMailRecipient) -> None:
+        self.wait_for_rate_limit()
+        try:
+            # Opened explicitly, as otherwise send_messages() would close the connection after every message
+            self.connection.open()
+            self.connection.send_messages([EmailMessage(recipient.mail.subject, recipient.mail.body,
+                                                        to=[recipient.email])])
+        except smtplib.SMTPRecipientsRefused as e:
+            # The address itself is wrong, there is no point in retrying
+            self.mark_failed(recipient, e, permanent=True)
+        except (smtplib.SMTPException, OSError) as e:
+            # The connection is most likely broken, so it's reopened before the next message
+            self.close_connection()
+            self.mark_failed(recipient, e, permanent=False)
+        except Exception as e:
+            # Something is wrong with the message itself (e.g. BadHeaderError), so it would fail again
+            self.close_connection()
+            self.mark_failed(recipient, e, permanent=True)
+        else:
+            QueuedMailRecipient.objects.filter(pk=recipient.pk).update(
+                status=QueuedMailRecipient.STATUS_SENT, sent_at=timezone.now(), last_error='')
+
+    def mark_failed(self, recipient: QueuedMailRecipient, error: Exception, permanent: bool) -> None:
+        if permanent or recipient.attempts >= self.max_attempts:
+            QueuedMailRecipient.objects.filter(pk=recipient.pk).update(
+                status=QueuedMailRecipient.STATUS_FAILED, last_error=repr(error))
+        else:
+            delay = self.retry_delay * 2 ** (recipient.attempts - 1)
+            QueuedMailRecipient.objects.filter(pk=recipient.pk).update(
+                next_attempt_at=timezone.now() + datetime.timedelta(seconds=delay), last_error=repr(error))
+
+    def close_connection(self) -> None:
+        try:
+            self.connection.close()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    def run(self, max_batches: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Sends the batches until there is nothing left to send right now
+        :return: (number of processed recipients, number of batches)
+        """
+        processed = 0
+        batches = 0
+        try:
+            while max_batches is None or batches < max_batches:
+                lease_end = self.clock() + self.lease
+                batch = self.claim_batch()
+                if not batch:
+                    break
+                batches += 1
+                for recipient in batch:
+                    if self.clock() >= lease_end:
+                        # The rest of the batch may already be claimed by another worker, it will be sent later
+                        break
+                    self.send(recipient)
+                    processed += 1
+        finally:
+            self.close_connection()
+        return processed, batches
@@ -1,11 +1,25 @@
+import itertools
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
-from django.shortcuts import render, get_object_or_404
-
-from .forms import MailFilterForm
-from .models import Workshop, WorkshopUserProfile, Camp
+from django.contrib.auth.models import User
+from django.db.models import QuerySet, Count, Q
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBadRequest
+from django.shortcuts import render, get_object_or_404, redirect
+from django.views.decorators.http import require_POST
+
+from .export import streaming_csv_response
+from .forms import MailFilterForm, QueuedMailForm
+from .mail_queue import enqueue_mail
+from .models import Workshop, WorkshopParticipant, WorkshopUserProfile, Camp, QueuedMail, QueuedMailRecipient
 from .views import get_context
 
+"""
+Every filter returns a QuerySet of Users, with the conditions expressed as subqueries, so that the filters can be
+combined with | and & into a single SQL query without duplicates
+"""
+
 _registered_filters = dict()
 
 
@@ -19,75 +33,126 @@ def _register_as_email_filter(filter_id, name):
 
 
 @_register_as_email_filter('all', 'wszyscy (uczestnicy zapisani na co najmniej jeden warsztat oraz prowadzący)')
-def _all(year):
+def _all(year: Camp) -> QuerySet:
     return _all_participants(year) | _all_lecturers(year)
 
 
-def _get_user_objects_of_lecturers_of_workshops(workshops):
-    users = set()
-    for workshop in workshops:
-        for user_profile in workshop.lecturer.all():
-            users.add(user_profile.user)
-    return users
+def _lecturers_of_workshops(workshops: QuerySet) -> QuerySet:
+    lecturers = Workshop.lecturer.through.objects.filter(workshop__in=workshops).values('userprofile_id')
+    return User.objects.filter(userprofile__in=lecturers)
 
 
 @_register_as_email_filter('allLecturers', 'wszyscy prowadzący')
-def _all_lecturers(year):
-    all_workshops = Workshop.objects.filter(year=year)
-    return _get_user_objects_of_lecturers_of_workshops(all_workshops)
+def _all_lecturers(year: Camp) -> QuerySet:
+    return _lecturers_of_workshops(Workshop.objects.filter(year=year))
 
 
 @_register_as_email_filter('acceptedLecturers', 'prowadzący zaakceptowanych warsztatów')
-def _accepted_lecturers(year):
-    accepted_workshops = Workshop.objects.filter(status='Z', year=year)
-    return _get_user_objects_of_lecturers_of_workshops(accepted_workshops)
+def _accepted_lecturers(year: Camp) -> QuerySet:
+    return _lecturers_of_workshops(Workshop.objects.filter(status=Workshop.STATUS_ACCEPTED, year=year))
 
 
 @_register_as_email_filter('deniedLecturers', 'prowadzący odrzuconych warsztatów')
-def _denied_lecturers(year):
-    denied_workshops = Workshop.objects.filter(status='O', year=year)
-    return _get_user_objects_of_lecturers_of_workshops(denied_workshops)
+def _denied_lecturers(year: Camp) -> QuerySet:
+    return _lecturers_of_workshops(Workshop.objects.filter(status=Workshop.STATUS_REJECTED, year=year))
 
 
 @_register_as_email_filter('allParticipants', 'wszyscy uczestnicy zapisani na co najmniej jeden warsztat')
-def _all_participants(year):
-    all_workshops = Workshop.objects.filter(year=year)
-    participants = set()
-    for workshop in all_workshops:
-        for participant in workshop.participants.all():
-            participants.add(participant.user)
-    return participants
+def _all_participants(year: Camp) -> QuerySet:
+    participants = WorkshopParticipant.objects.filter(workshop__year=year).values('participant_id')
+    return User.objects.filter(userprofile__in=participants)
+
+
+def _participants_with_status(year: Camp, status: str) -> QuerySet:
+    profiles = WorkshopUserProfile.objects.filter(year=year, status=status).values('user_profile_id')
+    return User.objects.filter(userprofile__in=profiles)
 
 
 @_register_as_email_filter('allQualified', 'wszyscy uczestnicy o statusie zakwalifikowanym')
-def _all_qualified(year):
-    return [profile.user_profile.user for profile in
-            WorkshopUserProfile.objects.filter(year=year) if profile.status == 'Z']
+def _all_qualified(year: Camp) -> QuerySet:
+    return _participants_with_status(year, WorkshopUserProfile.STATUS_ACCEPTED)
 
 
 @_register_as_email_filter('allRefused', 'wszyscy uczestnicy o statusie odrzuconym')
-def _all_refused(year):
-    return [profile.user_profile.user for profile in
-            WorkshopUserProfile.objects.filter(year=year) if profile.status == 'O']
+def _all_refused(year: Camp) -> QuerySet:
+    return _participants_with_status(year, WorkshopUserProfile.STATUS_REJECTED)
 
 
 @login_required()
 @permission_required('wwwapp.see_all_users', raise_exception=True)
-def filtered_emails_view(request, year):
-    context = get_context(request)
+def filtered_emails_view(request: HttpRequest, year: int) -> HttpResponse:
     year = get_object_or_404(Camp, pk=year)
 
     if request.method == 'POST':
         form = MailFilterForm(_registered_filters, request.POST)
-        if form.is_valid():
-            context['show_results'] = True
-            context['chosen_filter_name'] = form.filter_name
-            context['filtered_users'] = form.filter_method(year)
     else:
         form = MailFilterForm(_registered_filters)
+    return _render_filtered_emails(request, year, form, QueuedMailForm(), count_only='count' in request.POST)
+
+
+@login_required()
+@permission_required(['wwwapp.see_all_users', 'wwwapp.add_queuedmail'], raise_exception=True)
+@require_POST
+def filtered_emails_send_view(request: HttpRequest, year: int) -> HttpResponse:
+    year = get_object_or_404(Camp, pk=year)
+
+    form = MailFilterForm(_registered_filters, request.POST)
+    mail_form = QueuedMailForm(request.POST)
+    if not form.is_valid() or not mail_form.is_valid():
+        return _render_filtered_emails(request, year, form, mail_form)
+
+    mail = enqueue_mail(mail_form.cleaned_data['subject'], mail_form.cleaned_data['body'],
+                        form.filter_method(year).values_list('email', flat=True).iterator(),
+                        created_by=request.user,
+                        recipients_description='{} w edycji {}'.format(form.filter_name, year))
+    messages.info(request, 'Wiadomość do {} osób została dodana do kolejki.'.format(mail.recipients.count()))
+    return redirect('emails', year.pk)
+
+
+def _render_filtered_emails(request: HttpRequest, year: Camp, form: MailFilterForm, mail_form: QueuedMailForm,
+                            count_only: bool = False) -> HttpResponse:
+    context = get_context(request)
+
+    if form.is_bound and form.is_valid():
+        users = form.filter_method(year)
+        context['show_results'] = True
+        context['chosen_filter_id'] = form.filter_id
+        context['chosen_filter_name'] = form.filter_name
+        if count_only:
+            context['filtered_count'] = users.count()
+        else:
+            context['filtered_emails'] = list(users.order_by('email').values_list('email', flat=True))
+            context['filtered_count'] = len(context['filtered_emails'])
+
+    if request.user.has_perm('wwwapp.add_queuedmail'):
+        context['mail_form'] = mail_form
+        context['queued_mails'] = QueuedMail.objects.order_by('-created_at').annotate(
+            pending_count=Count('recipients', filter=Q(recipients__status=QueuedMailRecipient.STATUS_PENDING)),
+            sent_count=Count('recipients', filter=Q(recipients__status=QueuedMailRecipient.STATUS_SENT)),
+            failed_count=Count('recipients', filter=Q(recipients__status=QueuedMailRecipient.STATUS_FAILED)),
+        )[:5]
 
     context['title'] = 'Filtrowane emaile użytkowników'
     context['form'] = form
 
     context['selected_year'] = year
     return render(request, 'filteredEmails.html', context)
+
+
+@login_required()
+@permission_required('wwwapp.see_all_users', raise_exception=True)
+def filtered_emails_export_view(request: HttpRequest, year: int, file_format: str) -> HttpResponse:
+    year = get_object_or_404(Camp, pk=year)
+    form = MailFilterForm(_registered_filters, request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest('Unknown filter')
+
+    users = form.filter_method(year).order_by('email')
+    filename = 'emaile_{}_{}.{}'.format(form.filter_id, year.year, file_format)
+    if file_format == 'csv':
+        rows = users.values_list('first_name', 'last_name', 'email').iterator()
+        return streaming_csv_response(itertools.chain([('Imię', 'Nazwisko', 'E-mail')], rows), filename)
+    response = StreamingHttpResponse((email + '\n' for email in users.values_list('email', flat=True).iterator()),
+                                     content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    return response
@@ -0,0 +1,308 @@
+import datetime
+import json
+import math
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from faker import Faker
+
+from wwwapp.models import UserProfile, Workshop, WorkshopCategory, WorkshopType, WorkshopParticipant, \
+    WorkshopUserProfile, Camp, Solution, ParticipantSummary
+from wwwforms.models import Form, FormQuestion, FormQuestionAnswer, FormQuestionOption
+
+"""
+Command generating a large, deterministic dataset (in the style of populate_with_test_data, but with bulk inserts)
+and measuring the performance of the heaviest views on it. The results are printed as JSON, so that they can be
+compared between commits.
+"""
+
+
+def fake_pesel(rng: random.Random, birth: datetime.date) -> str:
+    month = birth.month + {18: 80, 19: 0, 20: 20, 21: 40, 22: 60}[birth.year // 100]
+    digits = '{:02d}{:02d}{:02d}{:04d}'.format(birth.year % 100, month, birth.day, rng.randrange(10000))
+    checksum = sum(int(digit) * mult for digit, mult in zip(digits, [1, 3, 7, 9] * 2 + [1, 3]))
+    return digits + str((10 - checksum % 10) % 10)
+
+
+class Command(BaseCommand):
+    help = 'Generate a large test dataset and measure the performance of the heaviest views'
+    USERS_PER_SCALE = 1000
+    BATCH_SIZE = 2000
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1,
+                            help='Scale factor of the dataset (1 = %d users)' % self.USERS_PER_SCALE)
+        parser.add_argument('--camps', type=int, default=3, help='Number of camps to generate')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+        parser.add_argument('--repeat', type=int, default=3, help='How many times to request each view')
+        parser.add_argument('--output', type=str, default=None, help='Write the JSON report to this file')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated data in the database (rolled back by default)')
+
+    def handle(self, *args, **options) -> None:
+        if not settings.DEBUG:
+            print("Command not allowed in production")
+            return
+
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('pl_PL')
+        self.fake.seed_instance(options['seed'])
+
+        with transaction.atomic():
+            start = time.perf_counter()
+            dataset = self.generate(options['scale'], options['camps'], options['seed'])
+            dataset['generation_seconds'] = round(time.perf_counter() - start, 2)
+            self.stderr.write('Generated dataset: {}'.format(dataset))
+
+            report = {
+                'revision': self.git_revision(),
+                'options': {k: options[k] for k in ('scale', 'camps', 'seed', 'repeat')},
+                'dataset': dataset,
+                'views': self.run_benchmarks(options['repeat']),
+            }
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def git_revision():
+        try:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    """
+    Generates the dataset using bulk inserts and returns the row counts
+    """
+    def generate(self, scale: float, num_camps: int, seed: int) -> Dict[str, int]:
+        rng = self.rng
+        num_users = int(self.USERS_PER_SCALE * scale)
+        workshops_per_camp = max(10, int(30 * math.sqrt(scale)))
+
+        # Camps - the current one is created by the initial migration
+        current = Camp.objects.latest()
+        camps = []
+        for year in range(current.year - num_camps + 1, current.year + 1):
+            camp, _ = Camp.objects.get_or_create(year=year, defaults={
+                'start_date': datetime.date(year, 7, 1),
+                'end_date': datetime.date(year, 7, 14),
+            })
+            if camp.start_date is None or camp.end_date is None:
+                camp.start_date = datetime.date(year, 7, 1)
+                camp.end_date = datetime.date(year, 7, 14)
+                camp.save()
+            camps.append(camp)
+        current = camps[-1]
+
+        # Users and their profiles (bulk_create does not fire the post_save signal creating the profile)
+        prefix = 'bench{}_'.format(seed)
+        User.objects.bulk_create([
+            User(username='{}{}'.format(prefix, i), email='{}{}@example.com'.format(prefix, i), password='!',
+                 first_name=self.fake.first_name(), last_name=self.fake.last_name())
+            for i in range(num_users)
+        ], batch_size=self.BATCH_SIZE)
+        user_ids = list(User.objects.filter(username__startswith=prefix).order_by('id').values_list('id', flat=True))
+        UserProfile.objects.bulk_create([
+            UserProfile(user_id=user_id,
+                        gender=rng.choice(['M', 'F', None]),
+                        school=rng.choice(['', 'XIV LO', 'III LO', 'ZSO']),
+                        matura_exam_year=rng.choice([None, current.year, current.year + 1, current.year + 2]),
+                        how_do_you_know_about='Od znajomych',
+                        profile_page='<p>{}</p>'.format('Lorem ipsum ' * rng.randrange(100)),
+                        cover_letter='<p>{}</p>'.format('Lorem ipsum ' * rng.randrange(100)))
+            for user_id in user_ids
+        ], batch_size=self.BATCH_SIZE)
+        profile_ids = list(UserProfile.objects.filter(user_id__in=user_ids).order_by('id').values_list('id', flat=True))
+
+        # Workshops
+        num_lecturers = min(len(profile_ids), workshops_per_camp * 2)
+        lecturer_ids, participant_ids = profile_ids[:num_lecturers], profile_ids[num_lecturers:]
+        for camp in camps:
+            types = [WorkshopType.objects.create(year=camp, name='Typ {}'.format(i)) for i in range(3)]
+            categories = [WorkshopCategory.objects.create(year=camp, name='Kategoria {}'.format(i)) for i in range(5)]
+            Workshop.objects.bulk_create([
+                Workshop(year=camp, name='bench-{}'.format(i), title='Warsztaty {}'.format(i),
+                         type=rng.choice(types),
+                         status=rng.choice([Workshop.STATUS_ACCEPTED] * 8 + [Workshop.STATUS_REJECTED, Workshop.STATUS_CANCELLED]),
+                         short_description=self.fake.sentence(),
+                         proposition_description='<p>{}</p>'.format(self.fake.paragraph()),
+                         page_content='<p>{}</p>'.format(self.fake.paragraph()),
+                         page_content_is_public=True,
+                         is_qualifying=rng.random() < 0.9,
+                         solution_uploads_enabled=rng.random() < 0.7,
+                         qualification_threshold=rng.choice([None, 5, 10]),
+                         max_points=rng.choice([None, 20, 30]))
+                for i in range(workshops_per_camp)
+            ], batch_size=self.BATCH_SIZE)
+            for workshop in Workshop.objects.filter(year=camp, qualification_threshold__isnull=False, max_points__isnull=True):
+                workshop.max_points = 20
+                workshop.save()
+            workshop_ids = list(Workshop.objects.filter(year=camp).order_by('id').values_list('id', flat=True))
+            Workshop.category.through.objects.bulk_create([
+                Workshop.category.through(workshop_id=workshop_id, workshopcategory_id=rng.choice(categories).id)
+                for workshop_id in workshop_ids
+            ], batch_size=self.BATCH_SIZE)
+            Workshop.lecturer.through.objects.bulk_create([
+                Workshop.lecturer.through(workshop_id=workshop_id, userprofile_id=lecturer_id)
+                for workshop_id in workshop_ids
+                for lecturer_id in rng.sample(lecturer_ids, rng.choice([1, 1, 1, 2]))
+            ], batch_size=self.BATCH_SIZE, ignore_conflicts=True)
+
+            # Registrations and qualification results
+            registered = rng.sample(participant_ids, int(len(participant_ids) * 0.4))
+            WorkshopParticipant.objects.bulk_create([
+                WorkshopParticipant(workshop_id=workshop_id, participant_id=participant_id,
+                                    qualification_result=rng.choice([None, rng.randrange(0, 300) / 10]),
+                                    comment=rng.choice([None, 'Dobrze', 'Źle']))
+                for participant_id in registered
+                for workshop_id in rng.sample(workshop_ids, min(len(workshop_ids), rng.randrange(3, 8)))
+            ], batch_size=self.BATCH_SIZE)
+            participations = WorkshopParticipant.objects.filter(workshop__year=camp).values_list('id', flat=True)
+            Solution.objects.bulk_create([
+                Solution(workshop_participant_id=wp_id, message='')
+                for wp_id in participations if rng.random() < 0.5
+            ], batch_size=self.BATCH_SIZE)
+            WorkshopUserProfile.objects.bulk_create([
+                WorkshopUserProfile(user_profile_id=participant_id, year=camp,
+                                    status=rng.choice(['Z', 'O', 'X', None]))
+                for participant_id in registered
+            ], batch_size=self.BATCH_SIZE)
+
+        # Forms
+        form = Form.objects.create(name='{}form'.format(prefix), title='Informacje wyjazdowe')
+        questions = {
+            'pesel': form.questions.create(title='PESEL', data_type=FormQuestion.TYPE_PESEL, order=0),
+            'address': form.questions.create(title='Adres', data_type=FormQuestion.TYPE_TEXTBOX, order=1),
+            'phone': form.questions.create(title='Telefon', data_type=FormQuestion.TYPE_STRING, order=2),
+            'start': form.questions.create(title='Przyjazd', data_type=FormQuestion.TYPE_DATE, order=3),
+            'end': form.questions.create(title='Wyjazd', data_type=FormQuestion.TYPE_DATE, order=4),
+            'number': form.questions.create(title='Numer buta', data_type=FormQuestion.TYPE_NUMBER, order=5),
+            'tshirt': form.questions.create(title='Koszulka', data_type=FormQuestion.TYPE_SELECT, order=6),
+            'diet': form.questions.create(title='Dieta', data_type=FormQuestion.TYPE_MULTIPLE_CHOICE, order=7),
+        }
+        form.arrival_date = questions['start']
+        form.departure_date = questions['end']
+        form.save()
+        tshirt_options = [questions['tshirt'].options.create(title=size, order=i)
+                          for i, size in enumerate(['XS', 'S', 'M', 'L', 'XL'])]
+        diet_options = [questions['diet'].options.create(title=diet, order=i)
+                        for i, diet in enumerate(['Wegetariańska', 'Wegańska', 'Bezglutenowa'])]
+
+        answering = [user_id for user_id in user_ids if rng.random() < 0.6]
+        answers = []
+        for user_id in answering:
+            birth = datetime.date(current.year - 16, 1, 1) + datetime.timedelta(days=rng.randrange(365 * 4))
+            answers += [
+                FormQuestionAnswer(question=questions['pesel'], user_id=user_id, value_string=fake_pesel(rng, birth),
+                                   birth_date=birth),
+                FormQuestionAnswer(question=questions['address'], user_id=user_id, value_string=self.fake.address()),
+                FormQuestionAnswer(question=questions['phone'], user_id=user_id, value_string=self.fake.phone_number()),
+                FormQuestionAnswer(question=questions['start'], user_id=user_id,
+                                   value_date=current.start_date + datetime.timedelta(days=rng.randrange(3))),
+                FormQuestionAnswer(question=questions['end'], user_id=user_id,
+                                   value_date=current.end_date - datetime.timedelta(days=rng.randrange(3))),
+                FormQuestionAnswer(question=questions['number'], user_id=user_id, value_number=rng.randrange(35, 47)),
+                FormQuestionAnswer(question=questions['tshirt'], user_id=user_id),
+                FormQuestionAnswer(question=questions['diet'], user_id=user_id),
+            ]
+        FormQuestionAnswer.objects.bulk_create(answers, batch_size=self.BATCH_SIZE)
+        choices = []
+        for answer_id in FormQuestionAnswer.objects.filter(question=questions['tshirt']).values_list('id', flat=True):
+            choices.append((answer_id, rng.choice(tshirt_options).id))
+        for answer_id in FormQuestionAnswer.objects.filter(question=questions['diet']).values_list('id', flat=True):
+            choices += [(answer_id, option.id) for option in diet_options if rng.random() < 0.2]
+        FormQuestionAnswer.value_choices.through.objects.bulk_create([
+            FormQuestionAnswer.value_choices.through(formquestionanswer_id=answer_id, formquestionoption_id=option_id)
+            for answer_id, option_id in choices
+        ], batch_size=self.BATCH_SIZE)
+
+        # bulk_create does not send the signals maintaining the summaries
+        for camp in camps:
+            ParticipantSummary.objects.bulk_create(ParticipantSummary.compute(camp.pk).values(),
+                                                   batch_size=self.BATCH_SIZE)
+
+        self.current_year = current
+        self.form = form
+        return {
+            'users': len(user_ids),
+            'camps': len(camps),
+            'workshops': Workshop.objects.filter(year__in=camps).count(),
+            'workshop_participants': WorkshopParticipant.objects.filter(workshop__year__in=camps).count(),
+            'form_answers': len(answers),
+            'form_answer_choices': len(choices),
+            'form_question_options': FormQuestionOption.objects.filter(question__form=form).count(),
+        }
+
+    """
+    Requests every benchmarked view as a superuser and returns the measurements
+    """
+    def run_benchmarks(self, repeat: int) -> Dict[str, Any]:
+        admin = User.objects.create_superuser('bench_admin', 'bench_admin@example.com', None)
+        # A non-internal address, so that the debug toolbar is not rendered
+        client = Client(REMOTE_ADDR='192.0.2.1')
+        client.force_login(admin)
+
+        year = self.current_year.pk
+        views = {
+            'participants_view': lambda: client.get(reverse('participants', args=[year])),
+            'participants_export_view': lambda: client.get(reverse('participants_export_csv', args=[year])),
+            'people_data_view': lambda: client.get(reverse('all_people_data'), {
+                'draw': 1, 'start': 0, 'length': 50, 'order[0][column]': 1, 'search[value]': 'a'}),
+            'lecturers_view': lambda: client.get(reverse('lecturers', args=[year])),
+            'form_results_view': lambda: client.get(reverse('form_results', args=[self.form.name])),
+            'data_for_plan_view': lambda: client.get(reverse('dataForPlan', args=[year])),
+            'program_view': lambda: client.get(reverse('program', args=[year])),
+            'filtered_emails_view': lambda: client.post(reverse('emails', args=[year]), {'filter': 'all'}),
+        }
+        return {name: self.measure(name, request, repeat) for name, request in views.items()}
+
+    def measure(self, name: str, request: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+        self.stderr.write('Benchmarking {}...'.format(name))
+
+        def run():
+            response = request()
+            # Streaming responses are only generated when consumed
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            if response.status_code != 200:
+                raise RuntimeError('{} returned {}'.format(name, response.status_code))
+            return content
+
+        # Memory is measured separately, because tracing allocations slows down the code considerably
+        tracemalloc.start()
+        content = run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        latencies: List[float] = []
+        for i in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                run()
+                latencies.append(time.perf_counter() - start)
+
+        return {
+            'latency_ms_min': round(min(latencies) * 1000, 1),
+            'latency_ms_median': round(statistics.median(latencies) * 1000, 1),
+            'queries': len(queries.captured_queries),
+            'peak_memory_kb': peak_memory // 1024,
+            'response_kb': len(content) // 1024,
+        }
@@ -0,0 +1,138 @@
+import os
+import shutil
+from importlib import import_module
+from typing import List
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from wwwapp.freezing import frozen_camp_dir, mark_camp_frozen, stale_camp_ids, unfreeze_camp
+from wwwapp.models import Camp, Workshop
+
+"""
+Renders the pages of a past camp into static files (see wwwapp.freezing). The pages are rendered by the same views
+that serve them, as seen by an anonymous user. The new version is built next to the old one and swapped in at once.
+With --stale, the camps whose frozen pages were removed after a change are frozen again.
+"""
+
+
+class Command(BaseCommand):
+    help = 'Render the program, the workshop pages and the qualification problems of a past camp into static files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int, nargs='?')
+        parser.add_argument('--stale', action='store_true',
+                            help='Freeze again all the frozen camps whose pages were removed after a change '
+                                 '(instead of a single camp)')
+        parser.add_argument('--base-url', default=None,
+                            help='Scheme and host used in the absolute links on the pages '
+                                 '(default: https:// and the first of ALLOWED_HOSTS)')
+        parser.add_argument('--remove', action='store_true',
+                            help='Remove the frozen pages instead, so that Django serves them again '
+                                 '(and --stale doesn\'t freeze them)')
+
+    def handle(self, *args, **options):
+        if (options['year'] is None) == (not options['stale']):
+            raise CommandError('Give either the year or --stale')
+        if options['stale'] and options['remove']:
+            raise CommandError('--remove needs the year')
+
+        if options['remove']:
+            if unfreeze_camp(options['year'], forget=True):
+                self.stdout.write('Removed the frozen pages of {}'.format(options['year']))
+            else:
+                self.stdout.write('{} is not frozen'.format(options['year']))
+            return
+
+        base_url = urlsplit(options['base_url'] or 'https://' + self.default_host())
+        self.factory = RequestFactory(HTTP_HOST=base_url.netloc)
+        self.secure = base_url.scheme == 'https'
+
+        if not options['stale']:
+            self.freeze_camp(options['year'])
+            return
+
+        failed = []
+        for year_id in stale_camp_ids():
+            if not Camp.objects.filter(pk=year_id).exists():
+                unfreeze_camp(year_id, forget=True)
+                continue
+            try:
+                self.freeze_camp(year_id)
+            except CommandError as e:
+                # The other camps are still frozen, the failed one stays dynamic until it's fixed
+                self.stderr.write('Could not freeze {}: {}'.format(year_id, e))
+                failed.append(year_id)
+        if failed:
+            raise CommandError('Could not freeze {}'.format(', '.join(str(year_id) for year_id in failed)))
+
+    def freeze_camp(self, year_id: int) -> None:
+        year = Camp.objects.filter(pk=year_id).first()
+        if year is None:
+            raise CommandError('Camp {} does not exist'.format(year_id))
+        if year == Camp.current():
+            raise CommandError('{} is the current camp, its pages still change'.format(year))
+
+        self.output_dir = frozen_camp_dir(year.pk) + '.tmp'
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        try:
+            count = self.freeze(year)
+        except BaseException:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            raise
+        mark_camp_frozen(year.pk)
+        unfreeze_camp(year.pk)
+        os.rename(self.output_dir, frozen_camp_dir(year.pk))
+        self.stdout.write('Froze {} files of {} in {}'.format(count, year, frozen_camp_dir(year.pk)))
+
+    @staticmethod
+    def default_host() -> str:
+        hosts = [host for host in settings.ALLOWED_HOSTS if '*' not in host and not host.startswith('.')]
+        return hosts[0] if hosts else 'localhost'
+
+    def freeze(self, year: Camp) -> int:
+        workshops = list(year.workshops.filter(status__in=[Workshop.STATUS_ACCEPTED, Workshop.STATUS_CANCELLED])
+                         .order_by('name'))
+
+        paths = [reverse('program', args=[year.pk])]
+        paths += [reverse('workshop_page', args=[year.pk, workshop.name]) for workshop in workshops]
+        for path in paths:
+            with open(self.output_file(path, 'index.html'), 'wb') as f:
+                f.write(self.render(path))
+
+        count = len(paths)
+        for workshop in workshops:
+            if not workshop.is_qualifying or not workshop.qualification_problems:
+                continue
+            if not os.path.isfile(workshop.qualification_problems.path):
+                self.stderr.write('Missing qualification problems of {}'.format(workshop.name))
+                continue
+            path = reverse('qualification_problems', args=[year.pk, workshop.name])
+            shutil.copyfile(workshop.qualification_problems.path, self.output_file(path, 'index.pdf'))
+            count += 1
+        return count
+
+    def output_file(self, path: str, filename: str) -> str:
+        # The URLs of the camp start with its year, which is the name of the output directory
+        parts: List[str] = path.strip('/').split('/')[1:]
+        directory = os.path.join(self.output_dir, *parts)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+
+    def render(self, path: str) -> bytes:
+        request = self.factory.get(path, secure=self.secure)
+        request.user = AnonymousUser()
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        request._messages = default_storage(request)
+
+        # The templates use it to highlight the current page
+        match = request.resolver_match = resolve(path)
+        response = match.func(request, *match.args, **match.kwargs)
+        if response.status_code != 200:
+            raise CommandError('{} responded with {}'.format(path, response.status_code))
+        return response.content
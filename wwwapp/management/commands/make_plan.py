@@ -0,0 +1,95 @@
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from wwwapp.models import Camp, plan_data
+from wwwapp.plan_optimizer import NUM_BLOCKS, PlanProblem, optimize
+
+"""
+Command assigning the accepted workshops of a camp to time blocks. Replaces the old make_plan.py script, which had to be
+fed with a saved dataForPlan JSON.
+"""
+
+
+class Command(BaseCommand):
+    help = 'Find a plan of the workshops of the given camp with as few collisions as possible'
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int, help='Year of the camp')
+        parser.add_argument('--blocks', type=int, default=NUM_BLOCKS, help='Number of time blocks')
+        parser.add_argument('--disallow', type=str, action='append', default=[], metavar='WID:BLOCK[,BLOCK...]',
+                            help='Do not place the workshop on the given blocks (numbered from 0), can be repeated')
+        parser.add_argument('--islands', type=int, default=8, help='Number of independent searches')
+        parser.add_argument('--population', type=int, default=100, help='Number of plans in every island')
+        parser.add_argument('--iterations', type=int, default=1000, help='Number of iterations of every island')
+        parser.add_argument('--time-limit', type=float, default=None, help='Stop every island after this many seconds')
+        parser.add_argument('--anneal', action='store_true',
+                            help='Use simulated annealing instead of the hill climb, which only accepts improvements')
+        parser.add_argument('--temperature', type=float, nargs=2, default=[30.0, 1.0], metavar=('START', 'END'),
+                            help='Starting and final temperature of the simulated annealing')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Number of worker processes (the number of CPUs by default)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+        parser.add_argument('--output', type=str, default=None, help='Write the plan as JSON to this file')
+
+    def handle(self, *args, **options):
+        year = Camp.objects.filter(pk=options['year']).first()
+        if year is None:
+            raise CommandError('Camp {} does not exist'.format(options['year']))
+
+        if options['anneal'] and not 0 < options['temperature'][1] <= options['temperature'][0]:
+            raise CommandError('The temperatures must be positive and the final one must not exceed the starting one')
+        disallowed = self.parse_disallowed(options['disallow'])
+        if any(not 0 <= block < options['blocks'] for blocks in disallowed.values() for block in blocks):
+            raise CommandError('Blocks are numbered from 0 to {}'.format(options['blocks'] - 1))
+        problem = PlanProblem(plan_data(year), options['blocks'], disallowed)
+        self.stderr.write('Planning {} workshops of {} users'.format(problem.num_workshops, len(problem.user_ids)))
+
+        start = time.perf_counter()
+        score, plan = optimize(problem, options['islands'], options['population'], options['iterations'],
+                               seed=options['seed'], workers=options['workers'], time_limit=options['time_limit'],
+                               temperature=tuple(options['temperature']) if options['anneal'] else None)
+        self.stderr.write('Finished in {:.1f}s'.format(time.perf_counter() - start))
+
+        blocks: List[List[int]] = [[] for _ in range(problem.num_blocks)]
+        for wid, block in zip(problem.workshop_ids, plan):
+            blocks[block].append(wid)
+        plan_array = np.array(plan, dtype=np.intp)
+        self.describe(problem, plan_array)
+
+        result = {
+            'score': score,
+            'penalties': problem.penalties(plan_array),
+            'blocks': blocks,
+        }
+        output = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def parse_disallowed(values: List[str]) -> Dict[int, List[int]]:
+        disallowed: Dict[int, List[int]] = {}
+        for value in values:
+            try:
+                wid, blocks = value.split(':')
+                disallowed.setdefault(int(wid), []).extend(int(block) for block in blocks.split(','))
+            except ValueError:
+                raise CommandError('Invalid --disallow value: {}'.format(value))
+        return disallowed
+
+    def describe(self, problem: PlanProblem, plan: np.ndarray) -> None:
+        collisions = problem.collisions(plan)
+        participants = problem.incidence.sum(axis=0)
+        for block in range(problem.num_blocks):
+            self.stderr.write('BLOCK {}'.format(block))
+            for i, workshop_block in enumerate(plan):
+                if workshop_block != block:
+                    continue
+                self.stderr.write(' * {} {} - participants: {}, collisions: {}'.format(
+                    problem.workshop_ids[i], problem.workshop_names[i], participants[i], collisions[i]))
@@ -0,0 +1,69 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from wwwapp.models import Camp, ParticipantSummary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ParticipantSummary table from scratch, or check if it is consistent with the source data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, default=None, help='Only process the given year')
+        parser.add_argument('--check', action='store_true',
+                            help='Do not write anything, only report the summaries that are out of date')
+
+    def handle(self, *args, **options):
+        years = Camp.objects.all()
+        if options['year'] is not None:
+            years = years.filter(pk=options['year'])
+            if not years.exists():
+                raise CommandError('Camp {} does not exist'.format(options['year']))
+
+        inconsistent = 0
+        for year in years:
+            if options['check']:
+                inconsistent += self.check_year(year)
+            else:
+                self.rebuild_year(year)
+
+        if options['check']:
+            if inconsistent:
+                raise CommandError('{} summaries are out of date'.format(inconsistent))
+            self.stdout.write('All summaries are up to date')
+
+    def rebuild_year(self, year: Camp) -> None:
+        with transaction.atomic():
+            summaries = ParticipantSummary.compute(year.pk)
+            ParticipantSummary.objects.filter(year=year).delete()
+            ParticipantSummary.objects.bulk_create(summaries.values())
+        self.stdout.write('{}: rebuilt {} summaries'.format(year, len(summaries)))
+
+    def check_year(self, year: Camp) -> int:
+        expected = ParticipantSummary.compute(year.pk)
+        stored = {summary.user_profile_id: summary for summary in ParticipantSummary.objects.filter(year=year)}
+
+        inconsistent = 0
+        for user_profile_id in sorted(set(expected) | set(stored)):
+            if user_profile_id not in stored:
+                self.stdout.write('{}: missing summary of UserProfile {}'.format(year, user_profile_id))
+            elif user_profile_id not in expected:
+                self.stdout.write('{}: summary of UserProfile {} should not exist'.format(year, user_profile_id))
+            else:
+                differences = [
+                    field for field in ParticipantSummary.SUMMARY_FIELDS
+                    if not self.values_equal(getattr(expected[user_profile_id], field), getattr(stored[user_profile_id], field))
+                ]
+                if not differences:
+                    continue
+                self.stdout.write('{}: summary of UserProfile {} differs in {}'.format(
+                    year, user_profile_id, ', '.join(differences)))
+            inconsistent += 1
+        return inconsistent
+
+    @staticmethod
+    def values_equal(a, b) -> bool:
+        if isinstance(a, float) and isinstance(b, float):
+            return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+        return a == b
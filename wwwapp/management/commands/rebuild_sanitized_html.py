@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wwwapp.models import Article, Workshop, UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored sanitized HTML of the rich-text fields, or check if it is up to date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Do not write anything, only report the rows that are out of date')
+
+    def handle(self, *args, **options):
+        outdated_count = 0
+        for model in (Article, Workshop, UserProfile):
+            outdated_count += self.process_model(model, options['check'])
+
+        if options['check']:
+            if outdated_count:
+                raise CommandError('{} rows are out of date'.format(outdated_count))
+            self.stdout.write('All sanitized fields are up to date')
+
+    def process_model(self, model, check: bool) -> int:
+        # The name of the article decides which tags are allowed
+        fields = ['name'] if model is Article else []
+        for field in model.SANITIZED_FIELDS:
+            fields += [field, field + '_clean_hash']
+
+        outdated_count = 0
+        for obj in model.objects.only(*fields).iterator():
+            changed = obj.outdated_sanitized_fields()
+            if not changed:
+                continue
+            outdated_count += 1
+            if check:
+                self.stdout.write('Sanitized HTML of {} {} is out of date'.format(model.__name__, obj.pk))
+            else:
+                # Only the recomputed columns are written, without sending the model signals
+                model.objects.filter(pk=obj.pk).update(**{column: getattr(obj, column) for column in changed})
+
+        if not check:
+            self.stdout.write('{}: updated {} rows'.format(model.__name__, outdated_count))
+        return outdated_count
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wwwapp.mail_queue import MailQueueWorker
+
+"""
+Worker sending the e-mails queued from the website (see wwwapp.mail_queue). By default it sends everything that is
+due and exits, so it can be run from cron; with --loop it keeps polling the queue.
+"""
+
+
+class Command(BaseCommand):
+    help = 'Send the queued e-mails over a single SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Number of recipients claimed at once (default: MAIL_QUEUE_BATCH_SIZE)')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Minimum number of seconds between two messages (default: MAIL_QUEUE_SEND_INTERVAL)')
+        parser.add_argument('--max-attempts', type=int, default=None,
+                            help='Give up on a recipient after this many attempts (default: MAIL_QUEUE_MAX_ATTEMPTS)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue instead of exiting')
+        parser.add_argument('--poll-interval', type=float, default=30,
+                            help='Seconds between checking the queue in the --loop mode')
+
+    def handle(self, *args, **options):
+        for option in ('batch_size', 'max_attempts'):
+            if options[option] is not None and options[option] < 1:
+                raise CommandError('--{} has to be positive'.format(option.replace('_', '-')))
+        if options['interval'] is not None and options['interval'] < 0:
+            raise CommandError('--interval cannot be negative')
+
+        try:
+            worker = MailQueueWorker(batch_size=options['batch_size'], send_interval=options['interval'],
+                                     max_attempts=options['max_attempts'])
+        except ValueError as e:
+            raise CommandError('{} (see MAIL_QUEUE_LEASE)'.format(e))
+        while True:
+            processed, batches = worker.run()
+            if processed:
+                self.stdout.write('Processed {} recipients in {} batches'.format(processed, batches))
+            if not options['loop']:
+                break
+            time.sleep(options['poll_interval'])
@@ -0,0 +1,32 @@
+# Generated by Django 3.1.8 on 2026-10-18 19:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wwwapp', '0074_workshop_short_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipantSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.FloatField(default=0)),
+                ('workshop_count', models.PositiveIntegerField(default=0)),
+                ('accepted_workshop_count', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('Z', 'Zaakceptowany'), ('O', 'Odrzucony'), ('X', 'Odwołany')], default=None, max_length=10, null=True)),
+                ('has_completed_profile', models.BooleanField(default=False)),
+                ('has_cover_letter', models.BooleanField(default=False)),
+                ('birth', models.DateField(default=None, null=True)),
+                ('user_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='wwwapp.userprofile')),
+                ('year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wwwapp.camp')),
+            ],
+            options={
+                'unique_together': {('year', 'user_profile')},
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.1.8 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wwwapp', '0076_queuedmail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='content_clean',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='content_clean_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='cover_letter_clean',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='cover_letter_clean_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='profile_page_clean',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='profile_page_clean_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='workshop',
+            name='page_content_clean',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='workshop',
+            name='page_content_clean_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.1.8 on 2026-10-18 20:25
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+
+
+def backfill_article_updated_at(apps, schema_editor):
+    # The new column is set to the time of the migration, but the articles know when their content last changed
+    Article = apps.get_model("wwwapp", "Article")
+    ArticleContentHistory = apps.get_model("wwwapp", "ArticleContentHistory")
+    last_change = ArticleContentHistory.objects.filter(article=OuterRef('pk'), time__isnull=False).order_by('-time')
+    Article.objects.filter(Exists(last_change)).update(updated_at=Subquery(last_change.values('time')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wwwapp', '0077_sanitized_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='camp',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='workshop',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_article_updated_at, migrations.RunPython.noop),
+    ]
@@ -2,20 +2,74 @@ import os
 import threading
 import urllib.parse
 import datetime
-from typing import Dict, Set, Optional, Collection
+from typing import Any, Dict, Iterable, List, Set, Optional, Collection
 
 from django.conf import settings
-from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.contrib.auth.models import User, Group
 from django.core.exceptions import ValidationError, SuspiciousOperation
 from django.core.files.storage import FileSystemStorage
-from django.db import models
+from django.db import connection, models
+from django.db.models import Case, When, Value, F, Exists, OuterRef, Subquery, ExpressionWrapper
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, NullIf
 from django.db.models.query_utils import Q
-from django.db.models.signals import post_save, pre_save, pre_delete
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete, m2m_changed
 from django.dispatch.dispatcher import receiver
 from django.utils import timezone
 from django.utils.deconstruct import deconstructible
 from django.utils.functional import cached_property
 
+from wwwforms.models import Form, FormQuestion, FormQuestionAnswer, user_birth_date
+from .caching import cached, get_generation, bump_generation
+from .freezing import unfreeze_camps
+from .sanitization import SanitizedHTMLMixin, bleach_options
+
+
+# Cache keys for data used on every page (see wwwapp.views.get_context)
+MENUBAR_ARTICLES_CACHE_KEY = 'navigation:articles_on_menubar'
+ALL_CAMPS_CACHE_KEY = 'navigation:years'
+VISIBLE_RESOURCES_CACHE_KEY = 'navigation:visible_resources'
+# Bump the version whenever the fields of Camp change, so that workers never unpickle outdated objects
+CURRENT_CAMP_CACHE_KEY = 'current_camp:v2'
+# Generation of all cached per-user participation data
+PARTICIPATION_GENERATION = 'participation'
+# Generation of the contents of the ResourceYearPermission table
+RESOURCE_PERMISSIONS_GENERATION = 'resource_permissions'
+# Generation of all cached user permissions
+PERMISSIONS_GENERATION = 'permissions'
+# Generation of the cached data_for_plan_view responses
+PLAN_DATA_GENERATION = 'plan_data'
+# Generation of the cached co-registration matrices of all years (see also coregistration_generation())
+COREGISTRATION_GENERATION = 'coregistration'
+# Generation of the rendered programs of all years (see also program_generation())
+PROGRAM_GENERATION = 'program'
+# Generation of the list of links offered by the rich-text editor (see wwwapp.views.article_name_list_view)
+LINK_LIST_GENERATION = 'link_list'
+# Generation of the navigation shown on every page (the menubar articles and the list of camps)
+NAVIGATION_GENERATION = 'navigation'
+
+
+def program_generation(year_id: int) -> str:
+    """
+    Name of the generation of the rendered program of a single year
+    """
+    return '{}:{}'.format(PROGRAM_GENERATION, year_id)
+
+
+def coregistration_generation(year_id: int) -> str:
+    """
+    Name of the generation of the cached co-registration matrix of a single year
+    """
+    return '{}:{}'.format(COREGISTRATION_GENERATION, year_id)
+
+
+def invalidate_program_of_year(year_id: Optional[int] = None) -> None:
+    """
+    Invalidates the cached program and the frozen pages of the camp (of all camps if year_id is None)
+    """
+    bump_generation(PROGRAM_GENERATION if year_id is None else program_generation(year_id))
+    unfreeze_camps(year_id)
+
 
 # This is a separate directory for Django-controlled uploaded files.
 # Unlike /media, this directory is not directly externally accesible,
@@ -36,6 +90,7 @@ class Camp(models.Model):
     proposal_end_date = models.DateField(null=True, blank=True)
     start_date = models.DateField(null=True, blank=True)
     end_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def clean(self):
         if (self.start_date is not None) != (self.end_date is not None):
@@ -72,22 +127,41 @@ class Camp(models.Model):
         return self.is_qualification_editable()
 
     @staticmethod
-    def current():
+    def current() -> 'Camp':
+        """
+        The latest Camp. The value is kept in the shared cache (invalidated when any Camp is saved or deleted),
+        and additionally memoized for the duration of a request by cache_latest_camp_middleware.
+        """
         if hasattr(_latest_camp, 'v'):
             return _latest_camp.v
-        else:
-            return Camp.objects.latest()
+        camp = cache.get(CURRENT_CAMP_CACHE_KEY)
+        if camp is None:
+            camp = Camp.objects.latest()
+            cache.set(CURRENT_CAMP_CACHE_KEY, camp, settings.CACHE_SAFETY_TIMEOUT)
+        if getattr(_latest_camp, 'in_request', False):
+            _latest_camp.v = camp
+        return camp
 
 
 def cache_latest_camp_middleware(get_response):
     def middleware(request):
-        _latest_camp.v = Camp.objects.latest()
-        response = get_response(request)
-        del _latest_camp.v
-        return response
+        # The current camp is loaded lazily on the first call to Camp.current()
+        _latest_camp.in_request = True
+        try:
+            return get_response(request)
+        finally:
+            _latest_camp.__dict__.clear()
     return middleware
 
 
+@receiver(post_save, sender=Camp)
+@receiver(post_delete, sender=Camp)
+def invalidate_current_camp(sender, **kwargs):
+    cache.delete(CURRENT_CAMP_CACHE_KEY)
+    if hasattr(_latest_camp, 'v'):
+        del _latest_camp.v
+
+
 @receiver(pre_delete, sender=Camp)
 def protect_last_camp(sender, instance, using, **kwargs):
     # I'm way too lazy to check if current_year exists everywhere,
@@ -99,7 +173,36 @@ def protect_last_camp(sender, instance, using, **kwargs):
         raise ValidationError('At least one Camp object must exist')
 
 
-class UserProfile(models.Model):
+class UserProfileQuerySet(models.QuerySet):
+    def with_year_scores(self, year: Camp) -> 'UserProfileQuerySet':
+        """
+        Annotates every profile with the qualification figures for the given year, as shown on the participants page:
+        points (sum of result percentages), workshop_count and accepted_workshop_count.
+        Every figure is a separate subquery, so the annotations are not affected by other joins in the queryset.
+        """
+        participations = WorkshopParticipant.objects \
+            .filter(participant=OuterRef('pk'), workshop__year=year) \
+            .with_scores() \
+            .values('participant')
+
+        def aggregate(expression, output_field):
+            return Coalesce(Subquery(participations.annotate(value=expression).values('value'), output_field=output_field),
+                            Value(0), output_field=output_field)
+
+        return self.annotate(
+            points=aggregate(models.Sum('percent'), models.DecimalField()),
+            workshop_count=aggregate(models.Count('pk'), models.IntegerField()),
+            accepted_workshop_count=aggregate(models.Count('pk', filter=Q(qualified=True)), models.IntegerField()),
+        )
+
+    def with_birth_date(self) -> 'UserProfileQuerySet':
+        """
+        Annotates every profile with birth_date, taken from the first filled in PESEL question (None if unknown)
+        """
+        return self.annotate(birth_date=user_birth_date('user_id'))
+
+
+class UserProfile(SanitizedHTMLMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
 
     gender = models.CharField(max_length=10, choices=[('M', 'Mężczyzna'), ('F', 'Kobieta'),],
@@ -109,6 +212,22 @@ class UserProfile(models.Model):
     how_do_you_know_about = models.CharField(max_length=1000, default="", blank=True)
     profile_page = models.TextField(max_length=100000, blank=True, default="")
     cover_letter = models.TextField(max_length=100000, blank=True, default="")
+    profile_page_clean = models.TextField(blank=True, default="", editable=False)
+    profile_page_clean_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+    cover_letter_clean = models.TextField(blank=True, default="", editable=False)
+    cover_letter_clean_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+
+    SANITIZED_FIELDS = ['profile_page', 'cover_letter']
+
+    objects = UserProfileQuerySet.as_manager()
+
+    @property
+    def profile_page_html(self):
+        return self.sanitized('profile_page')
+
+    @property
+    def cover_letter_html(self):
+        return self.sanitized('cover_letter')
 
     def is_participating_in(self, year: Camp) -> bool:
         return self.is_participant_in(year) or self.is_lecturer_in(year)
@@ -152,6 +271,24 @@ class UserProfile(models.Model):
             data.append({'year': year, 'status': status, 'type': participation_type, 'workshops': workshops})
         return data
 
+    @staticmethod
+    def participation_year_ids_for_user(user_id: int) -> Set[int]:
+        """
+        Cached version of all_participation_years which does not require the UserProfile object to be loaded
+        :return: set of Camp primary keys
+        """
+        def compute():
+            participant_years = WorkshopUserProfile.objects \
+                .filter(user_profile__user_id=user_id, status=WorkshopUserProfile.STATUS_ACCEPTED) \
+                .values_list('year_id', flat=True)
+            lecturer_years = Workshop.objects \
+                .filter(lecturer__user_id=user_id, status=Workshop.STATUS_ACCEPTED) \
+                .values_list('year_id', flat=True)
+            return set(participant_years).union(lecturer_years)
+
+        key = 'participation_years:{}:{}'.format(get_generation(PARTICIPATION_GENERATION), user_id)
+        return cached(key, compute)
+
     def all_participation_years(self) -> Set[Camp]:
         """
         All years user was qualified or had a lecture
@@ -266,21 +403,35 @@ class ArticleContentHistory(models.Model):
         super(ArticleContentHistory, self).save(*args, **kwargs)
 
 
-class Article(models.Model):
+class Article(SanitizedHTMLMixin, models.Model):
     name = models.SlugField(max_length=50, null=False, blank=False, unique=True)
     title = models.CharField(max_length=50, null=True, blank=True)
     content = models.TextField(max_length=100000, blank=True)
+    content_clean = models.TextField(blank=True, default="", editable=False)
+    content_clean_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
     modified_by = models.ForeignKey(User, null=True, default=None, on_delete=models.SET_NULL)
     on_menubar = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0, blank=False, null=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         permissions = (('can_put_on_menubar', 'Can put on menubar'),)
         ordering = ['order']
 
+    SANITIZED_FIELDS = ['content']
+
     def content_history(self):
         return ArticleContentHistory.objects.filter(article=self).order_by('-version')
 
+    def sanitization_options(self, field: str) -> Dict:
+        if self.name == 'index':
+            return bleach_options(extra_tags=['iframe'])  # Allow iframe on main page for Facebook embed
+        return bleach_options()
+
+    @property
+    def content_html(self):
+        return self.sanitized('content')
+
     def __str__(self):
         return '{} "{}"'.format(self.name, self.title)
 
@@ -315,7 +466,7 @@ class WorkshopType(models.Model):
         return '%s: %s' % (self.year, self.name)
 
 
-class Workshop(models.Model):
+class Workshop(SanitizedHTMLMixin, models.Model):
     """
     Workshop taking place during a specific workshop/year
     """
@@ -341,6 +492,8 @@ class Workshop(models.Model):
     short_description = models.CharField(max_length=140, blank=True)
     page_content = models.TextField(max_length=100000, blank=True)
     page_content_is_public = models.BooleanField(default=False)
+    page_content_clean = models.TextField(blank=True, default="", editable=False)
+    page_content_clean_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
 
     is_qualifying = models.BooleanField(default=True)
     qualification_problems = models.FileField(null=True, blank=True, upload_to="qualification", storage=UploadStorage())
@@ -348,6 +501,13 @@ class Workshop(models.Model):
     participants = models.ManyToManyField(UserProfile, blank=True, related_name='workshops', through='WorkshopParticipant')
     qualification_threshold = models.DecimalField(null=True, blank=True, decimal_places=1, max_digits=5)
     max_points = models.DecimalField(null=True, blank=True, decimal_places=1, max_digits=5)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    SANITIZED_FIELDS = ['page_content']
+
+    @property
+    def page_content_html(self):
+        return self.sanitized('page_content')
 
     def is_workshop_editable(self) -> bool:
         return self.year.are_workshops_editable()
@@ -416,6 +576,44 @@ class Workshop(models.Model):
         return self.workshopparticipant_set.aggregate(max_points=models.Max('qualification_result'))['max_points']
 
 
+class WorkshopParticipantQuerySet(models.QuerySet):
+    def with_scores(self) -> 'WorkshopParticipantQuerySet':
+        """
+        Annotates every participation with the database equivalents of result_in_percent() (percent) and
+        is_qualified() (qualified), and with has_solution. The max_entered_points fallback is computed with
+        a subquery instead of a separate aggregate query for every workshop, and annotated as max_points
+        (None if there are no points to compare with).
+        """
+        max_entered_points = WorkshopParticipant.objects \
+            .filter(workshop=OuterRef('workshop')) \
+            .values('workshop') \
+            .annotate(max_points=models.Max('qualification_result')) \
+            .values('max_points')
+        max_points = NullIf(Coalesce('workshop__max_points', Subquery(max_entered_points)), Value(0))
+        # SQLite stores whole decimals as integers and would divide them as integers (1 of 3 points giving 33%)
+        percent = ExpressionWrapper(Cast('qualification_result', models.FloatField()) * Value(100) / F('max_points'),
+                                    output_field=models.DecimalField())
+
+        return self.annotate(max_points=max_points).annotate(
+            percent=Case(
+                When(workshop__is_qualifying=False, then=Value(None)),
+                When(qualification_result__isnull=True, then=Value(None)),
+                # GREATEST and LEAST skip NULLs in PostgreSQL, so they would turn a missing maximum into 0 or 150%
+                When(max_points__isnull=True, then=Value(None)),
+                default=Greatest(Least(percent, Value(settings.MAX_POINTS_PERCENT)), Value(0)),
+                output_field=models.DecimalField(),
+            ),
+            qualified=Case(
+                When(workshop__is_qualifying=False, then=Value(None)),
+                When(Q(workshop__qualification_threshold__isnull=True) | Q(qualification_result__isnull=True), then=Value(None)),
+                When(qualification_result__gte=F('workshop__qualification_threshold'), then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField(null=True),
+            ),
+            has_solution=Exists(Solution.objects.filter(workshop_participant=OuterRef('pk'))),
+        )
+
+
 class WorkshopParticipant(models.Model):
     workshop = models.ForeignKey(Workshop, on_delete=models.CASCADE)
     participant = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
@@ -423,6 +621,8 @@ class WorkshopParticipant(models.Model):
     qualification_result = models.DecimalField(null=True, blank=True, decimal_places=1, max_digits=5, verbose_name='Liczba punktów')
     comment = models.TextField(max_length=10000, null=True, default=None, blank=True, verbose_name='Komentarz')
 
+    objects = WorkshopParticipantQuerySet.as_manager()
+
     def is_qualified(self):
         if not self.workshop.is_qualifying:
             return None
@@ -455,6 +655,244 @@ class Solution(models.Model):
     message = models.TextField(blank=True, verbose_name='Komentarz dla prowadzącego', help_text='Nie wpisuj rozwiązań w tym polu - załącz je jako plik. To pole jest przeznaczone jedynie na szybkie uwagi typu "poprawiłem plik X"')
 
 
+class ParticipantSummary(models.Model):
+    """
+    Denormalized per-year figures of a participant (anyone who signed up for at least one workshop in the given year)
+    shown on the participants page. Kept up to date by the signal handlers at the end of this file. Missing summaries
+    are created when the participants page is shown, but changes made without signals (e.g. QuerySet.update()) require
+    running the rebuild_participant_summaries command.
+    """
+    year = models.ForeignKey(Camp, on_delete=models.CASCADE, related_name='+')
+    user_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='summaries')
+
+    points = models.FloatField(default=0)
+    workshop_count = models.PositiveIntegerField(default=0)
+    accepted_workshop_count = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=WorkshopUserProfile.STATUS_CHOICES, null=True, default=None)
+    has_completed_profile = models.BooleanField(default=False)
+    has_cover_letter = models.BooleanField(default=False)
+    birth = models.DateField(null=True, default=None)
+
+    SUMMARY_FIELDS = ['points', 'workshop_count', 'accepted_workshop_count', 'status', 'has_completed_profile',
+                      'has_cover_letter', 'birth']
+
+    class Meta:
+        unique_together = [('year', 'user_profile')]
+
+    def __str__(self):
+        return '{}: {}'.format(self.year, self.user_profile)
+
+    @classmethod
+    def compute(cls, year_id: int, user_profile_ids: Optional[Collection[int]] = None) -> Dict[int, 'ParticipantSummary']:
+        """
+        Computes (without saving) the summaries of all participants of the given year, or only of the given people
+        :return: dict mapping UserProfile ids to unsaved ParticipantSummary objects
+        """
+        participants = UserProfile.objects.filter(
+            Exists(WorkshopParticipant.objects.filter(participant=OuterRef('pk'), workshop__year_id=year_id)))
+        if user_profile_ids is not None:
+            participants = participants.filter(pk__in=user_profile_ids)
+
+        statuses = dict(WorkshopUserProfile.objects
+                        .filter(year_id=year_id, user_profile__in=participants.values('pk'))
+                        .values_list('user_profile_id', 'status'))
+        summaries = {}
+        for participant in participants.with_year_scores(year_id).with_birth_date().select_related('user'):
+            summaries[participant.pk] = cls(
+                year_id=year_id,
+                user_profile_id=participant.pk,
+                points=float(participant.points),
+                workshop_count=participant.workshop_count,
+                accepted_workshop_count=participant.accepted_workshop_count,
+                status=statuses.get(participant.pk),
+                has_completed_profile=participant.is_completed,
+                has_cover_letter=bool(participant.cover_letter and len(participant.cover_letter) > 50),
+                birth=participant.birth_date,
+            )
+        return summaries
+
+    @classmethod
+    def refresh(cls, year_id: int, user_profile_ids: Collection[int], create: bool = True) -> None:
+        """
+        Recomputes the stored summaries of the given people in the given year. Summaries of people that no longer
+        participate in that year are removed. If create is False, only already existing summaries are updated
+        (used while deleting objects, when the person may be in the middle of being deleted).
+        """
+        user_profile_ids = set(user_profile_ids)
+        if not user_profile_ids:
+            return
+        computed = cls.compute(year_id, user_profile_ids)
+        existing = dict(cls.objects.filter(year_id=year_id, user_profile_id__in=user_profile_ids)
+                        .values_list('user_profile_id', 'pk'))
+
+        cls.objects.filter(pk__in=[pk for profile_id, pk in existing.items() if profile_id not in computed]).delete()
+        to_update = []
+        to_create = []
+        for profile_id, summary in computed.items():
+            if profile_id in existing:
+                summary.pk = existing[profile_id]
+                to_update.append(summary)
+            elif create:
+                to_create.append(summary)
+        cls.objects.bulk_update(to_update, cls.SUMMARY_FIELDS)
+        cls.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    @classmethod
+    def create_missing(cls, year_id: int) -> None:
+        """
+        Computes the summaries of the participants of the given year that don't have one yet, e.g. of the years that
+        existed before summaries were introduced
+        """
+        missing = WorkshopParticipant.objects \
+            .filter(workshop__year_id=year_id) \
+            .exclude(Exists(cls.objects.filter(year_id=year_id, user_profile=OuterRef('participant')))) \
+            .values_list('participant_id', flat=True)
+        cls.refresh(year_id, missing)
+
+    @classmethod
+    def refresh_all_years(cls, user_profile_id: int) -> None:
+        """
+        Updates all existing summaries of a person, after a change in the data that does not depend on the year
+        """
+        for year_id in cls.objects.filter(user_profile_id=user_profile_id).values_list('year_id', flat=True):
+            cls.refresh(year_id, [user_profile_id], create=False)
+
+
+class CoRegistrationMatrix:
+    """
+    For every pair of accepted workshops of a year, the number of people taking part in both of them (as participants
+    or lecturers). The diagonal holds the number of people in the workshop. The matrix is cached, and registration
+    changes only invalidate the matrix of the year of the changed workshop (see the signal handlers at the end of this
+    file).
+    """
+    _MEMBERS_SQL = """
+        SELECT wp.workshop_id AS workshop_id, wp.participant_id AS user_profile_id
+        FROM {participant} wp INNER JOIN {workshop} w ON w.id = wp.workshop_id
+        WHERE w.year_id = %s AND w.status = %s
+        UNION
+        SELECT l.workshop_id, l.userprofile_id
+        FROM {lecturer} l INNER JOIN {workshop} w ON w.id = l.workshop_id
+        WHERE w.year_id = %s AND w.status = %s
+    """
+
+    @classmethod
+    def compute_counts(cls, year_id: int) -> Dict[int, Dict[int, int]]:
+        """
+        Computes the non-zero counts with a single self-join of the workshop members
+        :return: dict mapping workshop ids to dicts mapping workshop ids to counts
+        """
+        members = cls._MEMBERS_SQL.format(participant=WorkshopParticipant._meta.db_table,
+                                          workshop=Workshop._meta.db_table,
+                                          lecturer=Workshop.lecturer.through._meta.db_table)
+        params = [year_id, Workshop.STATUS_ACCEPTED, year_id, Workshop.STATUS_ACCEPTED]
+        sql = """
+            WITH members AS ({members})
+            SELECT a.workshop_id, b.workshop_id, COUNT(*)
+            FROM members a INNER JOIN members b ON a.user_profile_id = b.user_profile_id
+            GROUP BY a.workshop_id, b.workshop_id
+        """.format(members=members)
+
+        counts: Dict[int, Dict[int, int]] = {}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for first, second, count in cursor.fetchall():
+                counts.setdefault(first, {})[second] = count
+        return counts
+
+    @classmethod
+    def _cache_key(cls, year_id: int) -> str:
+        return 'coregistration:{}:{}:{}'.format(get_generation(COREGISTRATION_GENERATION),
+                                                get_generation(coregistration_generation(year_id)), year_id)
+
+    @classmethod
+    def _compute(cls, year_id: int) -> Dict[str, Any]:
+        workshops = list(Workshop.objects.filter(year_id=year_id, status=Workshop.STATUS_ACCEPTED)
+                         .order_by('pk').values_list('id', 'title'))
+        return {'workshops': workshops, 'counts': cls.compute_counts(year_id)}
+
+    @classmethod
+    def get(cls, year_id: int) -> Dict[str, Any]:
+        """
+        :return: {'workshops': [(id, title), ...], 'counts': {id: {id: count}}} with only the non-zero counts
+        """
+        return cached(cls._cache_key(year_id), lambda: cls._compute(year_id))
+
+    @staticmethod
+    def as_rows(data: Dict[str, Any]) -> List[List[int]]:
+        """
+        The full matrix, with rows and columns in the order of data['workshops']
+        :param data: the result of get(), which is read once by the caller, so that the workshops and the counts come
+            from the same version of the matrix
+        """
+        ids = [workshop_id for workshop_id, _ in data['workshops']]
+        return [[data['counts'].get(first, {}).get(second, 0) for second in ids] for first in ids]
+
+
+def _clean_plan_date(date: Optional[datetime.date], min: Optional[datetime.date], max: Optional[datetime.date],
+                     default: Optional[datetime.date]) -> Optional[datetime.date]:
+    if date is None or (min is not None and date < min) or (max is not None and date > max):
+        return default
+    return date
+
+
+def plan_data(year: Camp) -> Dict[str, Any]:
+    """
+    Accepted workshops of the camp, with their accepted participants and lecturers, built from a few values() queries
+    """
+    workshops = list(Workshop.objects.filter(status='Z', year=year).order_by('pk').values_list('id', 'title'))
+    workshop_ids = [workshop_id for workshop_id, _ in workshops]
+    workshop_lecturers = {workshop_id: [] for workshop_id in workshop_ids}
+    for workshop_id, profile_id in Workshop.lecturer.through.objects \
+            .filter(workshop_id__in=workshop_ids).order_by('pk').values_list('workshop_id', 'userprofile_id'):
+        workshop_lecturers[workshop_id].append(profile_id)
+
+    participant_names = {
+        profile_id: '{} {}'.format(first_name, last_name).strip()
+        for profile_id, first_name, last_name in UserProfile.objects
+        .filter(workshop_profile__year=year, workshop_profile__status='Z')
+        .order_by('pk').values_list('id', 'user__first_name', 'user__last_name')
+    }
+    lecturer_ids = {profile_id for lecturers in workshop_lecturers.values() for profile_id in lecturers}
+    lecturer_names = {
+        profile_id: '{} {}'.format(first_name, last_name).strip()
+        for profile_id, first_name, last_name in UserProfile.objects
+        .filter(pk__in=lecturer_ids - participant_names.keys())
+        .order_by('pk').values_list('id', 'user__first_name', 'user__last_name')
+    }
+
+    users = []
+    for user_type, names in [('Lecturer', lecturer_names), ('Participant', participant_names)]:
+        for profile_id, name in names.items():
+            users.append({'uid': profile_id, 'name': name, 'type': user_type})
+    user_ids = lecturer_names.keys() | participant_names.keys()
+
+    if year == Camp.current():
+        # TODO: Form data is valid for the current year only
+        answers = FormQuestionAnswer.objects.filter(question__form__is_visible=True, user__userprofile__in=user_ids,
+                                                    value_date__isnull=False)
+        start_dates = dict(answers.filter(question=F('question__form__arrival_date'))
+                           .values_list('user__userprofile__id', 'value_date'))
+        end_dates = dict(answers.filter(question=F('question__form__departure_date'))
+                         .values_list('user__userprofile__id', 'value_date'))
+
+        for user in users:
+            user.update({
+                'start': _clean_plan_date(start_dates.get(user['uid']), year.start_date, year.end_date, year.start_date),
+                'end': _clean_plan_date(end_dates.get(user['uid']), year.start_date, year.end_date, year.end_date),
+            })
+
+    participation = WorkshopParticipant.objects \
+        .filter(workshop_id__in=workshop_ids, participant_id__in=user_ids) \
+        .order_by('pk').values_list('workshop_id', 'participant_id')
+
+    return {
+        'workshops': [{'wid': workshop_id, 'name': title, 'lecturers': workshop_lecturers[workshop_id]}
+                      for workshop_id, title in workshops],
+        'users': users,
+        'participation': [{'wid': workshop_id, 'uid': participant_id} for workshop_id, participant_id in participation],
+    }
+
+
 def solutions_dir(instance, filename):
     workshop_participant = instance.solution.workshop_participant
     return f'solutions/{workshop_participant.workshop.year.pk}/{workshop_participant.workshop.name}/{workshop_participant.participant.user.pk}/{filename}'
@@ -518,6 +956,38 @@ class SolutionFile(models.Model):
         return os.path.basename(self.file.path) + (' (usunięty)' if self.deleted else '')
 
 
+class _ResourcePrefixTrie:
+    """
+    Maps ResourceYearPermission.root_path (split into path components) to the years that grant access to it
+    """
+    def __init__(self):
+        self.year_ids: Set[int] = set()
+        self.children: Dict[str, '_ResourcePrefixTrie'] = {}
+
+    def insert(self, path_parts: List[str], year_id: int) -> None:
+        node = self
+        for part in path_parts:
+            node = node.children.setdefault(part, _ResourcePrefixTrie())
+        node.year_ids.add(year_id)
+
+    def lookup(self, path_parts: List[str]) -> Set[int]:
+        """
+        Returns the years of all root paths that are a prefix of the given path
+        """
+        node = self
+        year_ids = set(node.year_ids)
+        for part in path_parts:
+            node = node.children.get(part)
+            if node is None:
+                break
+            year_ids |= node.year_ids
+        return year_ids
+
+
+# (generation, trie) - rebuilt in every process when RESOURCE_PERMISSIONS_GENERATION changes
+_resource_prefix_trie = (None, _ResourcePrefixTrie())
+
+
 class ResourceYearPermission(models.Model):
     """
     Resource associated with a WWW edition (year). Resource can be accessed by
@@ -547,13 +1017,17 @@ class ResourceYearPermission(models.Model):
             self.root_path = "/" + self.root_path
 
     @staticmethod
-    def resources_for_uri(uri: str):
+    def _split_uri(uri: str) -> List[str]:
         scheme, netloc, path, query, fragment = urllib.parse.urlsplit(uri)
         path = os.path.normpath(path)  # normalize path
         path_parts = path.split('/')
         if path_parts[0] != "":
             raise SuspiciousOperation("Path has to start with /")
-        path_parts = path_parts[1:]
+        return path_parts[1:]
+
+    @staticmethod
+    def resources_for_uri(uri: str):
+        path_parts = ResourceYearPermission._split_uri(uri)
 
         query = Q(pk__isnull=True)  # always false
         for i in range(len(path_parts)+1):
@@ -562,6 +1036,296 @@ class ResourceYearPermission(models.Model):
         # We check all root_url that are prefixes of received url
         return ResourceYearPermission.objects.filter(query)
 
+    @staticmethod
+    def year_ids_for_uri(uri: str) -> Set[int]:
+        """
+        Same as resources_for_uri, but only returns the years and doesn't query the database unless
+        the permission table changed since the last call (in any process)
+        """
+        global _resource_prefix_trie
+        path_parts = ResourceYearPermission._split_uri(uri)
+
+        generation = get_generation(RESOURCE_PERMISSIONS_GENERATION)
+        if _resource_prefix_trie[0] != generation:
+            trie = _ResourcePrefixTrie()
+            for root_path, year_id in ResourceYearPermission.objects.values_list('root_path', 'year_id'):
+                if root_path.startswith('/'):
+                    trie.insert(root_path[1:].split('/') if root_path != '/' else [], year_id)
+            _resource_prefix_trie = (generation, trie)
+
+        return _resource_prefix_trie[1].lookup(path_parts)
+
     class Meta:
         permissions = [('access_all_resources', 'Access all resources'), ]
         ordering = ['year', 'display_name']
+
+
+class QueuedMail(models.Model):
+    """
+    E-mail to a group of people. Web requests only put it in the queue, it's sent in the background by the
+    send_queued_mail command (see wwwapp.mail_queue)
+    """
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    recipients_description = models.CharField(max_length=300, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return '{} ({})'.format(self.subject, self.created_at)
+
+
+class QueuedMailRecipient(models.Model):
+    STATUS_PENDING = 'P'
+    STATUS_SENT = 'S'
+    STATUS_FAILED = 'F'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Oczekuje'),
+        (STATUS_SENT, 'Wysłany'),
+        (STATUS_FAILED, 'Błąd'),
+    ]
+
+    mail = models.ForeignKey(QueuedMail, on_delete=models.CASCADE, related_name='recipients')
+    email = models.EmailField()
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # The recipient is not picked up by the worker before this time (used for the retries and as a lease while sending)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = [('mail', 'email')]
+        index_together = [('status', 'next_attempt_at')]
+
+    def __str__(self):
+        return '{}: {}'.format(self.mail, self.email)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_menubar_articles(sender, instance, **kwargs):
+    menubar_articles = cache.get(MENUBAR_ARTICLES_CACHE_KEY)
+    cache.delete(MENUBAR_ARTICLES_CACHE_KEY)
+    bump_generation(NAVIGATION_GENERATION)
+    # The menubar is a part of the frozen pages
+    if instance.on_menubar or menubar_articles is None or instance in menubar_articles:
+        unfreeze_camps()
+
+
+@receiver(post_save, sender=Camp)
+@receiver(post_delete, sender=Camp)
+def invalidate_all_camps(sender, **kwargs):
+    cache.delete(ALL_CAMPS_CACHE_KEY)
+    bump_generation(NAVIGATION_GENERATION)
+
+
+@receiver(post_save, sender=ResourceYearPermission)
+@receiver(post_delete, sender=ResourceYearPermission)
+def invalidate_visible_resources(sender, **kwargs):
+    cache.delete(VISIBLE_RESOURCES_CACHE_KEY)
+    bump_generation(RESOURCE_PERMISSIONS_GENERATION)
+
+
+@receiver(post_save, sender=WorkshopUserProfile)
+@receiver(post_delete, sender=WorkshopUserProfile)
+@receiver(post_save, sender=Workshop)
+@receiver(post_delete, sender=Workshop)
+@receiver(m2m_changed, sender=Workshop.lecturer.through)
+def invalidate_participation(sender, **kwargs):
+    bump_generation(PARTICIPATION_GENERATION)
+
+
+@receiver(post_save, sender=Camp)
+@receiver(post_delete, sender=Camp)
+@receiver(post_save, sender=Workshop)
+@receiver(post_delete, sender=Workshop)
+@receiver(m2m_changed, sender=Workshop.lecturer.through)
+@receiver(post_save, sender=WorkshopParticipant)
+@receiver(post_delete, sender=WorkshopParticipant)
+@receiver(post_save, sender=WorkshopUserProfile)
+@receiver(post_delete, sender=WorkshopUserProfile)
+@receiver(post_save, sender=Form)
+def invalidate_plan_data(sender, **kwargs):
+    bump_generation(PLAN_DATA_GENERATION)
+
+
+def invalidate_plan_data_for_answers(answers: Iterable[FormQuestionAnswer]) -> None:
+    """
+    Called by the signal handler below, and directly after writing the answers in bulk (which sends no signals)
+    """
+    # Only the arrival and departure dates are used in the plan
+    if any(answer.question.data_type == FormQuestion.TYPE_DATE for answer in answers):
+        bump_generation(PLAN_DATA_GENERATION)
+
+
+@receiver(post_save, sender=FormQuestionAnswer)
+@receiver(post_delete, sender=FormQuestionAnswer)
+def invalidate_plan_data_for_answer(sender, instance, **kwargs):
+    invalidate_plan_data_for_answers([instance])
+
+
+@receiver(post_save, sender=User)
+def invalidate_plan_data_for_user(sender, instance, created, update_fields, **kwargs):
+    # Only the names are used in the plan, in particular logging in should not invalidate anything
+    if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+        return
+    bump_generation(PLAN_DATA_GENERATION)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_save, sender=User)
+def invalidate_permissions(sender, update_fields=None, **kwargs):
+    # Logging in only updates last_login, which must not flush the permissions of everyone
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_generation(PERMISSIONS_GENERATION)
+
+
+@receiver(post_save, sender=WorkshopParticipant)
+@receiver(post_delete, sender=WorkshopParticipant)
+def update_participant_summary_for_participation(sender, instance, **kwargs):
+    workshop = Workshop.objects.filter(pk=instance.workshop_id).first()
+    if workshop is None:
+        # The workshop is being deleted
+        ParticipantSummary.refresh_all_years(instance.participant_id)
+        return
+    if workshop.max_points is None:
+        # Percentages of everyone in this workshop depend on the max_entered_points
+        user_profile_ids = set(workshop.workshopparticipant_set.values_list('participant_id', flat=True))
+        user_profile_ids.add(instance.participant_id)
+    else:
+        user_profile_ids = [instance.participant_id]
+    ParticipantSummary.refresh(workshop.year_id, user_profile_ids, create='created' in kwargs)
+
+
+@receiver(post_save, sender=Workshop)
+def update_participant_summary_for_workshop(sender, instance, created, **kwargs):
+    if created:
+        return
+    ParticipantSummary.refresh(instance.year_id, instance.workshopparticipant_set.values_list('participant_id', flat=True))
+
+
+@receiver(post_save, sender=WorkshopUserProfile)
+@receiver(post_delete, sender=WorkshopUserProfile)
+def update_participant_summary_for_status(sender, instance, **kwargs):
+    if instance.user_profile_id is not None:
+        ParticipantSummary.refresh(instance.year_id, [instance.user_profile_id], create=False)
+
+
+@receiver(post_save, sender=UserProfile)
+def update_participant_summary_for_profile(sender, instance, created, **kwargs):
+    if not created:
+        ParticipantSummary.refresh_all_years(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def update_participant_summary_for_user(sender, instance, created, update_fields, **kwargs):
+    # Only the fields checked by UserProfile.is_completed matter, in particular logging in (which updates
+    # last_login) should not recompute anything
+    if created or (update_fields is not None and not {'first_name', 'last_name', 'email'} & set(update_fields)):
+        return
+    profile_id = UserProfile.objects.filter(user=instance).values_list('pk', flat=True).first()
+    if profile_id is not None:
+        ParticipantSummary.refresh_all_years(profile_id)
+
+
+def update_participant_summaries_for_answers(answers: Iterable[FormQuestionAnswer]) -> None:
+    """
+    Called by the signal handler below, and directly after writing the answers in bulk (which sends no signals)
+    """
+    # Only the birth date taken from PESEL is summarized
+    user_ids = {answer.user_id for answer in answers if answer.question.data_type == FormQuestion.TYPE_PESEL}
+    if not user_ids:
+        return
+    for profile_id in UserProfile.objects.filter(user_id__in=user_ids).values_list('pk', flat=True):
+        ParticipantSummary.refresh_all_years(profile_id)
+
+
+@receiver(post_save, sender=FormQuestionAnswer)
+@receiver(post_delete, sender=FormQuestionAnswer)
+def update_participant_summary_for_answer(sender, instance, **kwargs):
+    update_participant_summaries_for_answers([instance])
+
+
+@receiver(post_save, sender=Camp)
+@receiver(post_delete, sender=Camp)
+@receiver(post_save, sender=Workshop)
+@receiver(post_delete, sender=Workshop)
+def invalidate_coregistration(sender, **kwargs):
+    bump_generation(COREGISTRATION_GENERATION)
+
+
+@receiver(post_save, sender=WorkshopParticipant)
+@receiver(post_delete, sender=WorkshopParticipant)
+def update_coregistration_for_participation(sender, instance, **kwargs):
+    # Saving the points of an existing participation does not change the matrix
+    if kwargs.get('created') is False:
+        return
+    year_id = Workshop.objects.filter(pk=instance.workshop_id).values_list('year_id', flat=True).first()
+    if year_id is not None:
+        bump_generation(coregistration_generation(year_id))
+
+
+@receiver(m2m_changed, sender=Workshop.lecturer.through)
+def update_coregistration_for_lecturers(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        bump_generation(coregistration_generation(instance.year_id))
+    elif pk_set is None:
+        # Cleared from the UserProfile side, we don't know which workshops were affected
+        bump_generation(COREGISTRATION_GENERATION)
+    else:
+        for year_id in set(Workshop.objects.filter(pk__in=pk_set).values_list('year_id', flat=True)):
+            bump_generation(coregistration_generation(year_id))
+
+
+@receiver(post_save, sender=Camp)
+@receiver(post_delete, sender=Camp)
+def invalidate_all_programs(sender, **kwargs):
+    invalidate_program_of_year()
+
+
+@receiver(post_save, sender=Workshop)
+@receiver(post_delete, sender=Workshop)
+@receiver(post_save, sender=WorkshopCategory)
+@receiver(post_delete, sender=WorkshopCategory)
+@receiver(post_save, sender=WorkshopType)
+@receiver(post_delete, sender=WorkshopType)
+def invalidate_program(sender, instance, **kwargs):
+    invalidate_program_of_year(instance.year_id)
+
+
+@receiver(m2m_changed, sender=Workshop.lecturer.through)
+@receiver(m2m_changed, sender=Workshop.category.through)
+def invalidate_program_for_workshop_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_program_of_year(instance.year_id)
+    elif pk_set is None:
+        # Cleared from the other side, we don't know which workshops were affected
+        invalidate_program_of_year()
+    else:
+        for year_id in Workshop.objects.filter(pk__in=pk_set).values_list('year_id', flat=True).distinct():
+            invalidate_program_of_year(year_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_program_for_lecturer(sender, instance, created, update_fields, **kwargs):
+    # The names of the lecturers are shown in the program
+    if created or (update_fields is not None and not {'first_name', 'last_name'} & set(update_fields)):
+        return
+    for year_id in Workshop.objects.filter(lecturer__user=instance).values_list('year_id', flat=True).distinct():
+        invalidate_program_of_year(year_id)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+@receiver(post_save, sender=Workshop)
+@receiver(post_delete, sender=Workshop)
+def invalidate_link_list(sender, **kwargs):
+    bump_generation(LINK_LIST_GENERATION)
@@ -0,0 +1,120 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template as DjangoBackendTemplate
+
+logger = logging.getLogger('wwwapp.performance')
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_current = threading.local()
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Replace literals and parameter lists in the query, so that logged queries can be grouped
+    """
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _LITERAL_RE.sub('?', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+class RequestTimings:
+    def __init__(self):
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.slow_queries = []
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.db_time += duration
+            self.db_queries += 1
+            if duration * 1000 >= settings.PERFORMANCE_SLOW_QUERY_MS:
+                self.slow_queries.append((normalize_sql(sql), duration))
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        timings = getattr(_current, 'timings', None)
+        if timings is None:
+            return render(self, *args, **kwargs)
+        # Only count the outermost render, templates may be rendered recursively (e.g. with render_to_string)
+        timings.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timings.template_depth -= 1
+            if timings.template_depth == 0:
+                timings.template_time += time.perf_counter() - start
+    return wrapper
+
+
+def performance_middleware(get_response):
+    """
+    Measures the wall time, database time and template rendering time of every request.
+    Staff members get the results in the Server-Timing header, and a sample of requests
+    (with their slow queries) is written to the wwwapp.performance log.
+
+    Note that the template time includes the queries that were executed lazily during rendering.
+    """
+    if not getattr(DjangoBackendTemplate.render, 'performance_instrumented', False):
+        DjangoBackendTemplate.render = _timed_render(DjangoBackendTemplate.render)
+        DjangoBackendTemplate.render.performance_instrumented = True
+
+    def middleware(request):
+        timings = RequestTimings()
+        _current.timings = timings
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings.record_query))
+                response = get_response(request)
+        finally:
+            del _current.timings
+        total_time = time.perf_counter() - start
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            response['Server-Timing'] = ', '.join([
+                'total;dur={:.1f}'.format(total_time * 1000),
+                'db;dur={:.1f};desc="{} queries"'.format(timings.db_time * 1000, timings.db_queries),
+                'template;dur={:.1f}'.format(timings.template_time * 1000),
+            ])
+
+        if random.random() < settings.PERFORMANCE_LOG_SAMPLE_RATE:
+            view_name = request.resolver_match.view_name if request.resolver_match else None
+            logger.info(json.dumps({
+                'view': view_name,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total_time * 1000, 1),
+                'db_ms': round(timings.db_time * 1000, 1),
+                'db_queries': timings.db_queries,
+                'template_ms': round(timings.template_time * 1000, 1),
+            }))
+            for sql, duration in timings.slow_queries:
+                logger.warning(json.dumps({
+                    'view': view_name,
+                    'slow_query_ms': round(duration * 1000, 1),
+                    'sql': sql,
+                }))
+
+        return response
+    return middleware
@@ -0,0 +1,335 @@
+import concurrent.futures
+import math
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+"""
+Schedule optimizer assigning the accepted workshops of a camp to time blocks, so that the participants can attend as
+many of the workshops they signed up for as possible. It works on the data returned by data_for_plan_view.
+
+A plan is a vector assigning a block to every workshop (in the order of PlanProblem.workshop_ids). Plans are scored
+with the penalties of the original make_plan.py script - the score is never positive and 0 is a perfect plan.
+"""
+
+NUM_BLOCKS = 6
+POINTS_LECTURER_COLLISION = 10 ** 6
+POINTS_NOT_ALLOWED = 10 ** 3
+POINTS_WRONG_WORKSHOPS_PER_BLOCK = 10 ** 4
+
+
+class PlanProblem:
+    """
+    The planning data as matrices:
+    - incidence: user x workshop, whether the user takes part in the workshop (lecturers included),
+    - available: user x block, whether the user is present on the block,
+    - disallowed: workshop x block, whether the workshop must not be placed on the block,
+    - lecturer_users/lecturer_workshops: the (lecturer, workshop) pairs as two index vectors.
+    """
+    def __init__(self, data: Dict[str, Any], num_blocks: int = NUM_BLOCKS,
+                 disallowed_blocks: Optional[Dict[int, Iterable[int]]] = None):
+        self.num_blocks = num_blocks
+        self.workshop_ids = [workshop['wid'] for workshop in data['workshops']]
+        self.workshop_names = [workshop['name'] for workshop in data['workshops']]
+        self.user_ids = [user['uid'] for user in data['users']]
+        self.user_names = [user['name'] for user in data['users']]
+        workshop_index = {wid: i for i, wid in enumerate(self.workshop_ids)}
+        user_index = {uid: i for i, uid in enumerate(self.user_ids)}
+
+        self.incidence = np.zeros((len(self.user_ids), len(self.workshop_ids)), dtype=bool)
+        for part in data['participation']:
+            if part['wid'] in workshop_index and part['uid'] in user_index:
+                self.incidence[user_index[part['uid']], workshop_index[part['wid']]] = True
+        lecturers = [(user_index[uid], i) for i, workshop in enumerate(data['workshops'])
+                     for uid in workshop['lecturers'] if uid in user_index]
+        self.lecturer_users = np.array([user for user, _ in lecturers], dtype=np.intp)
+        self.lecturer_workshops = np.array([workshop for _, workshop in lecturers], dtype=np.intp)
+        self.incidence[self.lecturer_users, self.lecturer_workshops] = True
+
+        # Everyone is present on all blocks, unless the data says otherwise
+        self.available = np.ones((len(self.user_ids), num_blocks), dtype=bool)
+        for i, user in enumerate(data['users']):
+            if 'blocks' in user:
+                self.available[i] = False
+                self.available[i, list(user['blocks'])] = True
+
+        self.disallowed = np.zeros((len(self.workshop_ids), num_blocks), dtype=bool)
+        disallowed_blocks = dict(disallowed_blocks or {})
+        for i, workshop in enumerate(data['workshops']):
+            blocks = list(workshop.get('disallowed_blocks', [])) + list(disallowed_blocks.get(workshop['wid'], []))
+            self.disallowed[i, blocks] = True
+
+        self.incidence_counts = self.incidence.astype(np.int32)
+        self.workshops_per_block = len(self.workshop_ids) // num_blocks
+        self.wanted_blocks = np.minimum(self.available.sum(axis=1), self.incidence.sum(axis=1))
+        # Plain lists for the incremental scoring of Plan, which touches too few elements at once to benefit from NumPy
+        self.workshop_users = [np.flatnonzero(self.incidence[:, i]).tolist() for i in range(len(self.workshop_ids))]
+        self.workshop_lecturers = [self.lecturer_users[self.lecturer_workshops == i].tolist()
+                                   for i in range(len(self.workshop_ids))]
+        self.available_by_block = self.available.T.tolist()
+        self.disallowed_list = self.disallowed.tolist()
+        self.wanted_blocks_list = self.wanted_blocks.tolist()
+
+    @property
+    def num_workshops(self) -> int:
+        return len(self.workshop_ids)
+
+    def random_plan(self, rng: random.Random) -> np.ndarray:
+        return np.array([rng.randrange(self.num_blocks) for _ in self.workshop_ids], dtype=np.intp)
+
+    def block_counts(self, plan: np.ndarray) -> np.ndarray:
+        """
+        user x block, the number of workshops of the user on the block (0 on the blocks the user is absent on)
+        """
+        one_hot = np.zeros((self.num_workshops, self.num_blocks), dtype=np.int32)
+        one_hot[np.arange(self.num_workshops), plan] = 1
+        return (self.incidence_counts @ one_hot) * self.available
+
+    def collisions(self, plan: np.ndarray) -> np.ndarray:
+        """
+        For every workshop, the number of its participants who have another workshop on the same block
+        """
+        collided = self.block_counts(plan) > 1
+        return (self.incidence & collided[:, plan]).sum(axis=0)
+
+    def penalties(self, plan: np.ndarray) -> Dict[str, int]:
+        counts = self.block_counts(plan)
+        lecturer_collisions = np.count_nonzero(~self.available[self.lecturer_users, plan[self.lecturer_workshops]])
+        disallowed = np.count_nonzero(self.disallowed[np.arange(self.num_workshops), plan])
+        block_sizes = np.bincount(plan, minlength=self.num_blocks)
+        empty_blocks = self.wanted_blocks - np.count_nonzero(counts, axis=1)
+        empty_blocks = empty_blocks[empty_blocks > 0].astype(np.int64)
+        collisions = (self.incidence & (counts > 1)[:, plan]).sum(axis=0).astype(np.int64)
+        return {
+            'lecturer_collisions': int(lecturer_collisions) * POINTS_LECTURER_COLLISION,
+            'disallowed_blocks': int(disallowed) * POINTS_NOT_ALLOWED,
+            'block_balance': int(np.abs(self.workshops_per_block - block_sizes).sum()) * POINTS_WRONG_WORKSHOPS_PER_BLOCK,
+            'empty_blocks': int((empty_blocks ** empty_blocks).sum()),
+            'collisions': int((collisions ** 2).sum()),
+        }
+
+    def score(self, plan: np.ndarray) -> int:
+        return -sum(self.penalties(plan).values())
+
+
+def empty_blocks_penalty(empty_blocks: int) -> int:
+    return empty_blocks ** empty_blocks if empty_blocks > 0 else 0
+
+
+class Plan:
+    """
+    A plan which keeps the intermediate results of the scoring (the number of workshops of every user on every block,
+    the collision counter of every workshop, the block sizes) and updates them on every move, in time proportional
+    to the number of participants of the moved workshop. The moves since the last commit() can be undone with
+    rollback().
+    """
+    def __init__(self, problem: PlanProblem, blocks: np.ndarray):
+        self.problem = problem
+        self.blocks = blocks.tolist()
+        one_hot = np.zeros((problem.num_workshops, problem.num_blocks), dtype=np.int64)
+        one_hot[np.arange(problem.num_workshops), blocks] = 1
+        # Indexed by block, then user. Unlike PlanProblem.block_counts, this counts the workshops on the blocks the
+        # user is absent on too.
+        self.counts = (problem.incidence_counts @ one_hot).T.tolist()
+        # The sum of the indices of the user's workshops on the block - the index of the only workshop there when the
+        # count is 1
+        self.index_sums = ((problem.incidence_counts * np.arange(problem.num_workshops)) @ one_hot).T.tolist()
+        self.occupied_blocks = np.count_nonzero(problem.block_counts(blocks), axis=1).tolist()
+        self.collision_counts = problem.collisions(blocks).tolist()
+        self.block_sizes = np.bincount(blocks, minlength=problem.num_blocks).tolist()
+        self.journal: List[Tuple[int, int]] = []
+
+        penalties = problem.penalties(blocks)
+        self.lecturer_collisions = penalties['lecturer_collisions'] // POINTS_LECTURER_COLLISION
+        self.disallowed_blocks = penalties['disallowed_blocks'] // POINTS_NOT_ALLOWED
+        self.block_balance = penalties['block_balance'] // POINTS_WRONG_WORKSHOPS_PER_BLOCK
+        self.empty_blocks = penalties['empty_blocks']
+        self.collisions = penalties['collisions']
+
+    def penalties(self) -> Dict[str, int]:
+        return {
+            'lecturer_collisions': self.lecturer_collisions * POINTS_LECTURER_COLLISION,
+            'disallowed_blocks': self.disallowed_blocks * POINTS_NOT_ALLOWED,
+            'block_balance': self.block_balance * POINTS_WRONG_WORKSHOPS_PER_BLOCK,
+            'empty_blocks': self.empty_blocks,
+            'collisions': self.collisions,
+        }
+
+    @property
+    def score(self) -> int:
+        return -(self.lecturer_collisions * POINTS_LECTURER_COLLISION + self.disallowed_blocks * POINTS_NOT_ALLOWED +
+                 self.block_balance * POINTS_WRONG_WORKSHOPS_PER_BLOCK + self.empty_blocks + self.collisions)
+
+    def add_collision(self, workshop: int, delta: int) -> None:
+        count = self.collision_counts[workshop]
+        self.collision_counts[workshop] = count + delta
+        self.collisions += (count + delta) ** 2 - count ** 2
+
+    def move(self, workshop: int, block: int) -> None:
+        problem = self.problem
+        old_block = self.blocks[workshop]
+        if block == old_block:
+            return
+        self.journal.append((workshop, old_block))
+        self.blocks[workshop] = block
+
+        old_available, new_available = problem.available_by_block[old_block], problem.available_by_block[block]
+        for lecturer in problem.workshop_lecturers[workshop]:
+            self.lecturer_collisions += old_available[lecturer] - new_available[lecturer]
+        disallowed = problem.disallowed_list[workshop]
+        self.disallowed_blocks += disallowed[block] - disallowed[old_block]
+        per_block = problem.workshops_per_block
+        old_size, new_size = self.block_sizes[old_block], self.block_sizes[block]
+        self.block_balance += abs(per_block - old_size + 1) - abs(per_block - old_size) + \
+            abs(per_block - new_size - 1) - abs(per_block - new_size)
+        self.block_sizes[old_block] = old_size - 1
+        self.block_sizes[block] = new_size + 1
+
+        old_counts, new_counts = self.counts[old_block], self.counts[block]
+        old_sums, new_sums = self.index_sums[old_block], self.index_sums[block]
+        wanted_blocks, occupied_blocks = problem.wanted_blocks_list, self.occupied_blocks
+        # The moved workshop collides on a block for every user who has another workshop there, and the only other
+        # workshop of a user stops or starts colliding when the user's count drops to or rises from one
+        collisions_delta = 0
+        for user in problem.workshop_users[workshop]:
+            old_count, new_count = old_counts[user], new_counts[user]
+            old_counts[user] = old_count - 1
+            new_counts[user] = new_count + 1
+            old_sums[user] -= workshop
+            new_sums[user] += workshop
+
+            occupied = occupied_blocks[user]
+            if old_available[user]:
+                if old_count == 1:
+                    occupied -= 1
+                else:
+                    collisions_delta -= 1
+                    if old_count == 2:
+                        self.add_collision(old_sums[user], -1)
+            if new_available[user]:
+                if new_count == 0:
+                    occupied += 1
+                else:
+                    collisions_delta += 1
+                    if new_count == 1:
+                        self.add_collision(new_sums[user] - workshop, 1)
+            if occupied != occupied_blocks[user]:
+                self.empty_blocks += empty_blocks_penalty(wanted_blocks[user] - occupied) - \
+                    empty_blocks_penalty(wanted_blocks[user] - occupied_blocks[user])
+                occupied_blocks[user] = occupied
+
+        self.add_collision(workshop, collisions_delta)
+
+    def mutate(self, rng: random.Random, workshop: Optional[int] = None, block: Optional[int] = None) -> None:
+        """
+        Moves the workshop (a random one by default) to a different block (a random one, unless a different one is
+        given)
+        """
+        if workshop is None:
+            workshop = rng.randrange(self.problem.num_workshops)
+        if block is None:
+            block = rng.randrange(self.problem.num_blocks)
+        while block == self.blocks[workshop] and self.problem.num_blocks > 1:
+            block = rng.randrange(self.problem.num_blocks)
+        self.move(workshop, block)
+
+    def mutate_by_exchange(self, rng: random.Random) -> None:
+        first = rng.randrange(self.problem.num_workshops)
+        second = rng.randrange(self.problem.num_workshops)
+        first_block, second_block = self.blocks[first], self.blocks[second]
+        self.mutate(rng, first, second_block)
+        self.mutate(rng, second, first_block)
+
+    def commit(self) -> None:
+        self.journal.clear()
+
+    def rollback(self) -> None:
+        journal = self.journal
+        self.journal = []
+        for workshop, block in reversed(journal):
+            self.move(workshop, block)
+        self.journal.clear()
+
+
+class Island:
+    """
+    An independent population of plans. Every iteration, each plan moves the next workshop to the next block or
+    exchanges the blocks of two random workshops (once or twice), like the original script. The hill climb keeps the
+    result if it's not worse, simulated annealing also keeps worse results with a probability decreasing with the
+    temperature.
+    """
+    def __init__(self, problem: PlanProblem, seed: int, population: int):
+        self.problem = problem
+        self.rng = random.Random(seed)
+        self.plans = [Plan(problem, problem.random_plan(self.rng)) for _ in range(population)]
+        self.best_score, self.best_plan = max(((plan.score, list(plan.blocks)) for plan in self.plans),
+                                              key=lambda result: result[0])
+        self.next_workshop = 0
+        self.next_block = 0
+
+    def mutate(self, plan: Plan) -> None:
+        for _ in range(self.rng.randint(1, 2)):
+            if self.rng.randint(0, 1) == 0:
+                plan.mutate(self.rng, self.next_workshop, self.next_block)
+                self.next_workshop = (self.next_workshop + 1) % self.problem.num_workshops
+                self.next_block = (self.next_block + 1) % self.problem.num_blocks
+            else:
+                plan.mutate_by_exchange(self.rng)
+
+    def step(self, temperature: float = 0) -> None:
+        for plan in self.plans:
+            score = plan.score
+            self.mutate(plan)
+            delta = plan.score - score
+            if delta >= 0 or (temperature > 0 and self.rng.random() < math.exp(delta / temperature)):
+                plan.commit()
+                if plan.score > self.best_score:
+                    self.best_score, self.best_plan = plan.score, list(plan.blocks)
+            else:
+                plan.rollback()
+
+    def best(self) -> Tuple[int, List[int]]:
+        return self.best_score, self.best_plan
+
+
+def run_island(problem: PlanProblem, seed: int, population: int, iterations: int,
+               time_limit: Optional[float] = None, temperature: Optional[Tuple[float, float]] = None) \
+        -> Tuple[int, List[int]]:
+    """
+    Runs a single island for the given number of iterations (or until the time limit in seconds runs out) and returns
+    its best plan with the score. temperature=(start, end) switches to simulated annealing, cooling geometrically
+    from the start to the end temperature over the iterations.
+    """
+    deadline = time.monotonic() + time_limit if time_limit is not None else None
+    island = Island(problem, seed, population)
+    for i in range(iterations):
+        if island.best()[0] == 0 or (deadline is not None and time.monotonic() > deadline):
+            break
+        if temperature is None:
+            island.step()
+        else:
+            start, end = temperature
+            island.step(start * (end / start) ** (i / iterations))
+    return island.best()
+
+
+def optimize(problem: PlanProblem, islands: int, population: int, iterations: int, seed: int = 0,
+             workers: Optional[int] = None, time_limit: Optional[float] = None,
+             temperature: Optional[Tuple[float, float]] = None) -> Tuple[int, List[int]]:
+    """
+    Runs the islands (seeded with seed, seed + 1, ...) in a process pool and returns the best plan found by any of
+    them. workers=1 runs them in the current process.
+    """
+    if problem.num_workshops == 0:
+        return 0, []
+    seeds = [seed + i for i in range(islands)]
+    if workers == 1:
+        results = [run_island(problem, s, population, iterations, time_limit, temperature) for s in seeds]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_island, problem, s, population, iterations, time_limit, temperature)
+                       for s in seeds]
+            results = [future.result() for future in futures]
+    return max(results, key=lambda result: result[0])
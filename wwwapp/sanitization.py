@@ -0,0 +1,83 @@
+import hashlib
+from typing import Dict, List, Sequence
+
+import bleach
+from django.utils.safestring import SafeString, mark_safe
+from django_bleach.utils import get_bleach_default_options
+
+"""
+The rich-text fields are sanitized with bleach when they are saved instead of on every render. For every field listed
+in SANITIZED_FIELDS, the model stores the sanitized HTML in <field>_clean and the hash of the source and of the
+bleach options it was computed with in <field>_clean_hash, so that a change of either is detected when the field
+is read. Rows saved without save() (e.g. QuerySet.update()) are fixed lazily, or with the rebuild_sanitized_html
+command.
+"""
+
+
+def bleach_options(extra_tags: Sequence[str] = ()) -> Dict:
+    """
+    The options of the | bleach template filter (taken from the BLEACH_* settings), with additional allowed tags
+    """
+    options = dict(get_bleach_default_options())
+    if extra_tags:
+        options['tags'] = list(options.get('tags', bleach.sanitizer.ALLOWED_TAGS)) + list(extra_tags)
+    return options
+
+
+def source_hash(source: str, options: Dict) -> str:
+    digest = hashlib.sha256(repr(sorted(options.items())).encode('utf-8'))
+    digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SanitizedHTMLMixin:
+    """
+    Mixin for models with the sanitized copies of rich-text fields (see the description of the module)
+    """
+    SANITIZED_FIELDS: Sequence[str] = ()
+
+    def sanitization_options(self, field: str) -> Dict:
+        return bleach_options()
+
+    def refresh_sanitized(self, field: str) -> bool:
+        """
+        Recomputes the sanitized HTML of the field if it's out of date (without saving it)
+        :return: True if it was out of date
+        """
+        source = getattr(self, field)
+        options = self.sanitization_options(field)
+        expected_hash = source_hash(source, options)
+        if getattr(self, field + '_clean_hash') == expected_hash:
+            return False
+        setattr(self, field + '_clean', bleach.clean(source, **options))
+        setattr(self, field + '_clean_hash', expected_hash)
+        return True
+
+    def outdated_sanitized_fields(self) -> List[str]:
+        """
+        Recomputes all the outdated sanitized fields
+        :return: names of the database columns that changed
+        """
+        changed = []
+        for field in self.SANITIZED_FIELDS:
+            if self.refresh_sanitized(field):
+                changed += [field + '_clean', field + '_clean_hash']
+        return changed
+
+    def sanitized(self, field: str) -> SafeString:
+        """
+        The sanitized HTML of the field. If it's out of date, it's recomputed and stored without sending the model
+        signals, as the source itself didn't change
+        """
+        if self.refresh_sanitized(field) and self.pk is not None:
+            type(self)._base_manager.filter(pk=self.pk).update(**{
+                field + '_clean': getattr(self, field + '_clean'),
+                field + '_clean_hash': getattr(self, field + '_clean_hash'),
+            })
+        return mark_safe(getattr(self, field + '_clean'))
+
+    def save(self, *args, **kwargs):
+        changed = self.outdated_sanitized_fields()
+        if changed and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = list(kwargs['update_fields']) + changed
+        super().save(*args, **kwargs)
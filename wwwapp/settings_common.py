@@ -43,6 +43,7 @@ SOCIAL_AUTH_POSTGRES_JSONFIELD = True
 
 
 MIDDLEWARE = (
+    'wwwapp.performance.performance_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -231,5 +232,57 @@ GALLERY_LOGO_PATH = 'images/logo_transparent.png'
 GALLERY_TITLE = 'Galeria WWW'
 GALLERY_FOOTER_INFO = 'Wakacyjne Warsztaty Wielodyscyplinarne'
 GALLERY_FOOTER_EMAIL = ''
+GALLERY_CACHE_MAX_AGE = 60
 
 X_FRAME_OPTIONS = 'DENY'
+
+# Upper bound (in seconds) on how long values invalidated by model signals are kept in the cache.
+# Protects against stale data when the database is modified without firing signals (e.g. QuerySet.update())
+CACHE_SAFETY_TIMEOUT = 60 * 60
+
+# How long (in seconds) browsers may reuse the pages shown to anonymous users without revalidating them (see
+# wwwapp.conditional). Logged in users always revalidate. The pages contain the CSRF token of the visitor, so shared
+# caches never store them.
+PAGE_CACHE_MAX_AGE = 60
+
+# Subdirectory of MEDIA_ROOT with the static copies of the pages of past camps (see wwwapp.freezing)
+FROZEN_CAMPS_DIR = 'frozen'
+
+# Performance instrumentation (see wwwapp.performance)
+# Queries slower than this (in milliseconds) are logged with the request
+PERFORMANCE_SLOW_QUERY_MS = 200
+# Fraction of requests for which the timings (and slow queries) are written to the wwwapp.performance log
+PERFORMANCE_LOG_SAMPLE_RATE = 0.01
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'wwwapp.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# How long (in seconds) nginx may cache the result of the /resource_auth/ subrequest
+RESOURCE_AUTH_CACHE_SECONDS = 60
+
+# Background mail queue (see wwwapp.mail_queue and the send_queued_mail command)
+# Number of recipients claimed by the worker at once
+MAIL_QUEUE_BATCH_SIZE = 50
+# Minimum number of seconds between two messages sent over the SMTP connection (Gmail limits the sending rate)
+MAIL_QUEUE_SEND_INTERVAL = 1.0
+# Recipients are marked as failed after this many unsuccessful attempts
+MAIL_QUEUE_MAX_ATTEMPTS = 5
+# Seconds before the first retry, doubled after every failed attempt
+MAIL_QUEUE_RETRY_DELAY = 5 * 60
+# Seconds for which a claimed batch is hidden from other workers (after that, unsent messages are retried). Has to be
+# longer than MAIL_QUEUE_BATCH_SIZE * MAIL_QUEUE_SEND_INTERVAL
+MAIL_QUEUE_LEASE = 10 * 60
@@ -26,8 +26,19 @@ DATABASES = {
     }
 }
 
+# Caching is disabled during development and tests, so that changes made to the database directly
+# (or rolled back between tests) are always visible
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+
 MEDIA_ROOT = os.path.join(BASE_DIR, *MEDIA_URL.strip("/").split("/"))
 SENDFILE_ROOT = os.path.join(BASE_DIR, *SENDFILE_URL.strip("/").split("/"))
 SENDFILE_BACKEND = 'django_sendfile.backends.development'
 
 GOOGLE_ANALYTICS_KEY = None
+
+# Sampled timings would be printed in the middle of the test output (the performance tests enable them when needed)
+PERFORMANCE_LOG_SAMPLE_RATE = 0
@@ -24,6 +24,17 @@ DATABASES = {
     }
 }
 
+# The cache has to be shared by all of the gunicorn workers, as it's invalidated by model signals
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+    }
+}
+
+# Sessions are read on every request (including every /resource_auth/ subrequest)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 GOOGLE_ANALYTICS_KEY = 'UA-12926426-8'
 
 SESSION_COOKIE_SECURE = True
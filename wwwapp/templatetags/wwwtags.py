@@ -1,6 +1,8 @@
 from django import template
 from django.utils.safestring import mark_safe
 
+from wwwforms.models import answer_display_value
+
 register = template.Library()
 
 
@@ -45,3 +47,9 @@ def provider_signin_text(value):
         # this is their official translation when you use the JS SDK with locale set to PL
         return "Zaloguj się przez Facebooka"
     return "Zaloguj się przez " + provider_friendly_name(value).title()
+
+
+@register.filter
+def answer_display(answer):
+    value = answer_display_value(answer)
+    return '' if value is None else value
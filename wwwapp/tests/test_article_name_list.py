@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from wwwapp.models import Article, Camp, Workshop, WorkshopType
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ArticleNameListTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Camp.objects.get()
+        self.past_year = Camp.objects.create(year=self.year.year - 1)
+        Article.objects.create(name='test_article', title='Testowy artykuł')
+        Article.objects.create(name='untitled')
+        self.workshops = []
+        for year in (self.year, self.past_year):
+            workshop_type = WorkshopType.objects.create(year=year, name='Type')
+            for i in range(3):
+                self.workshops.append(Workshop.objects.create(
+                    title='Warsztaty {} {}'.format(year.year, i), name='warsztaty{}'.format(i), year=year,
+                    type=workshop_type, status=Workshop.STATUS_ACCEPTED))
+        self.rejected = Workshop.objects.create(title='Odrzucone', name='odrzucone', year=self.year,
+                                                type=workshop_type, status=Workshop.STATUS_REJECTED)
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_links(self, **params):
+        response = self.client.get(reverse('articleNameList'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_links(self):
+        links = self.get_links()
+        self.assertIn({'title': 'Artykuł: Testowy artykuł', 'value': reverse('article', args=['test_article'])},
+                      links)
+        self.assertIn({'title': 'Artykuł: untitled', 'value': reverse('article', args=['untitled'])}, links)
+        self.assertIn({'title': 'Warsztaty ({}): Warsztaty {} 1'.format(self.past_year, self.past_year.year),
+                       'value': reverse('workshop_page', args=[self.past_year.pk, 'warsztaty1'])}, links)
+        self.assertNotIn('Odrzucone', str(links))
+        workshop_titles = [link['title'] for link in links if link['title'].startswith('Warsztaty')]
+        self.assertEqual(len(workshop_titles), 6)
+        self.assertTrue(workshop_titles[0].endswith('Warsztaty {} 0'.format(self.year.year)))
+
+    def test_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get_links()
+        self.assertEqual(len([query for query in queries.captured_queries
+                              if query['sql'].startswith('SELECT')]), 2)
+        with CaptureQueriesContext(connection) as queries:
+            self.get_links()
+        self.assertEqual(len(queries.captured_queries), 0)
+
+    def test_invalidation(self):
+        self.get_links()
+        self.workshops[0].title = 'Zmienione warsztaty'
+        self.workshops[0].save()
+        self.assertIn('Zmienione warsztaty', str(self.get_links()))
+
+        Article.objects.get(name='untitled').delete()
+        self.assertNotIn('untitled', str(self.get_links()))
+
+    def test_etag(self):
+        response = self.client.get(reverse('articleNameList'))
+        self.assertEqual(self.client.get(reverse('articleNameList'),
+                                         HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        filtered = self.client.get(reverse('articleNameList'), {'prefix': 'artykuł'})
+        self.assertNotEqual(filtered['ETag'], response['ETag'])
+
+        Article.objects.create(name='new_article')
+        self.assertEqual(self.client.get(reverse('articleNameList'),
+                                         HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_prefix(self):
+        links = self.get_links(prefix='artykuł')
+        self.assertEqual(len(links), Article.objects.count())
+        self.assertTrue(all(link['title'].startswith('Artykuł: ') for link in links))
+
+        links = self.get_links(prefix='/{}/'.format(self.past_year.pk))
+        self.assertEqual(sorted(link['title'] for link in links),
+                         ['Warsztaty ({}): Warsztaty {} {}'.format(self.past_year, self.past_year.year, i)
+                          for i in range(3)])
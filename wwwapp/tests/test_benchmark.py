@@ -0,0 +1,30 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from wwwapp.models import Workshop
+
+
+@override_settings(DEBUG=True, PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher'])
+class Benchmark(TestCase):
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark', scale=0.05, repeat=1, stdout=out, stderr=StringIO())
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['dataset']['users'], 50)
+        self.assertEqual(report['dataset']['camps'], 3)
+        self.assertSetEqual(set(report['views'].keys()), {
+            'participants_view', 'participants_export_view', 'people_data_view',
+            'lecturers_view', 'form_results_view', 'data_for_plan_view', 'program_view',
+            'filtered_emails_view'})
+        for measurement in report['views'].values():
+            self.assertGreater(measurement['queries'], 0)
+
+        # Generated data is rolled back unless --keep is given
+        self.assertEqual(User.objects.count(), 0)
+        self.assertEqual(Workshop.objects.count(), 0)
@@ -0,0 +1,108 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from wwwapp.caching import get_generation
+from wwwapp.models import Camp, Article, ResourceYearPermission, WorkshopUserProfile, PERMISSIONS_GENERATION
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class NavigationCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Camp.objects.get()
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='user123')
+        self.article = Article.objects.create(name='menu_article', title='Menu', on_menubar=True)
+        self.resource = ResourceYearPermission.objects.create(
+            display_name='Internet', access_url='https://example.com/internet', root_path='/internet', year=self.year)
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_context(self):
+        response = self.client.get(reverse('article', args=[self.article.name]))
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def test_cached_context_does_not_query_navigation_data(self):
+        context = self.get_context()
+        self.assertEqual(context['articles_on_menubar'], [self.article])
+        self.assertEqual(context['years'], [self.year])
+        self.assertEqual(context['resources'], [])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get_context()
+        tables = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('"wwwapp_resourceyearpermission"', tables)
+        self.assertNotIn('"wwwapp_workshopuserprofile"', tables)
+        self.assertNotIn('"on_menubar" = ', tables)
+
+    def test_article_change_invalidates_menubar(self):
+        self.get_context()
+        Article.objects.create(name='other_article', title='Other', on_menubar=True)
+        self.assertEqual(len(self.get_context()['articles_on_menubar']), 2)
+
+    def test_camp_change_invalidates_years(self):
+        self.get_context()
+        year_before = Camp.objects.create(year=self.year.year - 1)
+        self.assertEqual(self.get_context()['years'], [year_before, self.year])
+
+    def test_qualification_invalidates_resources(self):
+        self.assertEqual(self.get_context()['resources'], [])
+        profile = WorkshopUserProfile.objects.create(user_profile=self.user.userprofile, year=self.year,
+                                                     status=WorkshopUserProfile.STATUS_ACCEPTED)
+        self.assertEqual(self.get_context()['resources'], [self.resource])
+        profile.delete()
+        self.assertEqual(self.get_context()['resources'], [])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CurrentCampCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Camp.objects.get()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_current_camp_is_cached_outside_of_requests(self):
+        self.assertEqual(Camp.current(), self.year)
+        with self.assertNumQueries(0):
+            self.assertEqual(Camp.current(), self.year)
+
+    def test_camp_save_invalidates_current_camp(self):
+        self.assertEqual(Camp.current(), self.year)
+        next_year = Camp.objects.create(year=self.year.year + 1)
+        self.assertEqual(Camp.current(), next_year)
+        next_year.delete()
+        self.assertEqual(Camp.current(), self.year)
+
+    def test_requests_do_not_query_current_camp(self):
+        self.client.get(reverse('latest_program'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('latest_program'))
+        self.assertRedirects(response, reverse('program', args=[self.year.pk]))
+        self.assertEqual(len(queries.captured_queries), 0)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PermissionsGenerationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='user123')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_login_does_not_invalidate_permissions(self):
+        generation = get_generation(PERMISSIONS_GENERATION)
+        self.assertTrue(self.client.login(username='user', password='user123'))
+        self.assertEqual(get_generation(PERMISSIONS_GENERATION), generation)
+
+        self.user.first_name = 'Jan'
+        self.user.save()
+        self.assertNotEqual(get_generation(PERMISSIONS_GENERATION), generation)
@@ -9,7 +9,8 @@ from django.urls import reverse
 from freezegun import freeze_time
 
 from wwwapp.templatetags import wwwtags
-from wwwapp.models import WorkshopType, WorkshopCategory, Workshop, WorkshopParticipant, WorkshopUserProfile, Camp
+from wwwapp.models import WorkshopType, WorkshopCategory, Workshop, WorkshopParticipant, WorkshopUserProfile, Camp, \
+    UserProfile
 
 
 class CampQualificationViews(TestCase):
@@ -97,6 +98,67 @@ class CampQualificationViews(TestCase):
         participant.save()
         self.assertEqual(participant.result_in_percent(), 0.0)
 
+    def test_scores_in_database_match_python(self):
+        other_user = User.objects.create_user(username='other', email='other@example.com', password='user123')
+        # Old workshops without max_points use the maximum of the entered points
+        workshop3 = Workshop.objects.create(title='Stare warsztaty', name='stare', year=self.year_2020,
+                                            type=self.workshop1.type, status=Workshop.STATUS_ACCEPTED)
+        WorkshopParticipant.objects.create(workshop=workshop3, participant=self.participant_user.userprofile,
+                                           qualification_result=4)
+        WorkshopParticipant.objects.create(workshop=workshop3, participant=other_user.userprofile,
+                                           qualification_result=16)
+        workshop4 = Workshop.objects.create(title='Bez kwalifikacji', name='bezkwalifikacji', year=self.year_2020,
+                                            type=self.workshop1.type, status=Workshop.STATUS_ACCEPTED,
+                                            is_qualifying=False)
+        WorkshopParticipant.objects.create(workshop=workshop4, participant=self.participant_user.userprofile,
+                                           qualification_result=1)
+        WorkshopParticipant.objects.create(workshop=self.workshop1, participant=other_user.userprofile)
+
+        for wp in WorkshopParticipant.objects.with_scores():
+            self.assertEqual(wp.percent, wp.result_in_percent(), msg=str(wp))
+            self.assertEqual(wp.qualified, wp.is_qualified(), msg=str(wp))
+            self.assertFalse(wp.has_solution)
+
+        with self.assertNumQueries(1):
+            profiles = {profile.pk: profile for profile in UserProfile.objects.with_year_scores(self.year_2020)}
+        participant = profiles[self.participant_user.userprofile.pk]
+        self.assertEqual(float(participant.points), 75.0 + 25.0 + 25.0)
+        self.assertEqual(participant.workshop_count, 4)
+        self.assertEqual(participant.accepted_workshop_count, 1)
+        other = profiles[other_user.userprofile.pk]
+        self.assertEqual(float(other.points), 100.0)
+        self.assertEqual(other.workshop_count, 2)
+        self.assertEqual(other.accepted_workshop_count, 0)
+        self.assertEqual(float(profiles[self.lecturer_user.userprofile.pk].points), 0.0)
+        self.assertEqual(profiles[self.lecturer_user.userprofile.pk].workshop_count, 0)
+
+        self.assertEqual(UserProfile.objects.with_year_scores(self.year_2019)
+                         .get(pk=self.participant_user.userprofile.pk).workshop_count, 0)
+
+    def test_scores_in_database_fractional(self):
+        Workshop.objects.filter(pk=self.workshop1.pk).update(max_points=3)
+        WorkshopParticipant.objects.filter(workshop=self.workshop1).update(qualification_result=1)
+        wp = WorkshopParticipant.objects.with_scores().get(workshop=self.workshop1)
+        self.assertAlmostEqual(float(wp.percent), 33.333333, places=5)
+        self.assertAlmostEqual(float(wp.percent), float(wp.result_in_percent()), places=5)
+
+    @override_settings(MAX_POINTS_PERCENT=150)
+    def test_scores_in_database_clamped(self):
+        WorkshopParticipant.objects.filter(workshop=self.workshop1).update(qualification_result=2137)
+        WorkshopParticipant.objects.filter(workshop=self.workshop2).update(qualification_result=-2137)
+        scores = {wp.workshop_id: wp.percent for wp in WorkshopParticipant.objects.with_scores()}
+        self.assertEqual(scores[self.workshop1.pk], 150)
+        self.assertEqual(scores[self.workshop2.pk], 0)
+
+    def test_scores_in_database_without_max_points(self):
+        WorkshopParticipant.objects.filter(workshop=self.workshop1).update(qualification_result=0)
+        Workshop.objects.filter(pk=self.workshop1.pk).update(max_points=None)
+        Workshop.objects.filter(pk=self.workshop2.pk).update(max_points=0)
+        WorkshopParticipant.objects.filter(workshop=self.workshop2).update(qualification_result=5)
+        for wp in WorkshopParticipant.objects.with_scores():
+            self.assertIsNone(wp.percent, msg=str(wp))
+            self.assertIsNone(wp.max_points, msg=str(wp))
+
     def test_profile_page_unauthenticated(self):
         # Unauthed users see only the profile page
         response = self.client.get(reverse('profile', args=[self.participant_user.pk]))
@@ -0,0 +1,179 @@
+import datetime
+import os
+
+import mock
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User, Permission
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from wwwapp.models import Article, Camp, Workshop, WorkshopType, WorkshopParticipant
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   PAGE_CACHE_MAX_AGE=30)
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Camp.objects.get()
+        self.past_year = Camp.objects.create(year=self.year.year - 1)
+        self.article = Article.objects.create(name='test_article', title='Testowy artykuł', content='<p>Treść</p>')
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='user123')
+        workshop_type = WorkshopType.objects.create(year=self.year, name='This type')
+        self.workshop = Workshop.objects.create(title='Warsztaty', name='warsztaty', year=self.year,
+                                                type=workshop_type, status=Workshop.STATUS_ACCEPTED,
+                                                page_content='<p>Opis</p>', page_content_is_public=True)
+        self.article_url = reverse('article', args=[self.article.name])
+        self.workshop_url = reverse('workshop_page', args=[self.year.pk, self.workshop.name])
+        self.program_url = reverse('program', args=[self.year.pk])
+        # The first visit gives the browser a CSRF token
+        self.client.get(reverse('index'))
+
+    def tearDown(self):
+        cache.clear()
+
+    def assertNotModified(self, url, response):
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+
+    def assertModified(self, url, response):
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertNotEqual(revalidated['ETag'], response['ETag'])
+        return revalidated
+
+    def test_anonymous(self):
+        for url in (self.article_url, self.workshop_url, self.program_url, reverse('index')):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # The pages contain the CSRF token of the visitor, so shared caches can't keep them
+            self.assertIn('private', response['Cache-Control'])
+            self.assertNotIn('public', response['Cache-Control'])
+            self.assertIn('max-age=30', response['Cache-Control'])
+            self.assertNotModified(url, response)
+            # The page contains the CSRF token, which isn't reflected in any modification time
+            self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_not_modified_skips_rendering(self):
+        program = self.client.get(self.program_url)
+        article = self.client.get(self.article_url)
+        with mock.patch('wwwapp.views.render') as render:
+            self.assertNotModified(self.program_url, program)
+            self.assertNotModified(self.article_url, article)
+        render.assert_not_called()
+
+    def test_article_changes(self):
+        response = self.client.get(self.article_url)
+        self.article.content = '<p>Nowa treść</p>'
+        self.article.save()
+        response = self.assertModified(self.article_url, response)
+        self.assertContains(response, 'Nowa treść')
+
+        # The navigation of every page changes with the menubar
+        Article.objects.create(name='menubar', title='W menu', on_menubar=True)
+        response = self.assertModified(self.article_url, response)
+        self.assertContains(response, 'W menu')
+
+        Camp.objects.create(year=self.year.year + 1)
+        self.assertModified(self.article_url, response)
+
+        self.assertEqual(self.client.get(reverse('article', args=['missing']),
+                                         HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+    def test_workshop_changes(self):
+        response = self.client.get(self.workshop_url)
+        program = self.client.get(self.program_url)
+        past_program = self.client.get(reverse('program', args=[self.past_year.pk]))
+
+        self.workshop.page_content = '<p>Nowy opis</p>'
+        self.workshop.save()
+        response = self.assertModified(self.workshop_url, response)
+        self.assertContains(response, 'Nowy opis')
+        self.assertModified(self.program_url, program)
+        self.assertNotModified(reverse('program', args=[self.past_year.pk]), past_program)
+
+        # Changes made in the admin don't send the signals
+        workshop_admin = admin.site._registry[Workshop]
+        workshop_admin.make_cancelled(None, Workshop.objects.filter(pk=self.workshop.pk))
+        response = self.assertModified(self.workshop_url, response)
+
+        workshop_admin.make_refused(None, Workshop.objects.filter(pk=self.workshop.pk))
+        response = self.client.get(self.workshop_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_current_camp_changes_daily(self):
+        response = self.client.get(self.program_url)
+        past_program = self.client.get(reverse('program', args=[self.past_year.pk]))
+        tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+        with mock.patch('django.utils.timezone.localdate', return_value=tomorrow):
+            response = self.assertModified(self.program_url, response)
+            self.assertNotModified(reverse('program', args=[self.past_year.pk]), past_program)
+
+    def test_logged_in(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.workshop_url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertNotModified(self.workshop_url, response)
+        program = self.client.get(self.program_url)
+        self.assertNotModified(self.program_url, program)
+
+        # Registering changes the buttons
+        WorkshopParticipant.objects.create(workshop=self.workshop, participant=self.user.userprofile)
+        response = self.assertModified(self.workshop_url, response)
+        program = self.assertModified(self.program_url, program)
+
+        # The menu depends on the permissions
+        self.user.user_permissions.add(Permission.objects.get(codename='see_all_users'))
+        self.assertModified(self.workshop_url, response)
+
+        # Pages of other users are different
+        other = User.objects.create_user(username='other', email='other@example.com', password='user123')
+        self.client.force_login(other)
+        self.assertModified(self.program_url, program)
+
+    def test_without_csrf_token(self):
+        del self.client.cookies[settings.CSRF_COOKIE_NAME]
+        response = self.client.get(self.program_url)
+        self.assertEqual(response.status_code, 200)
+        # A new token is made for the page, so it can't be revalidated
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+    def test_csrf_token_changes(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.program_url)
+        self.assertNotModified(self.program_url, response)
+
+        # Logging in again changes the CSRF token embedded in the page
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        self.assertModified(self.program_url, response)
+
+    def test_messages_are_always_rendered(self):
+        response = self.client.get(self.article_url)
+        with mock.patch('wwwapp.conditional.messages.get_messages', return_value=['Zapisano.']):
+            response = self.client.get(self.article_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_qualification_problems(self):
+        url = reverse('qualification_problems', args=[self.year.pk, self.workshop.name])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+        self.workshop.qualification_problems = SimpleUploadedFile('problems.pdf', os.urandom(1024))
+        self.workshop.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotModified(url, response)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        self.workshop.qualification_problems = SimpleUploadedFile('problems.pdf', os.urandom(1024))
+        self.workshop.save()
+        self.assertModified(url, response)
@@ -0,0 +1,144 @@
+import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from wwwapp.models import Camp, CoRegistrationMatrix, WorkshopType, Workshop, WorkshopParticipant
+
+
+class CoRegistrationTestBase(TestCase):
+    def setUp(self):
+        self.year = Camp.objects.get()
+        self.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin123')
+        self.workshop_type = WorkshopType.objects.create(year=self.year, name='This type')
+
+        self.lecturer = User.objects.create_user(username='lecturer', email='lecturer@example.com',
+                                                 password='user123')
+        self.workshops = []
+        for i in range(3):
+            workshop = Workshop.objects.create(title='Warsztaty {}'.format(i), name='warsztaty{}'.format(i),
+                                               year=self.year, type=self.workshop_type,
+                                               status=Workshop.STATUS_ACCEPTED)
+            self.workshops.append(workshop)
+        self.workshops[0].lecturer.add(self.lecturer.userprofile)
+        self.workshops[1].lecturer.add(self.lecturer.userprofile)
+        rejected = Workshop.objects.create(title='Odrzucone', name='odrzucone', year=self.year,
+                                           type=self.workshop_type, status=Workshop.STATUS_REJECTED)
+
+        self.participants = [
+            User.objects.create_user(username='participant%d' % i, email='participant%d@example.com' % i,
+                                     password='user123')
+            for i in range(3)
+        ]
+        for participant, workshops in zip(self.participants, [[0, 1], [0, 1, 2], [2]]):
+            for i in workshops:
+                WorkshopParticipant.objects.create(workshop=self.workshops[i], participant=participant.userprofile)
+            WorkshopParticipant.objects.create(workshop=rejected, participant=participant.userprofile)
+
+        self.client.force_login(self.admin_user)
+
+
+class CoRegistrationTest(CoRegistrationTestBase):
+    def test_json(self):
+        response = self.client.get(reverse('coregistration', args=[self.year.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(response.json(), {
+            'workshops': [{'wid': workshop.pk, 'name': workshop.title} for workshop in self.workshops],
+            'matrix': [
+                [3, 3, 1],
+                [3, 3, 1],
+                [1, 1, 2],
+            ],
+        })
+
+    def test_csv(self):
+        response = self.client.get(reverse('coregistration_csv', args=[self.year.pk]))
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertListEqual(content.splitlines(), [
+            ',Warsztaty 0,Warsztaty 1,Warsztaty 2',
+            'Warsztaty 0,3,3,1',
+            'Warsztaty 1,3,3,1',
+            'Warsztaty 2,1,1,2',
+        ])
+
+    def test_matrix_is_read_once(self):
+        # The workshops and the counts have to come from the same version of the cached matrix
+        with mock.patch.object(CoRegistrationMatrix, 'get', wraps=CoRegistrationMatrix.get) as get:
+            response = self.client.get(reverse('coregistration', args=[self.year.pk]))
+        self.assertEqual(response.status_code, 200)
+        get.assert_called_once_with(self.year.pk)
+
+    def test_lecturer_and_participant_counted_once(self):
+        self.workshops[2].lecturer.add(self.participants[2].userprofile)
+        self.assertListEqual(CoRegistrationMatrix.as_rows(CoRegistrationMatrix.get(self.year.pk))[2], [1, 1, 2])
+
+    def test_permissions(self):
+        normal_user = User.objects.create_user(username='user', email='user@example.com', password='user123')
+        self.client.force_login(normal_user)
+        response = self.client.get(reverse('coregistration', args=[self.year.pk]))
+        self.assertEqual(response.status_code, 302)
+
+    def test_missing_year(self):
+        response = self.client.get(reverse('coregistration', args=[1999]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CoRegistrationCacheTest(CoRegistrationTestBase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def tearDown(self):
+        cache.clear()
+
+    def assertMatrixUpToDate(self):
+        expected = CoRegistrationMatrix.compute_counts(self.year.pk)
+        self.assertDictEqual(CoRegistrationMatrix.get(self.year.pk)['counts'], expected)
+
+    def test_registration_changes(self):
+        past_year = Camp.objects.create(year=self.year.year - 1)
+        CoRegistrationMatrix.get(past_year.pk)
+        CoRegistrationMatrix.get(self.year.pk)
+
+        WorkshopParticipant.objects.create(workshop=self.workshops[2], participant=self.participants[0].userprofile)
+        # Only the matrix of the changed year is recomputed
+        with CaptureQueriesContext(connection) as queries:
+            CoRegistrationMatrix.get(past_year.pk)
+        self.assertEqual(len(queries.captured_queries), 0)
+        self.assertMatrixUpToDate()
+        self.assertListEqual(CoRegistrationMatrix.as_rows(CoRegistrationMatrix.get(self.year.pk))[0], [3, 3, 2])
+
+        WorkshopParticipant.objects.filter(participant=self.participants[1].userprofile).delete()
+        self.assertMatrixUpToDate()
+
+        self.workshops[2].lecturer.add(self.lecturer.userprofile)
+        self.assertMatrixUpToDate()
+        self.lecturer.userprofile.lecturer_workshops.remove(self.workshops[0])
+        self.assertMatrixUpToDate()
+        self.lecturer.userprofile.lecturer_workshops.clear()
+        self.assertMatrixUpToDate()
+
+        # Changing the points doesn't recompute anything
+        participation = WorkshopParticipant.objects.filter(workshop=self.workshops[2]).first()
+        participation.qualification_result = 10
+        participation.save()
+        with CaptureQueriesContext(connection) as queries:
+            CoRegistrationMatrix.get(self.year.pk)
+        self.assertEqual(len(queries.captured_queries), 0)
+
+    def test_workshop_changes(self):
+        CoRegistrationMatrix.get(self.year.pk)
+        self.workshops[2].status = Workshop.STATUS_CANCELLED
+        self.workshops[2].save()
+        self.assertEqual(len(CoRegistrationMatrix.get(self.year.pk)['workshops']), 2)
+        self.assertMatrixUpToDate()
+
+        self.workshops[1].delete()
+        self.assertEqual(len(CoRegistrationMatrix.get(self.year.pk)['workshops']), 1)
+        self.assertMatrixUpToDate()
@@ -0,0 +1,129 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from wwwapp.models import Camp, WorkshopType, Workshop, WorkshopParticipant, WorkshopUserProfile
+from wwwforms.models import Form, FormQuestion
+
+
+class DataForPlanTestBase(TestCase):
+    def setUp(self):
+        Camp.objects.all().update(year=2020, start_date=datetime.date(2020, 7, 3), end_date=datetime.date(2020, 7, 15))
+        self.year = Camp.objects.get()
+        self.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin123')
+
+        workshop_type = WorkshopType.objects.create(year=self.year, name='This type')
+        self.lecturer = User.objects.create_user(username='lecturer', email='lecturer@example.com', password='user123',
+                                                 first_name='Lech', last_name='Wykładowca')
+        self.workshop = Workshop.objects.create(title='Warsztaty', name='warsztaty', year=self.year,
+                                                type=workshop_type, status=Workshop.STATUS_ACCEPTED)
+        self.workshop.lecturer.add(self.lecturer.userprofile)
+        rejected_workshop = Workshop.objects.create(title='Odrzucone', name='odrzucone', year=self.year,
+                                                    type=workshop_type, status=Workshop.STATUS_REJECTED)
+        rejected_workshop.lecturer.add(self.admin_user.userprofile)
+
+        self.participant = User.objects.create_user(username='participant', email='participant@example.com',
+                                                    password='user123', first_name='Jan', last_name='Kowalski')
+        WorkshopUserProfile.objects.create(user_profile=self.participant.userprofile, year=self.year,
+                                           status=WorkshopUserProfile.STATUS_ACCEPTED)
+        WorkshopParticipant.objects.create(workshop=self.workshop, participant=self.participant.userprofile)
+        rejected = User.objects.create_user(username='rejected', email='rejected@example.com', password='user123')
+        WorkshopUserProfile.objects.create(user_profile=rejected.userprofile, year=self.year,
+                                           status=WorkshopUserProfile.STATUS_REJECTED)
+        WorkshopParticipant.objects.create(workshop=self.workshop, participant=rejected.userprofile)
+
+        form = Form.objects.create(name='info', title='Info')
+        arrival = form.questions.create(title='Przyjazd', data_type=FormQuestion.TYPE_DATE)
+        departure = form.questions.create(title='Wyjazd', data_type=FormQuestion.TYPE_DATE)
+        form.arrival_date = arrival
+        form.departure_date = departure
+        form.save()
+        self.arrival_answer = arrival.answers.create(user=self.participant, value_date=datetime.date(2020, 7, 5))
+        # Out of the camp dates
+        departure.answers.create(user=self.participant, value_date=datetime.date(2020, 8, 1))
+
+        self.client.force_login(self.admin_user)
+
+
+class DataForPlanTest(DataForPlanTestBase):
+    def test_data(self):
+        response = self.client.get(reverse('dataForPlan', args=[self.year.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn(b'\n', response.content)
+        self.assertDictEqual(response.json(), {
+            'workshops': [{'wid': self.workshop.pk, 'name': 'Warsztaty', 'lecturers': [self.lecturer.userprofile.pk]}],
+            'users': [
+                {'uid': self.lecturer.userprofile.pk, 'name': 'Lech Wykładowca', 'type': 'Lecturer',
+                 'start': '2020-07-03', 'end': '2020-07-15'},
+                {'uid': self.participant.userprofile.pk, 'name': 'Jan Kowalski', 'type': 'Participant',
+                 'start': '2020-07-05', 'end': '2020-07-15'},
+            ],
+            'participation': [{'wid': self.workshop.pk, 'uid': self.participant.userprofile.pk}],
+        })
+
+        response = self.client.get(reverse('dataForPlan', args=[self.year.pk]), {'pretty': 1})
+        self.assertIn(b'\n    ', response.content)
+
+    def test_query_count(self):
+        for i in range(10):
+            user = User.objects.create_user(username='user%d' % i, email='user%d@example.com' % i, password='user123')
+            WorkshopUserProfile.objects.create(user_profile=user.userprofile, year=self.year,
+                                               status=WorkshopUserProfile.STATUS_ACCEPTED)
+            WorkshopParticipant.objects.create(workshop=self.workshop, participant=user.userprofile)
+            self.workshop.lecturer.add(user.userprofile)
+        # Session, user, camp, workshops, lecturers, participants, other lecturers, current camp, arrival dates,
+        # departure dates, participation
+        with self.assertNumQueries(11):
+            response = self.client.get(reverse('dataForPlan', args=[self.year.pk]))
+        self.assertEqual(len(response.json()['users']), 12)
+
+    def test_missing_year(self):
+        response = self.client.get(reverse('dataForPlan', args=[1999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_request(self):
+        response = self.client.get(reverse('dataForPlan', args=[self.year.pk]))
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(reverse('dataForPlan', args=[self.year.pk]), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DataForPlanCacheTest(DataForPlanTestBase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_cached_until_changed(self):
+        response = self.client.get(reverse('dataForPlan', args=[self.year.pk]))
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+
+        # Only the session and the user are loaded
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('dataForPlan', args=[self.year.pk]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(reverse('dataForPlan', args=[self.year.pk]), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        self.arrival_answer.value_date = datetime.date(2020, 7, 6)
+        self.arrival_answer.save()
+        response = self.client.get(reverse('dataForPlan', args=[self.year.pk]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['users'][1]['start'], '2020-07-06')
+
+        # Logging in doesn't change anything in the plan
+        etag = response['ETag']
+        self.client.force_login(self.participant)
+        self.client.force_login(self.admin_user)
+        response = self.client.get(reverse('dataForPlan', args=[self.year.pk]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
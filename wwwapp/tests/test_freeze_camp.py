@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from wwwapp.freezing import mark_camp_frozen
+from wwwapp.models import Article, Camp, Workshop, WorkshopType
+
+TMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   MEDIA_ROOT=TMP_MEDIA_ROOT, FROZEN_CAMPS_DIR='frozen')
+class FreezeCampTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Camp.objects.get()
+        self.past_year = Camp.objects.create(year=self.year.year - 1)
+        self.frozen_dir = os.path.join(TMP_MEDIA_ROOT, 'frozen', str(self.past_year.pk))
+
+        self.lecturer = User.objects.create_user(username='lecturer', email='lecturer@example.com',
+                                                 password='user123', first_name='Jan', last_name='Kowalski')
+        workshop_type = WorkshopType.objects.create(year=self.past_year, name='Past type')
+        self.problems = os.urandom(1024)
+        self.workshop = Workshop.objects.create(title='Stare warsztaty', name='stare', year=self.past_year,
+                                                type=workshop_type, status=Workshop.STATUS_ACCEPTED,
+                                                page_content='<p>Opis warsztatów</p>', page_content_is_public=True,
+                                                qualification_problems=SimpleUploadedFile('problems.pdf',
+                                                                                          self.problems))
+        self.workshop.lecturer.add(self.lecturer.userprofile)
+        Workshop.objects.create(title='Odrzucone', name='odrzucone', year=self.past_year, type=workshop_type,
+                                status=Workshop.STATUS_REJECTED)
+        current_type = WorkshopType.objects.create(year=self.year, name='This type')
+        self.current_workshop = Workshop.objects.create(title='Nowe warsztaty', name='nowe', year=self.year,
+                                                        type=current_type, status=Workshop.STATUS_ACCEPTED)
+
+    def tearDown(self):
+        cache.clear()
+        shutil.rmtree(TMP_MEDIA_ROOT, ignore_errors=True)
+
+    def frozen_file(self, *path):
+        with open(os.path.join(self.frozen_dir, *path), 'rb') as f:
+            return f.read()
+
+    def freeze(self):
+        call_command('freeze_camp', str(self.past_year.pk), '--base-url', 'https://example.com', stdout=StringIO())
+
+    def test_freeze(self):
+        self.freeze()
+        self.assertEqual(sorted(os.listdir(os.path.join(TMP_MEDIA_ROOT, 'frozen'))),
+                         [str(self.past_year.pk), '{}.frozen'.format(self.past_year.pk)])
+
+        program = self.frozen_file('program', 'index.html').decode()
+        self.assertIn('Stare warsztaty', program)
+        self.assertIn('Jan Kowalski', program)
+        self.assertNotIn('Odrzucone', program)
+        self.assertIn('https://example.com', program)
+        self.assertIn('Opis warsztatów', self.frozen_file('workshop', 'stare', 'index.html').decode())
+        self.assertEqual(self.frozen_file('workshop', 'stare', 'qualProblems', 'index.pdf'), self.problems)
+        self.assertFalse(os.path.exists(os.path.join(self.frozen_dir, 'workshop', 'odrzucone')))
+
+        # Freezing again replaces the previous version
+        Workshop.objects.filter(pk=self.workshop.pk).update(qualification_problems=None)
+        self.freeze()
+        self.assertFalse(os.path.exists(os.path.join(self.frozen_dir, 'workshop', 'stare', 'qualProblems')))
+
+        call_command('freeze_camp', str(self.past_year.pk), '--remove', stdout=StringIO())
+        self.assertFalse(os.path.exists(self.frozen_dir))
+
+    def test_only_past_camps(self):
+        with self.assertRaises(CommandError):
+            call_command('freeze_camp', str(self.year.pk), stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('freeze_camp', '1900', stdout=StringIO())
+        self.assertFalse(os.path.exists(os.path.join(TMP_MEDIA_ROOT, 'frozen', str(self.year.pk))))
+
+    def test_unfreeze_on_change(self):
+        self.freeze()
+        program = self.frozen_file('program', 'index.html')
+
+        # Changes in other camps and outside of the menubar don't touch the frozen pages
+        self.current_workshop.title = 'Zmienione nowe warsztaty'
+        self.current_workshop.save()
+        Article.objects.create(name='not_on_menubar', title='Poza menu')
+        self.assertEqual(self.frozen_file('program', 'index.html'), program)
+
+        # The outdated pages are only removed, they are frozen again by running the command (see test_freeze_stale)
+        self.workshop.title = 'Zmienione warsztaty'
+        self.workshop.save()
+        self.assertFalse(os.path.exists(self.frozen_dir))
+        self.freeze()
+        self.assertIn('Zmienione warsztaty', self.frozen_file('program', 'index.html').decode())
+
+        self.lecturer.first_name = 'Janina'
+        self.lecturer.save()
+        self.assertFalse(os.path.exists(self.frozen_dir))
+        self.freeze()
+
+        Article.objects.create(name='menubar', title='W menu', on_menubar=True)
+        self.assertFalse(os.path.exists(self.frozen_dir))
+
+    def test_freeze_stale(self):
+        self.freeze()
+        call_command('freeze_camp', '--stale', stdout=StringIO())
+        self.assertTrue(os.path.exists(self.frozen_dir))
+
+        Article.objects.create(name='menubar', title='W menu', on_menubar=True)
+        self.assertFalse(os.path.exists(self.frozen_dir))
+        call_command('freeze_camp', '--stale', '--base-url', 'https://example.com', stdout=StringIO())
+        self.assertIn('W menu', self.frozen_file('program', 'index.html').decode())
+
+        # Camps removed with --remove are not frozen again
+        call_command('freeze_camp', str(self.past_year.pk), '--remove', stdout=StringIO())
+        call_command('freeze_camp', '--stale', stdout=StringIO())
+        self.assertFalse(os.path.exists(self.frozen_dir))
+
+    def test_freeze_stale_forgets_removed_camps(self):
+        mark_camp_frozen(self.past_year.pk + 1000)
+        call_command('freeze_camp', '--stale', stdout=StringIO())
+        self.assertListEqual(os.listdir(os.path.join(TMP_MEDIA_ROOT, 'frozen')), [])
+
+    def test_year_or_stale(self):
+        with self.assertRaises(CommandError):
+            call_command('freeze_camp', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('freeze_camp', str(self.past_year.pk), '--stale', stdout=StringIO())
+
+    def test_unfreeze_errors_are_not_raised(self):
+        self.freeze()
+        with mock.patch('wwwapp.freezing.os.rename', side_effect=PermissionError), \
+                self.assertLogs('wwwapp.freezing', 'ERROR'):
+            self.workshop.title = 'Zmienione warsztaty'
+            self.workshop.save()
+        self.assertTrue(Workshop.objects.filter(title='Zmienione warsztaty').exists())
+
+    def test_camps_that_are_not_frozen_stay_dynamic(self):
+        self.workshop.title = 'Zmienione warsztaty'
+        self.workshop.save()
+        self.assertFalse(os.path.exists(self.frozen_dir))
@@ -0,0 +1,214 @@
+import itertools
+import smtplib
+from io import StringIO
+
+from django.contrib.auth.models import User, Permission
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from wwwapp.mail_queue import MailQueueWorker, enqueue_mail
+from wwwapp.models import Camp, QueuedMail, QueuedMailRecipient, WorkshopType, Workshop
+
+
+class FakeSMTPBackend(BaseEmailBackend):
+    """
+    Stand-in for the SMTP backend, which records the connections and fails for the chosen addresses
+    """
+    def __init__(self, failures=None, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures or {}
+        self.is_open = False
+        self.opened = 0
+        self.sent = []
+
+    def open(self):
+        if self.is_open:
+            return False
+        self.is_open = True
+        self.opened += 1
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, email_messages):
+        assert self.is_open
+        for message in email_messages:
+            errors = self.failures.get(message.to[0])
+            if errors:
+                raise errors.pop(0)
+            self.sent.append(message)
+        return len(email_messages)
+
+
+class MailQueueWorkerTest(TestCase):
+    def setUp(self):
+        self.mail = enqueue_mail('Temat', 'Treść', ['user{}@example.com'.format(i) for i in range(5)] + [''])
+
+    def statuses(self):
+        return dict(QueuedMailRecipient.objects.values_list('email', 'status'))
+
+    def test_enqueue(self):
+        self.assertEqual(self.mail.recipients.count(), 5)
+        duplicates = enqueue_mail('Temat', 'Treść', ['a@example.com', 'a@example.com'])
+        self.assertEqual(duplicates.recipients.count(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_sends_in_batches_over_one_connection(self):
+        backend = FakeSMTPBackend()
+        processed, batches = MailQueueWorker(backend, batch_size=2, send_interval=0).run()
+        self.assertEqual((processed, batches), (5, 3))
+        self.assertEqual(backend.opened, 1)
+        self.assertFalse(backend.is_open)
+        self.assertListEqual(sorted(message.to[0] for message in backend.sent),
+                             ['user{}@example.com'.format(i) for i in range(5)])
+        self.assertEqual(backend.sent[0].subject, 'Temat')
+        self.assertEqual(backend.sent[0].body, 'Treść')
+        self.assertTrue(all(status == QueuedMailRecipient.STATUS_SENT for status in self.statuses().values()))
+        self.assertEqual(QueuedMailRecipient.objects.filter(sent_at__isnull=True).count(), 0)
+
+        # Nothing is sent twice
+        self.assertEqual(MailQueueWorker(backend, send_interval=0).run(), (0, 0))
+
+    def test_retry(self):
+        backend = FakeSMTPBackend(failures={
+            'user1@example.com': [smtplib.SMTPServerDisconnected('Connection lost')],
+            'user2@example.com': [smtplib.SMTPDataError(451, 'Try again later')] * 3,
+            'user3@example.com': [smtplib.SMTPRecipientsRefused({'user3@example.com': (550, b'No such user')})],
+        })
+        worker = MailQueueWorker(backend, send_interval=0, max_attempts=2, retry_delay=60)
+        self.assertEqual(worker.run(), (5, 1))
+        # The connection is reopened after an error
+        self.assertEqual(backend.opened, 3)
+        self.assertDictEqual(self.statuses(), {
+            'user0@example.com': QueuedMailRecipient.STATUS_SENT,
+            'user1@example.com': QueuedMailRecipient.STATUS_PENDING,
+            'user2@example.com': QueuedMailRecipient.STATUS_PENDING,
+            'user3@example.com': QueuedMailRecipient.STATUS_FAILED,
+            'user4@example.com': QueuedMailRecipient.STATUS_SENT,
+        })
+        retried = QueuedMailRecipient.objects.get(email='user1@example.com')
+        self.assertEqual(retried.attempts, 1)
+        self.assertIn('Connection lost', retried.last_error)
+        self.assertGreater(retried.next_attempt_at, timezone.now())
+
+        # The retries are not due yet
+        self.assertEqual(worker.run(), (0, 0))
+
+        QueuedMailRecipient.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(worker.run(), (2, 1))
+        statuses = self.statuses()
+        self.assertEqual(statuses['user1@example.com'], QueuedMailRecipient.STATUS_SENT)
+        self.assertEqual(statuses['user2@example.com'], QueuedMailRecipient.STATUS_FAILED)
+        self.assertEqual(QueuedMailRecipient.objects.get(email='user2@example.com').attempts, 2)
+
+    def test_broken_message(self):
+        backend = FakeSMTPBackend(failures={'user1@example.com': [ValueError('Header values may not contain linefeed')]})
+        worker = MailQueueWorker(backend, send_interval=0)
+        self.assertEqual(worker.run(), (5, 1))
+        statuses = self.statuses()
+        self.assertEqual(statuses.pop('user1@example.com'), QueuedMailRecipient.STATUS_FAILED)
+        self.assertTrue(all(status == QueuedMailRecipient.STATUS_SENT for status in statuses.values()))
+        self.assertIn('linefeed', QueuedMailRecipient.objects.get(email='user1@example.com').last_error)
+
+    def test_gives_up_after_max_attempts_without_a_result(self):
+        # The worker was killed while sending to user0 every time
+        QueuedMailRecipient.objects.filter(email='user0@example.com').update(attempts=2)
+        worker = MailQueueWorker(FakeSMTPBackend(), send_interval=0, max_attempts=2)
+        self.assertEqual(len(worker.claim_batch()), 4)
+        self.assertEqual(self.statuses()['user0@example.com'], QueuedMailRecipient.STATUS_FAILED)
+
+    def test_stops_when_the_lease_expires(self):
+        ticks = itertools.count(0, 4)
+        backend = FakeSMTPBackend()
+        worker = MailQueueWorker(backend, send_interval=0, lease=10, clock=lambda: next(ticks))
+        self.assertEqual(worker.run(), (1, 1))
+        self.assertEqual(len(backend.sent), 1)
+        self.assertEqual(list(self.statuses().values()).count(QueuedMailRecipient.STATUS_PENDING), 4)
+
+    def test_batch_has_to_fit_in_the_lease(self):
+        with self.assertRaises(ValueError):
+            MailQueueWorker(FakeSMTPBackend(), batch_size=10, send_interval=60, lease=600)
+        with self.assertRaises(CommandError):
+            call_command('send_queued_mail', '--batch-size=1000', '--interval=1', stdout=StringIO())
+
+    def test_rate_limit(self):
+        sleeps = []
+        worker = MailQueueWorker(FakeSMTPBackend(), send_interval=2, sleep=sleeps.append, clock=lambda: 100.0)
+        worker.run()
+        self.assertListEqual(sleeps, [2.0] * 4)
+
+    def test_claimed_batch_is_leased(self):
+        worker = MailQueueWorker(FakeSMTPBackend(), batch_size=3, send_interval=0)
+        self.assertEqual(len(worker.claim_batch()), 3)
+        self.assertEqual(len(worker.claim_batch()), 2)
+        # The worker died before sending anything, the other workers have to wait for the lease to expire
+        self.assertEqual(len(worker.claim_batch()), 0)
+        QueuedMailRecipient.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(len(worker.claim_batch()), 3)
+        self.assertSetEqual(set(QueuedMailRecipient.objects.values_list('attempts', flat=True)), {1, 2})
+
+    def test_command(self):
+        out = StringIO()
+        call_command('send_queued_mail', '--interval=0', '--batch-size=2', stdout=out)
+        self.assertIn('Processed 5 recipients in 3 batches', out.getvalue())
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertListEqual([message.to for message in mail.outbox],
+                             [['user{}@example.com'.format(i)] for i in range(5)])
+
+        with self.assertRaises(CommandError):
+            call_command('send_queued_mail', '--batch-size=0', stdout=StringIO())
+
+
+class SendFilteredEmailsViewTest(TestCase):
+    def setUp(self):
+        self.year = Camp.objects.get()
+        self.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin123')
+        self.lecturer = User.objects.create_user(username='lecturer', email='lecturer@example.com',
+                                                 password='user123')
+        workshop_type = WorkshopType.objects.create(year=self.year, name='This type')
+        workshop = Workshop.objects.create(title='Warsztaty', name='warsztaty', year=self.year, type=workshop_type,
+                                           status=Workshop.STATUS_ACCEPTED)
+        workshop.lecturer.add(self.lecturer.userprofile)
+
+    def test_enqueue(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.post(reverse('emails_send', args=[self.year.pk]),
+                                    {'filter': 'allLecturers', 'subject': 'Plan', 'body': 'Plan zajęć'})
+        self.assertRedirects(response, reverse('emails', args=[self.year.pk]))
+        self.assertEqual(len(mail.outbox), 0)
+
+        queued = QueuedMail.objects.get()
+        self.assertEqual(queued.subject, 'Plan')
+        self.assertEqual(queued.created_by, self.admin_user)
+        self.assertListEqual(list(queued.recipients.values_list('email', 'status')),
+                             [('lecturer@example.com', QueuedMailRecipient.STATUS_PENDING)])
+
+        response = self.client.get(reverse('emails', args=[self.year.pk]))
+        self.assertContains(response, 'Plan')
+        self.assertEqual(response.context['queued_mails'][0].pending_count, 1)
+
+    def test_invalid_form(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.post(reverse('emails_send', args=[self.year.pk]),
+                                    {'filter': 'allLecturers', 'subject': '', 'body': 'Plan zajęć'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['mail_form'].errors)
+        self.assertFalse(QueuedMail.objects.exists())
+
+    def test_permissions(self):
+        user = User.objects.create_user(username='user', email='user@example.com', password='user123')
+        user.user_permissions.add(Permission.objects.get(codename='see_all_users'))
+        self.client.force_login(user)
+        response = self.client.post(reverse('emails', args=[self.year.pk]), {'filter': 'allLecturers'})
+        self.assertNotIn('mail_form', response.context)
+        response = self.client.post(reverse('emails_send', args=[self.year.pk]),
+                                    {'filter': 'allLecturers', 'subject': 'Plan', 'body': 'Plan zajęć'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(QueuedMail.objects.exists())
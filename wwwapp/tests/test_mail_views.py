@@ -0,0 +1,126 @@
+from django.contrib.auth.models import User, Permission
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from wwwapp.models import Camp, WorkshopType, Workshop, WorkshopParticipant, WorkshopUserProfile
+
+
+class FilteredEmailsTest(TestCase):
+    def setUp(self):
+        self.year = Camp.objects.get()
+        self.other_year = Camp.objects.create(year=self.year.year - 1)
+        self.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin123')
+
+        def create_user(name):
+            return User.objects.create_user(username=name, email='{}@example.com'.format(name), password='user123',
+                                            first_name=name.capitalize(), last_name='Testowy')
+        self.accepted_lecturer = create_user('accepted_lecturer')
+        self.rejected_lecturer = create_user('rejected_lecturer')
+        self.old_lecturer = create_user('old_lecturer')
+        self.qualified = create_user('qualified')
+        self.refused = create_user('refused')
+        create_user('nobody')
+
+        workshop_type = WorkshopType.objects.create(year=self.year, name='This type')
+        old_workshop_type = WorkshopType.objects.create(year=self.other_year, name='Old type')
+        accepted = Workshop.objects.create(title='Zaakceptowane', name='zaakceptowane', year=self.year,
+                                           type=workshop_type, status=Workshop.STATUS_ACCEPTED)
+        accepted.lecturer.add(self.accepted_lecturer.userprofile)
+        rejected = Workshop.objects.create(title='Odrzucone', name='odrzucone', year=self.year,
+                                           type=workshop_type, status=Workshop.STATUS_REJECTED)
+        rejected.lecturer.add(self.rejected_lecturer.userprofile, self.accepted_lecturer.userprofile)
+        old = Workshop.objects.create(title='Stare', name='stare', year=self.other_year,
+                                      type=old_workshop_type, status=Workshop.STATUS_ACCEPTED)
+        old.lecturer.add(self.old_lecturer.userprofile)
+
+        for user, status in [(self.qualified, WorkshopUserProfile.STATUS_ACCEPTED),
+                             (self.refused, WorkshopUserProfile.STATUS_REJECTED)]:
+            WorkshopParticipant.objects.create(workshop=accepted, participant=user.userprofile)
+            WorkshopParticipant.objects.create(workshop=rejected, participant=user.userprofile)
+            WorkshopUserProfile.objects.create(user_profile=user.userprofile, year=self.year, status=status)
+        # Lecturer who is also a participant
+        WorkshopParticipant.objects.create(workshop=accepted, participant=self.rejected_lecturer.userprofile)
+        WorkshopParticipant.objects.create(workshop=old, participant=self.refused.userprofile)
+
+        self.client.force_login(self.admin_user)
+
+    @staticmethod
+    def filter_method(filter_id):
+        # Imported here, because importing the views creates the special articles, which has to happen in the test
+        # database
+        from wwwapp.mail_views import _registered_filters
+        return _registered_filters[filter_id][0]
+
+    def emails(self, filter_id):
+        return list(self.filter_method(filter_id)(self.year).order_by('email').values_list('email', flat=True))
+
+    def test_filters(self):
+        self.assertListEqual(self.emails('all'), [
+            'accepted_lecturer@example.com', 'qualified@example.com', 'refused@example.com',
+            'rejected_lecturer@example.com'])
+        self.assertListEqual(self.emails('allLecturers'), [
+            'accepted_lecturer@example.com', 'rejected_lecturer@example.com'])
+        self.assertListEqual(self.emails('acceptedLecturers'), ['accepted_lecturer@example.com'])
+        self.assertListEqual(self.emails('deniedLecturers'), [
+            'accepted_lecturer@example.com', 'rejected_lecturer@example.com'])
+        self.assertListEqual(self.emails('allParticipants'), [
+            'qualified@example.com', 'refused@example.com', 'rejected_lecturer@example.com'])
+        self.assertListEqual(self.emails('allQualified'), ['qualified@example.com'])
+        self.assertListEqual(self.emails('allRefused'), ['refused@example.com'])
+
+    def test_filters_are_composable(self):
+        lecturers = self.filter_method('allLecturers')(self.year)
+        participants = self.filter_method('allParticipants')(self.year)
+        with self.assertNumQueries(1):
+            self.assertListEqual(list((lecturers & participants).values_list('email', flat=True)),
+                                 ['rejected_lecturer@example.com'])
+
+    def test_view(self):
+        response = self.client.post(reverse('emails', args=[self.year.pk]), {'filter': 'all'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['filtered_count'], 4)
+        self.assertContains(response, 'accepted_lecturer@example.com, qualified@example.com, ')
+
+    def test_view_query_count(self):
+        # The e-mails of all the users are loaded in a single query
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('emails', args=[self.year.pk]), {'filter': 'all'})
+        user_queries = [query['sql'] for query in queries.captured_queries
+                        if query['sql'].startswith('SELECT "auth_user"."email"')]
+        self.assertEqual(len(user_queries), 1)
+
+    def test_count_preview(self):
+        response = self.client.post(reverse('emails', args=[self.year.pk]), {'filter': 'allLecturers', 'count': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['filtered_count'], 2)
+        self.assertNotIn('filtered_emails', response.context)
+        self.assertNotContains(response, 'accepted_lecturer@example.com')
+
+    def test_export(self):
+        response = self.client.get(reverse('emails_export_txt', args=[self.year.pk]), {'filter': 'allQualified'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'qualified@example.com\n')
+
+        response = self.client.get(reverse('emails_export_csv', args=[self.year.pk]), {'filter': 'allLecturers'})
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual(b''.join(response.streaming_content).decode('utf-8-sig').splitlines(), [
+            'Imię,Nazwisko,E-mail',
+            'Accepted_lecturer,Testowy,accepted_lecturer@example.com',
+            'Rejected_lecturer,Testowy,rejected_lecturer@example.com',
+        ])
+
+        response = self.client.get(reverse('emails_export_txt', args=[self.year.pk]), {'filter': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_permissions(self):
+        user = User.objects.create_user(username='user', email='user@example.com', password='user123')
+        self.client.force_login(user)
+        response = self.client.get(reverse('emails_export_txt', args=[self.year.pk]), {'filter': 'all'})
+        self.assertEqual(response.status_code, 403)
+
+        user.user_permissions.add(Permission.objects.get(codename='see_all_users'))
+        response = self.client.get(reverse('emails_export_txt', args=[self.year.pk]), {'filter': 'all'})
+        self.assertEqual(response.status_code, 200)
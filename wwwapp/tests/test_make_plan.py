@@ -0,0 +1,185 @@
+import json
+import random
+from io import StringIO
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+from wwwapp.models import Camp, WorkshopType, Workshop, WorkshopParticipant, WorkshopUserProfile
+from wwwapp.plan_optimizer import Plan, PlanProblem, optimize
+
+
+def random_data(rng: random.Random, num_workshops: int, num_users: int):
+    users = [{'uid': uid, 'name': 'User {}'.format(uid)} for uid in range(num_users)]
+    for user in users:
+        if rng.random() < 0.2:
+            user['blocks'] = rng.sample(range(6), rng.randint(1, 6))
+    workshops = [{'wid': 100 + i, 'name': 'Workshop {}'.format(i), 'lecturers': rng.sample(range(num_users), 1),
+                  'disallowed_blocks': rng.sample(range(6), rng.choice([0, 0, 1, 2]))}
+                 for i in range(num_workshops)]
+    participation = [{'wid': workshop['wid'], 'uid': user['uid']}
+                     for user in users for workshop in rng.sample(workshops, rng.randint(0, min(7, num_workshops)))]
+    return {'workshops': workshops, 'users': users, 'participation': participation}
+
+
+def reference_score(data, plan):
+    """
+    The evaluate() function of the original make_plan.py script
+    """
+    workshops = {workshop['wid']: workshop for workshop in data['workshops']}
+    block_of = dict(zip([workshop['wid'] for workshop in data['workshops']], plan))
+    users = {user['uid']: {'part': set(), 'blocks': set(user.get('blocks', range(6)))} for user in data['users']}
+    for part in data['participation']:
+        users[part['uid']]['part'].add(part['wid'])
+    for workshop in data['workshops']:
+        for uid in workshop['lecturers']:
+            users[uid]['part'].add(workshop['wid'])
+
+    points = 0
+    for wid, workshop in workshops.items():
+        for uid in workshop['lecturers']:
+            if block_of[wid] not in users[uid]['blocks']:
+                points -= 10 ** 6
+        for block in workshop['disallowed_blocks']:
+            if block_of[wid] == block:
+                points -= 10 ** 3
+    for block in range(6):
+        points -= abs(len(workshops) // 6 - list(block_of.values()).count(block)) * 10 ** 4
+
+    col_counter = {wid: 0 for wid in workshops}
+    for user in users.values():
+        user_blocks = {}
+        for wid in user['part']:
+            if block_of[wid] in user['blocks']:
+                user_blocks.setdefault(block_of[wid], []).append(wid)
+        for wids in user_blocks.values():
+            if len(wids) > 1:
+                for wid in wids:
+                    col_counter[wid] += 1
+        empty_blocks = min(len(user['blocks']), len(user['part'])) - len(user_blocks)
+        points -= empty_blocks ** empty_blocks if empty_blocks > 0 else 0
+    return points - sum(count ** 2 for count in col_counter.values())
+
+
+class PlanOptimizerTest(SimpleTestCase):
+    def test_score_matches_original_evaluate(self):
+        rng = random.Random(0)
+        for _ in range(20):
+            data = random_data(rng, rng.randint(1, 20), rng.randint(1, 30))
+            problem = PlanProblem(data)
+            for _ in range(5):
+                plan = problem.random_plan(rng)
+                self.assertEqual(problem.score(plan), reference_score(data, list(plan)))
+
+    def test_delta_score_matches_full_evaluation(self):
+        rng = random.Random(2)
+        for _ in range(10):
+            data = random_data(rng, rng.randint(1, 20), rng.randint(1, 30))
+            problem = PlanProblem(data)
+            plan = Plan(problem, problem.random_plan(rng))
+            for _ in range(100):
+                committed = list(plan.blocks)
+                for _ in range(rng.randint(1, 3)):
+                    if rng.random() < 0.5:
+                        plan.mutate(rng)
+                    else:
+                        plan.mutate_by_exchange(rng)
+                    self.assertDictEqual(plan.penalties(), problem.penalties(np.array(plan.blocks)))
+                    self.assertEqual(plan.score, reference_score(data, list(plan.blocks)))
+                if rng.random() < 0.5:
+                    plan.commit()
+                else:
+                    plan.rollback()
+                    self.assertListEqual(plan.blocks, committed)
+                self.assertDictEqual(plan.penalties(), problem.penalties(np.array(plan.blocks)))
+                self.assertListEqual(plan.collision_counts, problem.collisions(np.array(plan.blocks)).tolist())
+                self.assertListEqual(plan.counts, Plan(problem, np.array(plan.blocks)).counts)
+
+    def test_disallowed_blocks_argument(self):
+        data = {'workshops': [{'wid': 1, 'name': 'A', 'lecturers': []}], 'users': [], 'participation': []}
+        problem = PlanProblem(data, disallowed_blocks={1: [2]})
+        self.assertEqual(problem.penalties(np.array([2]))['disallowed_blocks'], 1000)
+        self.assertEqual(problem.penalties(np.array([3]))['disallowed_blocks'], 0)
+
+    def test_finds_perfect_plan(self):
+        # Everyone takes part in all the workshops, so every workshop has to get a separate block
+        data = {
+            'workshops': [{'wid': wid, 'name': str(wid), 'lecturers': [0]} for wid in range(6)],
+            'users': [{'uid': uid, 'name': str(uid)} for uid in range(5)],
+            'participation': [{'wid': wid, 'uid': uid} for wid in range(6) for uid in range(5)],
+        }
+        problem = PlanProblem(data)
+        score, plan = optimize(problem, islands=2, population=10, iterations=200, workers=1)
+        self.assertEqual(score, 0)
+        self.assertListEqual(sorted(plan), list(range(6)))
+
+    def test_annealing_finds_perfect_plan(self):
+        # Everyone takes one workshop of every pair (wid, wid + 6), so the pairs have to share blocks
+        data = {
+            'workshops': [{'wid': wid, 'name': str(wid), 'lecturers': []} for wid in range(12)],
+            'users': [{'uid': uid, 'name': str(uid)} for uid in range(12)],
+            'participation': [{'wid': pair + 6 * ((uid >> pair) & 1), 'uid': uid} for uid in range(12) for pair in range(6)],
+        }
+        problem = PlanProblem(data)
+        score, plan = optimize(problem, islands=1, population=5, iterations=500, workers=1, temperature=(30, 1))
+        self.assertEqual(score, 0)
+
+    def test_islands_are_deterministic(self):
+        problem = PlanProblem(random_data(random.Random(1), 12, 20))
+        self.assertEqual(optimize(problem, islands=2, population=5, iterations=20, seed=3, workers=1),
+                         optimize(problem, islands=2, population=5, iterations=20, seed=3, workers=1))
+
+
+class MakePlanCommandTest(TestCase):
+    def setUp(self):
+        self.year = Camp.objects.get()
+        workshop_type = WorkshopType.objects.create(year=self.year, name='This type')
+        lecturer = User.objects.create_user(username='lecturer', email='lecturer@example.com', password='user123')
+        self.workshops = []
+        for i in range(3):
+            workshop = Workshop.objects.create(title='Warsztaty {}'.format(i), name='warsztaty{}'.format(i),
+                                               year=self.year, type=workshop_type, status=Workshop.STATUS_ACCEPTED)
+            workshop.lecturer.add(lecturer.userprofile)
+            self.workshops.append(workshop)
+        participant = User.objects.create_user(username='participant', email='participant@example.com',
+                                               password='user123')
+        WorkshopUserProfile.objects.create(user_profile=participant.userprofile, year=self.year,
+                                           status=WorkshopUserProfile.STATUS_ACCEPTED)
+        for workshop in self.workshops:
+            WorkshopParticipant.objects.create(workshop=workshop, participant=participant.userprofile)
+
+    def test_make_plan(self):
+        out = StringIO()
+        call_command('make_plan', self.year.pk, '--workers=1', '--islands=2', '--population=5', '--iterations=100',
+                     '--disallow={}:0,1,2,3'.format(self.workshops[0].pk), stdout=out, stderr=StringIO())
+        result = json.loads(out.getvalue())
+        self.assertEqual(len(result['blocks']), 6)
+        self.assertListEqual(sorted(wid for block in result['blocks'] for wid in block),
+                             sorted(workshop.pk for workshop in self.workshops))
+        # The workshops are spread over separate blocks, and the first one avoids the disallowed blocks
+        self.assertTrue(all(len(block) <= 1 for block in result['blocks']))
+        self.assertIn(self.workshops[0].pk, result['blocks'][4] + result['blocks'][5])
+        self.assertEqual(result['penalties']['disallowed_blocks'], 0)
+        self.assertEqual(result['penalties']['collisions'], 0)
+
+    def test_make_plan_annealing(self):
+        out = StringIO()
+        call_command('make_plan', self.year.pk, '--workers=1', '--islands=1', '--population=5', '--iterations=100',
+                     '--anneal', '--temperature', '5', '0.5', stdout=out, stderr=StringIO())
+        result = json.loads(out.getvalue())
+        self.assertEqual(result['penalties']['collisions'], 0)
+        self.assertTrue(all(len(block) <= 1 for block in result['blocks']))
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(CommandError):
+            call_command('make_plan', 1900, stdout=StringIO(), stderr=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('make_plan', self.year.pk, '--disallow=1:6', stdout=StringIO(), stderr=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('make_plan', self.year.pk, '--disallow=abc', stdout=StringIO(), stderr=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('make_plan', self.year.pk, '--anneal', '--temperature', '1', '5',
+                         stdout=StringIO(), stderr=StringIO())
@@ -0,0 +1,126 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.test.testcases import TestCase
+from django.urls import reverse
+
+from wwwapp.models import Camp, WorkshopType, Workshop, WorkshopParticipant, WorkshopUserProfile, ParticipantSummary
+from wwwforms.models import Form, FormQuestion, FormQuestionAnswer
+
+
+class ParticipantSummaryTest(TestCase):
+    def setUp(self):
+        Camp.objects.all().update(year=2020, start_date=datetime.date(2020, 7, 3), end_date=datetime.date(2020, 7, 15))
+        self.year_2020 = Camp.objects.get()
+
+        workshop_type = WorkshopType.objects.create(year=self.year_2020, name='This type')
+        self.workshop = Workshop.objects.create(title='Warsztaty', name='warsztaty', year=self.year_2020,
+                                                type=workshop_type, status=Workshop.STATUS_ACCEPTED,
+                                                qualification_threshold=5, max_points=10)
+        self.old_workshop = Workshop.objects.create(title='Stare', name='stare', year=self.year_2020,
+                                                    type=workshop_type, status=Workshop.STATUS_ACCEPTED)
+
+        self.user = User.objects.create_user(username='participant', email='participant@example.com', password='user123')
+        self.other_user = User.objects.create_user(username='other', email='other@example.com', password='user123')
+        self.participation = WorkshopParticipant.objects.create(workshop=self.workshop, participant=self.user.userprofile,
+                                                                qualification_result=7.5)
+
+    def summary(self, user=None):
+        return ParticipantSummary.objects.get(year=self.year_2020, user_profile=(user or self.user).userprofile)
+
+    def test_participation_changes(self):
+        summary = self.summary()
+        self.assertEqual(summary.points, 75.0)
+        self.assertEqual(summary.workshop_count, 1)
+        self.assertEqual(summary.accepted_workshop_count, 1)
+
+        self.participation.qualification_result = 2.5
+        self.participation.save()
+        summary = self.summary()
+        self.assertEqual(summary.points, 25.0)
+        self.assertEqual(summary.accepted_workshop_count, 0)
+
+        self.participation.delete()
+        self.assertFalse(ParticipantSummary.objects.exists())
+
+    def test_max_entered_points_updates_other_participants(self):
+        WorkshopParticipant.objects.create(workshop=self.old_workshop, participant=self.user.userprofile,
+                                           qualification_result=5)
+        self.assertEqual(self.summary().points, 75.0 + 100.0)
+        WorkshopParticipant.objects.create(workshop=self.old_workshop, participant=self.other_user.userprofile,
+                                           qualification_result=10)
+        self.assertEqual(self.summary().points, 75.0 + 50.0)
+        self.assertEqual(self.summary(self.other_user).points, 100.0)
+
+    def test_workshop_changes(self):
+        self.workshop.max_points = 15
+        self.workshop.save()
+        self.assertEqual(self.summary().points, 50.0)
+
+    def test_status_and_profile_changes(self):
+        self.assertIsNone(self.summary().status)
+        profile = WorkshopUserProfile.objects.create(user_profile=self.user.userprofile, year=self.year_2020,
+                                                     status=WorkshopUserProfile.STATUS_ACCEPTED)
+        self.assertEqual(self.summary().status, WorkshopUserProfile.STATUS_ACCEPTED)
+        profile.delete()
+        self.assertIsNone(self.summary().status)
+
+        self.assertFalse(self.summary().has_cover_letter)
+        self.user.userprofile.cover_letter = '<p>' + 'Bardzo chcę pojechać. ' * 5 + '</p>'
+        self.user.userprofile.save()
+        self.assertTrue(self.summary().has_cover_letter)
+
+        self.user.userprofile.gender = 'M'
+        self.user.userprofile.school = 'XIV LO'
+        self.user.userprofile.matura_exam_year = 2021
+        self.user.userprofile.save()
+        self.assertFalse(self.summary().has_completed_profile)
+        self.user.first_name = 'Jan'
+        self.user.last_name = 'Kowalski'
+        self.user.save()
+        self.assertTrue(self.summary().has_completed_profile)
+
+    def test_birth_date(self):
+        form = Form.objects.create(name='info', title='Info')
+        question = FormQuestion.objects.create(form=form, title='PESEL', data_type=FormQuestion.TYPE_PESEL)
+        answer = FormQuestionAnswer.objects.create(question=question, user=self.user, value_string='98101672714')
+        self.assertEqual(self.summary().birth, datetime.date(1998, 10, 16))
+        answer.delete()
+        self.assertIsNone(self.summary().birth)
+
+    def test_birth_date_from_form_submit(self):
+        form = Form.objects.create(name='info', title='Info')
+        question = FormQuestion.objects.create(form=form, title='PESEL', data_type=FormQuestion.TYPE_PESEL,
+                                               is_required=False)
+        self.client.force_login(self.user)
+        # FormForm writes the answers in bulk, which must still update the summaries
+        self.client.post(reverse('form', args=[form.name]), {'question_{}'.format(question.pk): '98101672714'})
+        self.assertEqual(self.summary().birth, datetime.date(1998, 10, 16))
+        self.client.post(reverse('form', args=[form.name]), {'question_{}'.format(question.pk): ''})
+        self.assertIsNone(self.summary().birth)
+
+    def test_check_and_rebuild_command(self):
+        call_command('rebuild_participant_summaries', check=True, stdout=StringIO())
+
+        # Changes that don't send signals make the summaries inconsistent
+        WorkshopParticipant.objects.update(qualification_result=10)
+        with self.assertRaisesMessage(CommandError, '1 summaries are out of date'):
+            call_command('rebuild_participant_summaries', check=True, stdout=StringIO())
+
+        call_command('rebuild_participant_summaries', stdout=StringIO())
+        self.assertEqual(self.summary().points, 100.0)
+        call_command('rebuild_participant_summaries', check=True, stdout=StringIO())
+
+    def test_missing_summaries_are_created(self):
+        # E.g. people that signed up before the summaries were introduced
+        ParticipantSummary.objects.all().delete()
+        admin_user = User.objects.create_superuser(username='admin', email='admin@example.com', password='admin123')
+        for workshop in (self.workshop, self.old_workshop):
+            workshop.lecturer.add(admin_user.userprofile)
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('participants', args=[self.year_2020.pk]))
+        self.assertEqual([person['user'].email for person in response.context['people']], ['participant@example.com'])
+        self.assertEqual(response.context['people'][0]['points'], 75.0)
+        self.assertEqual(ParticipantSummary.objects.count(), 1)
@@ -0,0 +1,85 @@
+import csv
+import datetime
+import io
+import zipfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test.testcases import TestCase
+from django.urls import reverse
+
+from wwwapp.models import Camp, WorkshopType, Workshop, WorkshopParticipant, WorkshopUserProfile
+from wwwforms.models import Form, FormQuestion, FormQuestionAnswer
+
+
+class ParticipantsExportTest(TestCase):
+    def setUp(self):
+        Camp.objects.all().update(year=2020, start_date=datetime.date(2020, 7, 3), end_date=datetime.date(2020, 7, 15))
+        self.year_2020 = Camp.objects.get()
+
+        self.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin123')
+        self.workshop = Workshop.objects.create(
+            title='Bardzo fajne warsztaty', name='bardzofajne', year=self.year_2020,
+            type=WorkshopType.objects.create(year=self.year_2020, name='This type'),
+            status=Workshop.STATUS_ACCEPTED, qualification_threshold=5, max_points=10, solution_uploads_enabled=False)
+        self.workshop.lecturer.add(User.objects.create_user(
+            username='lecturer', email='lecturer@example.com', password='user123').userprofile)
+
+        form = Form.objects.create(name='info', title='Info')
+        pesel = FormQuestion.objects.create(form=form, title='PESEL', data_type=FormQuestion.TYPE_PESEL, order=0)
+        tshirt = FormQuestion.objects.create(form=form, title='Koszulka', data_type=FormQuestion.TYPE_SELECT, order=1)
+        size_m = tshirt.options.create(title='M')
+
+        self.participants = []
+        for i in range(3):
+            user = User.objects.create_user(username='participant%d' % i, email='participant%d@example.com' % i,
+                                            password='user123', first_name='Jan%d' % i, last_name='Kowalski')
+            WorkshopParticipant.objects.create(workshop=self.workshop, participant=user.userprofile,
+                                               qualification_result=2.5 * i, comment='Dobrze')
+            WorkshopUserProfile.objects.create(user_profile=user.userprofile, year=self.year_2020,
+                                               status=WorkshopUserProfile.STATUS_ACCEPTED)
+            FormQuestionAnswer.objects.create(question=pesel, user=user, value_string='98101672714')
+            FormQuestionAnswer.objects.create(question=tshirt, user=user).value_choices.set([size_m])
+            self.participants.append(user)
+
+    def test_permissions(self):
+        url = reverse('participants_export_csv', args=[self.year_2020.pk])
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse('login') + '?next=' + url)
+
+        self.client.force_login(self.participants[0])
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_csv_export(self):
+        self.client.force_login(self.admin_user)
+        # Use small batches to check that the rows are split correctly
+        with mock.patch('wwwapp.views.PARTICIPANTS_EXPORT_BATCH_SIZE', 2):
+            response = self.client.get(reverse('participants_export_csv', args=[self.year_2020.pk]))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            content = b''.join(response.streaming_content).decode('utf-8-sig')
+
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(len(rows), 4)
+        header = rows[0]
+        self.assertEqual(header[-2:], ['Info: PESEL', 'Info: Koszulka'])
+        self.assertListEqual([row[0] for row in rows[1:]], ['Jan0', 'Jan1', 'Jan2'])
+        row = dict(zip(header, rows[2]))
+        self.assertEqual(row['Email'], 'participant1@example.com')
+        self.assertEqual(row['Data urodzenia'], '1998-10-16')
+        self.assertEqual(row['Pełnoletni'], 'TAK')
+        self.assertEqual(row['Punkty'], '25.0')
+        self.assertEqual(row['Status'], 'Zaakceptowany')
+        self.assertEqual(row['Komentarze'], 'Bardzo fajne warsztaty : 25.0% : Dobrze')
+        self.assertEqual(row['Info: Koszulka'], 'M')
+
+    def test_xlsx_export(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(reverse('participants_export_xlsx', args=[self.year_2020.pk]))
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('<t xml:space="preserve">participant2@example.com</t>', sheet)
+        self.assertIn('<row r="4">', sheet)
@@ -0,0 +1,89 @@
+from django.contrib.auth.models import User
+from django.test.testcases import TestCase
+from django.urls import reverse
+from freezegun import freeze_time
+
+from wwwforms.models import Form, FormQuestion, FormQuestionAnswer
+
+
+class PeopleDataViewTest(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin123', first_name='Admin', last_name='Adminowski')
+
+        form = Form.objects.create(name='info', title='Info')
+        self.question_city = FormQuestion.objects.create(form=form, title='Miasto', data_type=FormQuestion.TYPE_STRING, order=0)
+        self.question_shoe = FormQuestion.objects.create(form=form, title='But', data_type=FormQuestion.TYPE_NUMBER, order=1)
+
+        self.users = []
+        for i, (first_name, last_name, city) in enumerate([('Jan', 'Kowalski', 'Kraków'), ('Anna', 'Nowak', 'Warszawa'),
+                                                            ('Piotr', 'Zieliński', 'Kraków')]):
+            user = User.objects.create_user(username='user%d' % i, email='user%d@example.com' % i, password='user123',
+                                            first_name=first_name, last_name=last_name)
+            FormQuestionAnswer.objects.create(question=self.question_city, user=user, value_string=city)
+            FormQuestionAnswer.objects.create(question=self.question_shoe, user=user, value_number=40 - i)
+            self.users.append(user)
+
+        self.client.force_login(self.admin_user)
+
+    def get_data(self, **params):
+        params.setdefault('draw', 1)
+        response = self.client.get(reverse('all_people_data'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, data):
+        return [row[1].split('>')[1].split('<')[0] for row in data['data']]
+
+    def test_permissions(self):
+        self.client.force_login(self.users[0])
+        response = self.client.get(reverse('all_people_data'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_paging_and_ordering(self):
+        data = self.get_data(**{'draw': 3, 'start': 1, 'length': 2, 'order[0][column]': 1, 'order[0][dir]': 'asc'})
+        self.assertEqual(data['draw'], 3)
+        self.assertEqual(data['recordsTotal'], 4)
+        self.assertEqual(data['recordsFiltered'], 4)
+        self.assertListEqual(self.names(data), ['Jan Kowalski', 'Anna Nowak'])
+        self.assertEqual(len(data['data'][0]), 9 + 2)
+        self.assertEqual(data['data'][0][9], 'Kraków')
+
+    def test_order_by_answer(self):
+        data = self.get_data(**{'order[0][column]': 10, 'order[0][dir]': 'asc', 'length': 10})
+        self.assertListEqual(self.names(data), ['Piotr Zieliński', 'Anna Nowak', 'Jan Kowalski', 'Admin Adminowski'])
+
+    @freeze_time('2021-06-01')
+    def test_order_by_birth_date(self):
+        question_pesel = FormQuestion.objects.create(form=self.question_city.form, title='PESEL',
+                                                     data_type=FormQuestion.TYPE_PESEL, order=2)
+        FormQuestionAnswer.objects.create(question=question_pesel, user=self.users[0], value_string='15210100008')
+        FormQuestionAnswer.objects.create(question=question_pesel, user=self.users[2], value_string='98101672714')
+
+        # Unknown birth dates are always last
+        data = self.get_data(**{'order[0][column]': 2, 'order[0][dir]': 'asc', 'order[1][column]': 1})
+        self.assertListEqual(self.names(data), ['Piotr Zieliński', 'Jan Kowalski', 'Admin Adminowski', 'Anna Nowak'])
+        data = self.get_data(**{'order[0][column]': 3, 'order[0][dir]': 'desc', 'order[1][column]': 1})
+        self.assertListEqual(self.names(data), ['Piotr Zieliński', 'Jan Kowalski', 'Admin Adminowski', 'Anna Nowak'])
+        data = self.get_data(**{'order[0][column]': 3, 'order[0][dir]': 'asc', 'order[1][column]': 1})
+        self.assertListEqual(self.names(data), ['Jan Kowalski', 'Piotr Zieliński', 'Admin Adminowski', 'Anna Nowak'])
+
+    def test_search(self):
+        data = self.get_data(**{'search[value]': 'kraków', 'order[0][column]': 1})
+        self.assertEqual(data['recordsTotal'], 4)
+        self.assertEqual(data['recordsFiltered'], 2)
+        self.assertListEqual(self.names(data), ['Jan Kowalski', 'Piotr Zieliński'])
+
+        data = self.get_data(**{'search[value]': 'jan kraków'})
+        self.assertListEqual(self.names(data), ['Jan Kowalski'])
+
+        data = self.get_data(**{'columns[1][search][value]': 'nowak'})
+        self.assertListEqual(self.names(data), ['Anna Nowak'])
+
+        # Numbers are not searchable
+        data = self.get_data(**{'columns[10][search][value]': '40'})
+        self.assertEqual(data['recordsFiltered'], 4)
+
+    def test_invalid_parameters(self):
+        response = self.client.get(reverse('all_people_data'), {'start': 'abc'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,52 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from wwwapp.models import Camp
+from wwwapp.performance import normalize_sql
+
+
+class PerformanceMiddlewareTest(TestCase):
+    def setUp(self):
+        self.year = Camp.objects.get()
+        self.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin123')
+        self.normal_user = User.objects.create_user(
+            username='user', email='user@example.com', password='user123')
+
+    def test_server_timing_for_staff(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(reverse('program', args=[self.year.pk]))
+        self.assertEqual(response.status_code, 200)
+        metrics = [metric.strip().split(';')[0] for metric in response['Server-Timing'].split(',')]
+        self.assertListEqual(metrics, ['total', 'db', 'template'])
+
+    def test_no_server_timing_for_others(self):
+        response = self.client.get(reverse('program', args=[self.year.pk]))
+        self.assertNotIn('Server-Timing', response)
+
+        self.client.force_login(self.normal_user)
+        response = self.client.get(reverse('program', args=[self.year.pk]))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(PERFORMANCE_LOG_SAMPLE_RATE=1.0, PERFORMANCE_SLOW_QUERY_MS=0)
+    def test_sampled_request_is_logged_with_slow_queries(self):
+        with self.assertLogs('wwwapp.performance', level='INFO') as logs:
+            self.client.get(reverse('program', args=[self.year.pk]))
+        records = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertEqual(records[0]['view'], 'program')
+        self.assertGreater(records[0]['db_queries'], 0)
+        self.assertEqual(len(records), 1 + records[0]['db_queries'])
+        self.assertTrue(all('sql' in record for record in records[1:]))
+
+    @override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0.0)
+    def test_not_sampled_request_is_not_logged(self):
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('wwwapp.performance', level='INFO'):
+                self.client.get(reverse('program', args=[self.year.pk]))
+
+    def test_normalize_sql(self):
+        self.assertEqual(normalize_sql('SELECT "a"\n  FROM "t" WHERE "id" IN (%s, %s, %s) AND "x" = 5 AND "y" = \'it\'\'s\''),
+                         'SELECT "a" FROM "t" WHERE "id" IN (...) AND "x" = ? AND "y" = ?')
@@ -0,0 +1,126 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from wwwapp.models import Camp, WorkshopType, WorkshopCategory, Workshop, WorkshopParticipant
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProgramCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Camp.objects.get()
+        self.past_year = Camp.objects.create(year=self.year.year - 1)
+
+        self.lecturer = User.objects.create_user(username='lecturer', email='lecturer@example.com',
+                                                 password='user123', first_name='Jan', last_name='Kowalski')
+        self.participant = User.objects.create_user(username='participant', email='participant@example.com',
+                                                    password='user123')
+        self.workshop_type = WorkshopType.objects.create(year=self.year, name='This type')
+        self.category = WorkshopCategory.objects.create(year=self.year, name='Matematyka')
+        self.workshops = []
+        for i in range(2):
+            workshop = Workshop.objects.create(title='Warsztaty {}'.format(i), name='warsztaty{}'.format(i),
+                                               year=self.year, type=self.workshop_type,
+                                               status=Workshop.STATUS_ACCEPTED)
+            workshop.lecturer.add(self.lecturer.userprofile)
+            workshop.category.add(self.category)
+            self.workshops.append(workshop)
+        Workshop.objects.create(title='Odrzucone', name='odrzucone', year=self.year, type=self.workshop_type,
+                                status=Workshop.STATUS_REJECTED)
+        past_type = WorkshopType.objects.create(year=self.past_year, name='Past type')
+        self.past_workshop = Workshop.objects.create(title='Stare warsztaty', name='stare', year=self.past_year,
+                                                     type=past_type, status=Workshop.STATUS_ACCEPTED)
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_program(self, year=None):
+        response = self.client.get(reverse('program', args=[(year or self.year).pk]))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertProgramQueriesWorkshops(self, expected, year=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.get_program(year)
+        workshop_queries = [query['sql'] for query in queries.captured_queries
+                            if query['sql'].startswith('SELECT "wwwapp_workshop"."id"')]
+        self.assertEqual(bool(workshop_queries), expected)
+
+    def test_cached(self):
+        response = self.get_program()
+        self.assertContains(response, 'Warsztaty 0')
+        self.assertContains(response, 'Jan Kowalski')
+        self.assertContains(response, 'Matematyka')
+        self.assertNotContains(response, 'Odrzucone')
+        self.assertProgramQueriesWorkshops(False)
+
+        # Logged in users get the same cached cards
+        self.client.force_login(self.participant)
+        self.assertProgramQueriesWorkshops(False)
+
+    def test_user_overlay(self):
+        WorkshopParticipant.objects.create(workshop=self.workshops[1], participant=self.participant.userprofile)
+        anonymous = self.get_program().content.decode()
+        self.assertNotIn('Wypisz się', anonymous)
+
+        self.client.force_login(self.participant)
+        content = self.get_program().content.decode()
+        self.assertEqual(content.count('Wypisz się'), 1)
+        self.assertEqual(content.count('Zapisz się'), 1)
+        self.assertLess(content.index('Warsztaty 0'), content.index('Zapisz się'))
+        self.assertLess(content.index('Warsztaty 1'), content.index('Wypisz się'))
+
+        # Registering doesn't require rendering the program again
+        WorkshopParticipant.objects.create(workshop=self.workshops[0], participant=self.participant.userprofile)
+        with CaptureQueriesContext(connection) as queries:
+            content = self.get_program().content.decode()
+        self.assertEqual(content.count('Wypisz się'), 2)
+        self.assertFalse(any(query['sql'].startswith('SELECT "wwwapp_workshop"."id"')
+                             for query in queries.captured_queries))
+
+    def test_invalidation(self):
+        self.get_program()
+        self.workshops[0].title = 'Zmienione warsztaty'
+        self.workshops[0].save()
+        self.assertContains(self.get_program(), 'Zmienione warsztaty')
+
+        self.category.name = 'Fizyka'
+        self.category.save()
+        self.assertContains(self.get_program(), 'Fizyka')
+
+        self.lecturer.first_name = 'Janina'
+        self.lecturer.save()
+        self.assertContains(self.get_program(), 'Janina Kowalski')
+
+        other_lecturer = User.objects.create_user(username='other', email='other@example.com', password='user123',
+                                                  first_name='Anna', last_name='Nowak')
+        other_lecturer.userprofile.lecturer_workshops.add(self.workshops[1])
+        self.assertContains(self.get_program(), 'Anna Nowak')
+
+        self.workshops[1].category.remove(self.category)
+        self.assertContains(self.get_program(), 'Fizyka', count=1)
+
+        self.workshops[1].delete()
+        self.assertNotContains(self.get_program(), 'Warsztaty 1')
+
+    def test_unrelated_changes_do_not_invalidate(self):
+        self.get_program(self.past_year)
+        self.get_program()
+
+        # Logging in and changes in other camps keep the cached cards
+        self.client.force_login(self.lecturer)
+        self.workshops[0].title = 'Zmienione warsztaty'
+        self.workshops[0].save()
+        self.assertProgramQueriesWorkshops(False, self.past_year)
+        self.assertProgramQueriesWorkshops(True)
+
+    @override_settings(CACHE_SAFETY_TIMEOUT=0)
+    def test_past_camps_cached_indefinitely(self):
+        self.assertContains(self.get_program(self.past_year), 'Stare warsztaty')
+        self.assertProgramQueriesWorkshops(False, self.past_year)
+        self.get_program()
+        self.assertProgramQueriesWorkshops(True)
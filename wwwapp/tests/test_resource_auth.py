@@ -0,0 +1,128 @@
+from django.contrib.auth.models import User, Permission
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousOperation
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from wwwapp.models import Camp, ResourceYearPermission, WorkshopUserProfile, Workshop, WorkshopType
+
+
+class ResourceAuthViews(TestCase):
+    def setUp(self):
+        self.year_2020 = Camp.objects.get()
+        self.year_2019 = Camp.objects.create(year=self.year_2020.year - 1)
+
+        self.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin123')
+        self.participant_user = User.objects.create_user(
+            username='participant', email='participant@example.com', password='user123')
+        self.lecturer_user = User.objects.create_user(
+            username='lecturer', email='lecturer@example.com', password='user123')
+        self.other_user = User.objects.create_user(
+            username='other', email='other@example.com', password='user123')
+
+        WorkshopUserProfile.objects.create(user_profile=self.participant_user.userprofile, year=self.year_2019,
+                                           status=WorkshopUserProfile.STATUS_ACCEPTED)
+        workshop = Workshop.objects.create(name='test', title='Test', year=self.year_2020,
+                                           type=WorkshopType.objects.create(year=self.year_2020, name='Type'),
+                                           status=Workshop.STATUS_ACCEPTED)
+        workshop.lecturer.add(self.lecturer_user.userprofile)
+
+        ResourceYearPermission.objects.create(root_path='/internet/www15', year=self.year_2019)
+        ResourceYearPermission.objects.create(root_path='/internet/www16', year=self.year_2020)
+
+    def check_access(self, uri, expected_status):
+        response = self.client.get(reverse('resource_auth'), HTTP_X_ORIGINAL_URI=uri)
+        self.assertEqual(response.status_code, expected_status, msg=uri)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('X-Accel-Expires', response)
+
+    def test_anonymous(self):
+        self.check_access('/internet/www15/index.html', 403)
+
+    def test_admin(self):
+        self.client.force_login(self.admin_user)
+        self.check_access('/internet/www15/index.html', 200)
+        self.check_access('/internet/anything', 200)
+
+    def test_access_all_resources_permission(self):
+        self.other_user.user_permissions.add(Permission.objects.get(codename='access_all_resources'))
+        self.client.force_login(self.other_user)
+        self.check_access('/internet/www16/', 200)
+
+    def test_participant(self):
+        self.client.force_login(self.participant_user)
+        self.check_access('/internet/www15', 200)
+        self.check_access('/internet/www15/', 200)
+        self.check_access('/internet/www15/a/b/c.css', 200)
+        self.check_access('/internet/www15/../www15/c.css', 200)
+        self.check_access('/internet/www16/index.html', 403)
+        self.check_access('/internet/www15/../www16/index.html', 403)
+        self.check_access('/internet/www150/index.html', 403)
+        self.check_access('/internet', 403)
+
+    def test_lecturer(self):
+        self.client.force_login(self.lecturer_user)
+        self.check_access('/internet/www16/index.html', 200)
+        self.check_access('/internet/www15/index.html', 403)
+
+    def test_other_user(self):
+        self.client.force_login(self.other_user)
+        self.check_access('/internet/www15/index.html', 403)
+        self.check_access('/internet/www16/index.html', 403)
+
+    def test_root_resource(self):
+        ResourceYearPermission.objects.create(root_path='/', year=self.year_2020)
+        self.client.force_login(self.lecturer_user)
+        self.check_access('/internet/www15/index.html', 200)
+
+    def test_year_ids_for_uri_matches_resources_for_uri(self):
+        ResourceYearPermission.objects.create(root_path='/internet', year=self.year_2020)
+        for uri in ['/', '/internet', '/internet/www15/x', '/internet/www16', '/other/www15', '//internet/www15']:
+            self.assertSetEqual(ResourceYearPermission.year_ids_for_uri(uri),
+                                {r.year_id for r in ResourceYearPermission.resources_for_uri(uri)}, msg=uri)
+        with self.assertRaises(SuspiciousOperation):
+            ResourceYearPermission.year_ids_for_uri('internet/www15')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ResourceAuthCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Camp.objects.get()
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='user123')
+        self.profile = WorkshopUserProfile.objects.create(user_profile=self.user.userprofile, year=self.year,
+                                                          status=WorkshopUserProfile.STATUS_ACCEPTED)
+        self.resource = ResourceYearPermission.objects.create(root_path='/internet/www', year=self.year)
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_status(self, uri):
+        return self.client.get(reverse('resource_auth'), HTTP_X_ORIGINAL_URI=uri).status_code
+
+    def test_cached_decision_only_loads_session_and_user(self):
+        self.assertEqual(self.get_status('/internet/www/a.css'), 200)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get_status('/internet/www/b.css'), 200)
+
+    def test_permission_table_change_rebuilds_trie(self):
+        self.assertEqual(self.get_status('/internet/other/a.css'), 403)
+        ResourceYearPermission.objects.create(root_path='/internet/other', year=self.year)
+        self.assertEqual(self.get_status('/internet/other/a.css'), 200)
+        self.resource.delete()
+        self.assertEqual(self.get_status('/internet/www/a.css'), 403)
+
+    def test_qualification_change_invalidates_access(self):
+        self.assertEqual(self.get_status('/internet/www/a.css'), 200)
+        self.profile.status = WorkshopUserProfile.STATUS_CANCELLED
+        self.profile.save()
+        self.assertEqual(self.get_status('/internet/www/a.css'), 403)
+
+    def test_permission_change_invalidates_access(self):
+        other_year = Camp.objects.create(year=self.year.year - 1)
+        ResourceYearPermission.objects.create(root_path='/internet/old', year=other_year)
+        self.assertEqual(self.get_status('/internet/old/a.css'), 403)
+        self.user.user_permissions.add(Permission.objects.get(codename='access_all_resources'))
+        self.assertEqual(self.get_status('/internet/old/a.css'), 200)
@@ -0,0 +1,98 @@
+from io import StringIO
+
+import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from wwwapp.models import Article, Camp, Workshop, WorkshopType, UserProfile
+
+UNSAFE_HTML = '<p>Treść</p><script>alert(1)</script><iframe src="https://example.com"></iframe>'
+
+
+class SanitizedHTMLTest(TestCase):
+    def setUp(self):
+        self.year = Camp.objects.get()
+        self.article = Article.objects.create(name='test_article', title='Testowy artykuł', content=UNSAFE_HTML)
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='user123')
+        self.user.userprofile.profile_page = '<p>Profil</p><script>alert(2)</script>'
+        self.user.userprofile.cover_letter = '<p>List</p><script>alert(3)</script>'
+        self.user.userprofile.save()
+        workshop_type = WorkshopType.objects.create(year=self.year, name='This type')
+        self.workshop = Workshop.objects.create(title='Warsztaty', name='warsztaty', year=self.year,
+                                                type=workshop_type, status=Workshop.STATUS_ACCEPTED,
+                                                page_content=UNSAFE_HTML, page_content_is_public=True)
+
+    def test_sanitized_on_save(self):
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual(article.content_clean, '<p>Treść</p>alert(1)')
+        self.assertEqual(len(article.content_clean_hash), 64)
+        workshop = Workshop.objects.get(pk=self.workshop.pk)
+        self.assertEqual(workshop.page_content_clean, '<p>Treść</p>alert(1)')
+        profile = UserProfile.objects.get(pk=self.user.userprofile.pk)
+        self.assertEqual(profile.profile_page_clean, '<p>Profil</p>alert(2)')
+        self.assertEqual(profile.cover_letter_clean, '<p>List</p>alert(3)')
+
+        # Saving only some of the fields also updates the sanitized copies
+        profile.profile_page = '<b>Nowy</b><script></script>'
+        profile.save(update_fields=['profile_page'])
+        self.assertEqual(UserProfile.objects.get(pk=profile.pk).profile_page_clean, '<b>Nowy</b>')
+
+    def test_index_allows_iframe(self):
+        index = Article.objects.get(name='index')
+        index.content = UNSAFE_HTML
+        index.save()
+        self.assertIn('<iframe src="https://example.com"></iframe>', index.content_clean)
+        self.assertNotIn('<script>', index.content_clean)
+
+        for _ in range(2):
+            response = self.client.get(reverse('index'))
+            self.assertContains(response, '<iframe src="https://example.com"></iframe>', html=True)
+        self.assertNotIn('iframe', settings.BLEACH_ALLOWED_TAGS)
+
+    def test_views_do_not_sanitize(self):
+        self.client.force_login(self.user)
+        with mock.patch('wwwapp.sanitization.bleach.clean') as clean:
+            response = self.client.get(reverse('article', args=[self.article.name]))
+            self.assertContains(response, '<p>Treść</p>alert(1)')
+            response = self.client.get(reverse('workshop_page', args=[self.year.pk, self.workshop.name]))
+            self.assertContains(response, '<p>Treść</p>alert(1)')
+            response = self.client.get(reverse('profile', args=[self.user.pk]))
+            self.assertContains(response, '<p>Profil</p>alert(2)')
+            self.assertContains(response, '<p>List</p>alert(3)')
+        clean.assert_not_called()
+
+    def test_recomputed_lazily(self):
+        # Modified without save()
+        Article.objects.filter(pk=self.article.pk).update(content='<p>Zmienione</p><script></script>')
+        response = self.client.get(reverse('article', args=[self.article.name]))
+        self.assertContains(response, '<p>Zmienione</p>')
+        self.assertNotContains(response, '<script></script>')
+        self.assertEqual(Article.objects.get(pk=self.article.pk).content_clean, '<p>Zmienione</p>')
+
+        with override_settings(BLEACH_ALLOWED_TAGS=['b']):
+            response = self.client.get(reverse('workshop_page', args=[self.year.pk, self.workshop.name]))
+            self.assertContains(response, 'Treśćalert(1)')
+            self.assertEqual(Workshop.objects.get(pk=self.workshop.pk).page_content_clean, 'Treśćalert(1)')
+        self.assertEqual(Workshop.objects.get(pk=self.workshop.pk).page_content_html, '<p>Treść</p>alert(1)')
+
+    def test_rebuild_command(self):
+        call_command('rebuild_sanitized_html', '--check', stdout=StringIO())
+
+        Article.objects.filter(pk=self.article.pk).update(content='<p>Zmienione</p>')
+        UserProfile.objects.filter(pk=self.user.userprofile.pk).update(cover_letter='<p>Nowy list</p>')
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_sanitized_html', '--check', stdout=out)
+        self.assertIn('Article {}'.format(self.article.pk), out.getvalue())
+        self.assertIn('UserProfile {}'.format(self.user.userprofile.pk), out.getvalue())
+
+        call_command('rebuild_sanitized_html', stdout=StringIO())
+        call_command('rebuild_sanitized_html', '--check', stdout=StringIO())
+        self.assertEqual(Article.objects.get(pk=self.article.pk).content_clean, '<p>Zmienione</p>')
+        profile = UserProfile.objects.get(pk=self.user.userprofile.pk)
+        self.assertEqual(profile.cover_letter_clean, '<p>Nowy list</p>')
+        self.assertEqual(profile.profile_page_clean, '<p>Profil</p>alert(2)')
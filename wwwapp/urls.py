@@ -34,6 +34,7 @@ urlpatterns = [
     path('forms/', wwwforms_views.form_list_view, name='form_list'),
     path('forms/<slug:name>/', wwwforms_views.form_view, name='form'),
     path('forms/<slug:name>/results/', wwwforms_views.form_results_view, name='form_results'),
+    path('forms/<slug:name>/results/export.csv', wwwforms_views.form_results_export_view, name='form_results_export'),
     path('article/<slug:name>/', views.article_view, name='article'),
     path('article/<slug:name>/edit/', views.article_edit_view, name='article_edit'),
     path('article/<slug:name>/edit/upload/', views.article_edit_upload_file, name='article_edit_upload'),
@@ -56,10 +57,18 @@ urlpatterns = [
     path('<int:year>/workshops/add/', views.workshop_edit_view, name='workshops_add'),
     path('<int:year>/workshops/', views.workshops_view, name='workshops'),
     path('<int:year>/dataForPlan/', views.data_for_plan_view, name='dataForPlan'),
+    path('<int:year>/coregistration/', views.coregistration_view, {'file_format': 'json'}, name='coregistration'),
+    path('<int:year>/coregistration/export.csv', views.coregistration_view, {'file_format': 'csv'}, name='coregistration_csv'),
     path('<int:year>/emails/', mail_views.filtered_emails_view, name='emails'),
+    path('<int:year>/emails/export.txt', mail_views.filtered_emails_export_view, {'file_format': 'txt'}, name='emails_export_txt'),
+    path('<int:year>/emails/export.csv', mail_views.filtered_emails_export_view, {'file_format': 'csv'}, name='emails_export_csv'),
+    path('<int:year>/emails/send/', mail_views.filtered_emails_send_view, name='emails_send'),
     path('<int:year>/participants/', views.participants_view, name='participants'),
+    path('<int:year>/participants/export.csv', views.participants_export_view, {'file_format': 'csv'}, name='participants_export_csv'),
+    path('<int:year>/participants/export.xlsx', views.participants_export_view, {'file_format': 'xlsx'}, name='participants_export_xlsx'),
     path('<int:year>/lecturers/', views.lecturers_view, name='lecturers'),
     path('people/', views.participants_view, name='all_people'),
+    path('people/data.json', views.people_data_view, name='all_people_data'),
     path('template_for_workshop_page/', views.template_for_workshop_page_view, name='template_for_workshop_page'),
     path('program/', views.redirect_to_view_for_latest_year('program'), name='latest_program'),
     path('addWorkshop/', views.redirect_to_view_for_latest_year('workshops_add')),
@@ -6,59 +6,69 @@ import os
 import sys
 from urllib.parse import urljoin
 
-import bleach
 from dateutil.relativedelta import relativedelta
-from typing import Dict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from django.db.models.expressions import F
-from django.db.models.query import Prefetch
+from django.db.models.expressions import F, OuterRef, Subquery
+from django.db.models.query import Prefetch, QuerySet
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.models import User
 from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
 from django.core.exceptions import SuspiciousOperation
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import OperationalError, ProgrammingError
-from django.db.models import Q
+from django.db.models import Q, FilteredRelation, Case, When, Value, BooleanField
 from django.http import JsonResponse, HttpResponse, HttpRequest, HttpResponseForbidden
 from django.http.response import HttpResponseBadRequest, HttpResponseNotFound, Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.template import Template, Context
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django.utils.html import format_html
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.formats import localize
+from django.utils.html import format_html, conditional_escape
 from django.utils.safestring import mark_safe
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
-from django_bleach.utils import get_bleach_default_options
+from django.views.decorators.http import require_POST, condition
 from django_sendfile import sendfile
 
-from wwwforms.models import Form, FormQuestionAnswer, FormQuestion, pesel_extract_date
+from wwwforms.models import Form, FormQuestion, FormQuestionAnswer, FormAnswerMatrix, answer_display_value
 from .forms import ArticleForm, UserProfileForm, UserForm, \
     UserProfilePageForm, WorkshopForm, UserCoverLetterForm, WorkshopParticipantPointsForm, \
     TinyMCEUpload, SolutionFileFormSet, SolutionForm
+from .caching import cached, get_generation
+from .conditional import Validators, conditional_page, page_validators
+from .datatables import DataTablesColumn, datatables_response, icontains_search
+from .export import batched, streaming_csv_response, streaming_xlsx_response
 from .models import Article, UserProfile, Workshop, WorkshopParticipant, \
-    WorkshopUserProfile, ResourceYearPermission, Camp, Solution
-from .templatetags.wwwtags import qualified_mark
+    WorkshopUserProfile, ResourceYearPermission, Camp, Solution, ParticipantSummary, CoRegistrationMatrix, \
+    MENUBAR_ARTICLES_CACHE_KEY, ALL_CAMPS_CACHE_KEY, VISIBLE_RESOURCES_CACHE_KEY, PERMISSIONS_GENERATION, \
+    PLAN_DATA_GENERATION, PROGRAM_GENERATION, LINK_LIST_GENERATION, program_generation, plan_data
+from .templatetags.wwwtags import qualified_mark, question_mark_on_none_value, question_mark_on_empty_string
 
 
 def get_context(request):
     context = {}
 
     if request.user.is_authenticated:
-        visible_resources = ResourceYearPermission.objects.exclude(access_url__exact="")
+        visible_resources = cached(VISIBLE_RESOURCES_CACHE_KEY,
+                                   lambda: list(ResourceYearPermission.objects.exclude(access_url__exact="")))
         if request.user.has_perm('wwwapp.access_all_resources'):
             context['resources'] = visible_resources
         else:
-            try:
-                user_profile = UserProfile.objects.get(user=request.user)
-                context['resources'] = visible_resources.filter(year__in=user_profile.all_participation_years())
-            except UserProfile.DoesNotExist:
-                context['resources'] = []
+            participation_years = UserProfile.participation_year_ids_for_user(request.user.id)
+            context['resources'] = [resource for resource in visible_resources
+                                    if resource.year_id in participation_years]
 
     context['google_analytics_key'] = settings.GOOGLE_ANALYTICS_KEY
-    context['articles_on_menubar'] = Article.objects.filter(on_menubar=True).all()
-    context['years'] = Camp.objects.all()
+    context['articles_on_menubar'] = cached(MENUBAR_ARTICLES_CACHE_KEY,
+                                            lambda: list(Article.objects.filter(on_menubar=True).all()))
+    context['years'] = cached(ALL_CAMPS_CACHE_KEY, lambda: list(Camp.objects.all()))
     context['current_year'] = Camp.current()
 
     return context
@@ -74,26 +84,76 @@ def redirect_to_view_for_latest_year(target_view_name):
     return view
 
 
+def _program_workshop_cards(year: Camp) -> List[Dict]:
+    """
+    The rendered _programworkshop.html cards of the workshops in the program, in the version for the people who are
+    and who are not registered for the workshop. They are the same for everyone, so they are cached per camp. The
+    workshops of past camps can't be edited, so their cards are not limited by CACHE_SAFETY_TIMEOUT.
+    """
+    editable = year.are_workshops_editable()
+    # The buttons depend on the date, so the key changes when the qualification closes
+    key = 'program:{}:{}:{}:{}'.format(get_generation(PROGRAM_GENERATION), get_generation(program_generation(year.pk)),
+                                      year.pk, year.is_qualification_editable())
+
+    def compute():
+        workshops = year.workshops.filter(Q(status='Z') | Q(status='X')).order_by('title') \
+            .prefetch_related('lecturer', 'lecturer__user', 'type', 'category')
+        return [{
+            'id': workshop.pk,
+            'card': render_to_string('_programworkshop.html', {'workshop': workshop, 'registered': False}),
+            'registered_card': render_to_string('_programworkshop.html', {'workshop': workshop, 'registered': True}),
+        } for workshop in workshops]
+
+    return cache.get_or_set(key, compute, settings.CACHE_SAFETY_TIMEOUT if editable else None)
+
+
+def _camp_page_validators(request: HttpRequest, year: int, etag_parts: List) -> Optional[Validators]:
+    """
+    Validators of the pages that show the workshops of the camp (the program and the workshop pages). The buttons of
+    the current camp depend on the date, so its pages change every day.
+    """
+    if year == Camp.current().pk:
+        etag_parts = etag_parts + [timezone.localdate()]
+    return page_validators(request, etag_parts, generations=[PROGRAM_GENERATION, program_generation(year)])
+
+
+def _program_participation(request: HttpRequest, year: int) -> List[Tuple[int, bool]]:
+    """
+    The workshops of the camp the user is registered for, and whether the results of the qualification are known.
+    Memoized on the request, because it's a part of the ETag of the program.
+    """
+    if not hasattr(request, '_program_participation'):
+        if request.user.is_authenticated:
+            participation = WorkshopParticipant.objects \
+                .filter(workshop__year=year, participant__user=request.user).order_by('workshop_id') \
+                .values_list('workshop_id', 'qualification_result')
+            request._program_participation = [(workshop_id, result is not None) for workshop_id, result in participation]
+        else:
+            request._program_participation = []
+    return request._program_participation
+
+
+def _program_validators(request: HttpRequest, year: int) -> Optional[Validators]:
+    updated_at = Camp.objects.filter(pk=year).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return _camp_page_validators(request, year, ['program', year, updated_at, _program_participation(request, year)])
+
+
+@conditional_page(_program_validators)
 def program_view(request, year):
     year = get_object_or_404(Camp, pk=year)
 
     context = {}
     context['title'] = 'Program %s' % str(year)
 
-    if request.user.is_authenticated:
-        user_participation = set(year.workshops.filter(participants__user=request.user).all())
-    else:
-        user_participation = set()
-
-    workshops = year.workshops.filter(Q(status='Z') | Q(status='X')).order_by('title').prefetch_related('lecturer', 'lecturer__user', 'type', 'category')
-    context['workshops'] = [(workshop, (workshop in user_participation)) for workshop
-                            in workshops]
-    if request.user.is_authenticated and year == Camp.current():
-        context['has_results'] = WorkshopParticipant.objects.filter(
-            workshop__year=year, participant=request.user.userprofile, qualification_result__isnull=False
-        ).exists()
-    else:
-        context['has_results'] = False
+    participation = _program_participation(request, year.pk)
+    user_participation = {workshop_id for workshop_id, _ in participation}
+
+    context['workshop_cards'] = [mark_safe(workshop['registered_card'] if workshop['id'] in user_participation
+                                           else workshop['card'])
+                                 for workshop in _program_workshop_cards(year)]
+    context['has_results'] = year == Camp.current() and any(has_result for _, has_result in participation)
 
     context['selected_year'] = year
     return render(request, 'program.html', context)
@@ -147,7 +207,7 @@ def profile_view(request, user_id):
         return redirect('profile', user.pk)
 
     context['title'] = "{0.first_name} {0.last_name}".format(user)
-    context['profile_page'] = user.userprofile.profile_page
+    context['profile_page'] = user.userprofile.profile_page_html
     context['is_my_profile'] = is_my_profile
     context['gender'] = user.userprofile.gender
 
@@ -289,6 +349,21 @@ def can_edit_workshop(workshop, user):
         return False, False
 
 
+def _workshop_page_validators(request: HttpRequest, year: int, name: str) -> Optional[Validators]:
+    workshop = Workshop.objects.filter(year=year, name=name).values_list('pk', 'status', 'updated_at').first()
+    if workshop is None:
+        return None
+    workshop_id, status, updated_at = workshop
+    if status not in (Workshop.STATUS_ACCEPTED, Workshop.STATUS_CANCELLED):
+        return None
+    etag_parts = ['workshop_page', workshop_id, updated_at]
+    if request.user.is_authenticated:
+        etag_parts.append(WorkshopParticipant.objects.filter(workshop_id=workshop_id,
+                                                             participant__user=request.user).exists())
+    return _camp_page_validators(request, year, etag_parts)
+
+
+@conditional_page(_workshop_page_validators)
 def workshop_page_view(request, year, name):
     workshop = get_object_or_404(Workshop, year=year, name=name)
     has_perm_to_edit, is_lecturer = can_edit_workshop(workshop, request.user)
@@ -491,9 +566,13 @@ def save_points_view(request):
                          'mark': qualified_mark(workshop_participant.is_qualified())})
 
 
-@login_required()
-@permission_required('wwwapp.see_all_users', raise_exception=True)
-def participants_view(request, year=None):
+def _participants_queryset(year: Optional[Camp]) -> QuerySet:
+    """
+    Participants of the given camp (or all people if year is None) with everything that is needed to build their
+    rows prefetched. For a camp, the figures are read from ParticipantSummary (people without a summary are skipped,
+    see ParticipantSummary.create_missing()) and annotated with the summary_ prefix, for all people only birth_date
+    is annotated.
+    """
     participants = UserProfile.objects \
         .select_related('user') \
         .prefetch_related(
@@ -504,108 +583,263 @@ def participants_view(request, year=None):
     )
 
     if year is not None:
-        year = get_object_or_404(Camp, pk=year)
-        participants = participants.filter(workshops__year=year)
+        participants = participants \
+            .annotate(summary=FilteredRelation('summaries', condition=Q(summaries__year=year))) \
+            .filter(summary__isnull=False) \
+            .annotate(**{'summary_' + field: F('summary__' + field) for field in ParticipantSummary.SUMMARY_FIELDS})
 
         lecturers = Workshop.objects.filter(year=year).values_list('lecturer__user__id').distinct()
         participants = participants.exclude(user__id__in=lecturers)
 
         participants = participants.prefetch_related(
-            Prefetch('workshopparticipant_set', queryset=WorkshopParticipant.objects.filter(workshop__year=year)),
-            'workshopparticipant_set__workshop',
-            'workshopparticipant_set__workshop__year',
+            Prefetch('workshopparticipant_set',
+                     queryset=WorkshopParticipant.objects.filter(workshop__year=year)
+                     .with_scores().select_related('workshop', 'workshop__year')),
         )
+    else:
+        participants = participants.with_birth_date()
 
-    participants = participants.all()
+    return participants.all()
 
-    all_forms = Form.visible_objects.prefetch_related('questions').filter(questions__answers__user__userprofile__in=participants).distinct()
-    all_questions = [question for form in all_forms for question in form.questions.all()]
-    all_answers = FormQuestionAnswer.objects.prefetch_related('question', 'user').filter(user__userprofile__in=participants, question__in=all_questions).all()
 
-    people = {}
+def _participant_data(participant: UserProfile, year: Optional[Camp], form_answers: FormAnswerMatrix) -> Dict[str, Any]:
+    if year is not None:
+        birth = participant.summary_birth
+    else:
+        birth = participant.birth_date
+    is_adult = None
+    if birth is not None:
+        if year is not None and year.start_date:
+            is_adult = year.start_date >= birth + relativedelta(years=18)
+        else:
+            is_adult = datetime.date.today() >= birth + relativedelta(years=18)
+
+    person = {
+        'user': participant.user,
+        'birth': birth,
+        'is_adult': is_adult,
+        'matura_exam_year': participant.matura_exam_year,
+        'accepted_workshop_count': 0,
+        'workshop_count': 0,
+        'has_completed_profile': participant.is_completed,
+        'has_cover_letter': bool(participant.cover_letter and len(participant.cover_letter) > 50),
+        'status': None,
+        'status_display': None,
+        'school': participant.school,
+        'points': 0.0,
+        'infos': [],
+        'how_do_you_know_about': participant.how_do_you_know_about,
+        'form_answers': form_answers.row(participant.user_id),
+    }
+
+    if year:
+        # Maintained in ParticipantSummary, see _participants_queryset()
+        person['points'] = participant.summary_points
+        person['workshop_count'] = participant.summary_workshop_count
+        person['accepted_workshop_count'] = participant.summary_accepted_workshop_count
+        person['has_completed_profile'] = participant.summary_has_completed_profile
+        person['has_cover_letter'] = participant.summary_has_cover_letter
+        person['status'] = participant.summary_status
+        person['status_display'] = dict(WorkshopUserProfile.STATUS_CHOICES).get(participant.summary_status)
+        for wp in participant.workshopparticipant_set.all():
+            assert wp.workshop.year == year
+            if wp.workshop.is_qualifying:
+                if wp.workshop.solution_uploads_enabled and not wp.has_solution:
+                    person['infos'].append("{title} : Nie przesłano rozwiązań".format(
+                        title=wp.workshop.title
+                    ))
+                else:
+                    person['infos'].append("{title} : {result:.1f}% : {comment}".format(
+                        title=wp.workshop.title,
+                        result=wp.percent if wp.qualification_result else 0,
+                        comment=wp.comment if wp.comment else ""
+                    ))
+            else:
+                person['infos'].append("{title} : Warsztaty bez kwalifikacji".format(
+                    title=wp.workshop.title
+                ))
 
-    for participant in participants:
-        answers = [next(filter(lambda a: a.question == question and a.user == participant.user, all_answers), None) for question in all_questions]
+    return person
 
-        # TODO: this is a kinda ugly way of doing it - is_adult is calculate from the first filled in field of type PESEL
-        pesel_answer = next(filter(lambda x: x[0].data_type == FormQuestion.TYPE_PESEL and x[1] and x[1].value_string, zip(all_questions, answers)), None)
-        pesel = pesel_answer[1].value_string if pesel_answer else None
 
-        birth = pesel_extract_date(pesel)
-        is_adult = None
-        if birth is not None:
-            if year is not None and year.start_date:
-                is_adult = year.start_date >= birth + relativedelta(years=18)
-            else:
-                is_adult = datetime.date.today() >= birth + relativedelta(years=18)
+def _visible_participation_data(request: HttpRequest, participant: UserProfile) -> List[Dict[str, Any]]:
+    participation_data = participant.all_participation_data()
+    if not request.user.has_perm('wwwapp.see_all_workshops'):
+        # If the current user can't see non-public workshops, remove them from the list
+        for participation in participation_data:
+            participation['workshops'] = [w for w in participation['workshops'] if w.is_publicly_visible()]
+    return participation_data
 
-        workshop_profile = None
-        if year is not None:
-            workshop_profile = participant.workshop_profile.all()
-            workshop_profile = list(filter(lambda x: x.year == year, workshop_profile))
-            workshop_profile = workshop_profile[0] if workshop_profile else None
 
-        participation_data = participant.all_participation_data()
-        if not request.user.has_perm('wwwapp.see_all_workshops'):
-            # If the current user can't see non-public workshops, remove them from the list
-            for participation in participation_data:
-                participation['workshops'] = [w for w in participation['workshops'] if w.is_publicly_visible()]
+def _all_people_questions() -> List[FormQuestion]:
+    return FormAnswerMatrix.questions_for_users(UserProfile.objects.values('user_id'))
 
-        people[participant.id] = {
-            'user': participant.user,
-            'birth': birth,
-            'is_adult': is_adult,
-            'matura_exam_year': participant.matura_exam_year,
-            'accepted_workshop_count': 0,
-            'workshop_count': 0,
-            'has_completed_profile': participant.is_completed,
-            'has_cover_letter': bool(participant.cover_letter and len(participant.cover_letter) > 50),
-            'status': workshop_profile.status if workshop_profile else None,
-            'status_display': workshop_profile.get_status_display if workshop_profile else None,
-            'participation_data': participation_data,
-            'school': participant.school,
-            'points': 0.0,
-            'infos': [],
-            'how_do_you_know_about': participant.how_do_you_know_about,
-            'form_answers': answers,
-        }
-
-        if year:
-            for wp in participant.workshopparticipant_set.all():
-                assert wp.workshop.year == year
-                if wp.workshop.is_qualifying:
-                    if wp.qualification_result:
-                        people[participant.id]['points'] += float(wp.result_in_percent())
-                    if wp.workshop.solution_uploads_enabled and not hasattr(wp, 'solution'):
-                        people[participant.id]['infos'].append("{title} : Nie przesłano rozwiązań".format(
-                            title=wp.workshop.title
-                        ))
-                    else:
-                        people[participant.id]['infos'].append("{title} : {result:.1f}% : {comment}".format(
-                            title=wp.workshop.title,
-                            result=wp.result_in_percent() if wp.qualification_result else 0,
-                            comment=wp.comment if wp.comment else ""
-                        ))
-                else:
-                    people[participant.id]['infos'].append("{title} : Warsztaty bez kwalifikacji".format(
-                        title=wp.workshop.title
-                    ))
-                people[participant.id]['workshop_count'] += 1
-                if wp.is_qualified():
-                    people[participant.id]['accepted_workshop_count'] += 1
-
-    people = list(people.values())
 
+@login_required()
+@permission_required('wwwapp.see_all_users', raise_exception=True)
+def participants_view(request, year=None):
     context = {}
     context['title'] = ('Uczestnicy: %s' % year) if year is not None else 'Wszyscy ludzie'
-    context['people'] = people
-    context['form_questions'] = all_questions
     context['is_all_people'] = year is None
 
+    if year is None:
+        # The list of all people grows with every year, so the rows are loaded page by page from people_data_view
+        context['form_questions'] = _all_people_questions()
+        context['selected_year'] = None
+        return render(request, 'participants.html', context)
+
+    year = get_object_or_404(Camp, pk=year)
+
+    ParticipantSummary.create_missing(year.pk)
+    participants = _participants_queryset(year)
+    form_answers = FormAnswerMatrix.for_users(participants.values('user_id'))
+
+    people = {}
+
+    for participant in participants:
+        if participant.id in people:
+            continue
+
+        person = _participant_data(participant, year, form_answers)
+        person['participation_data'] = _visible_participation_data(request, participant)
+        people[participant.id] = person
+
+    context['people'] = list(people.values())
+    context['form_questions'] = form_answers.questions
+
     context['selected_year'] = year
     return render(request, 'participants.html', context)
 
 
+def _people_columns(questions: List[FormQuestion]) -> List[DataTablesColumn]:
+    """
+    Columns of the table in participants.html (with is_all_people set)
+    """
+    columns = [
+        DataTablesColumn(),  # row number
+        DataTablesColumn(order_by=('user__last_name', 'user__first_name'),
+                         search=icontains_search('user__first_name', 'user__last_name')),
+        DataTablesColumn(order_by=(F('birth_date'),)),
+        DataTablesColumn(order_by=(Case(When(birth_date__lte=datetime.date.today() - relativedelta(years=18), then=Value(True)),
+                                        When(birth_date__isnull=False, then=Value(False)),
+                                        output_field=BooleanField()),)),  # is adult
+        DataTablesColumn(order_by=('user__email',), search=icontains_search('user__email')),
+        DataTablesColumn(order_by=('school',), search=icontains_search('school')),
+        DataTablesColumn(order_by=('matura_exam_year',)),
+        DataTablesColumn(),  # past participation
+        DataTablesColumn(),  # how do you know about
+    ]
+    for question in questions:
+        answers = FormQuestionAnswer.objects.filter(question=question)
+        order_by = ()
+        if question.is_orderable:
+            order_by = (Subquery(answers.filter(user_id=OuterRef('user_id')).values(question.value_field_name())[:1]),)
+        search = None
+        if question.is_searchable:
+            search = lambda word, answers=answers: Q(user_id__in=answers.filter(value_string__icontains=word).values('user_id'))
+        columns.append(DataTablesColumn(order_by=order_by, search=search))
+    return columns
+
+
+def _answer_display(answer: Optional[FormQuestionAnswer]) -> str:
+    value = answer_display_value(answer)
+    return conditional_escape(localize(value)) if value is not None else ''
+
+
+def _people_rows(request: HttpRequest, profiles: List[UserProfile], questions: List[FormQuestion]) -> List[List[str]]:
+    form_answers = FormAnswerMatrix(questions, [profile.user_id for profile in profiles])
+    rows = []
+    for profile in profiles:
+        person = _participant_data(profile, None, form_answers)
+        user = person['user']
+        name = format_html('<a href="{}">{}</a>', reverse('profile', args=[user.id]),
+                           question_mark_on_empty_string(user.get_full_name()))
+        if not person['has_completed_profile']:
+            name += mark_safe(' <span class="text-warning" data-toggle="tooltip" data-placement="top" title="Niekompletny profil"><i class="fas fa-exclamation-circle"></i></span>')
+        rows.append([
+            '',
+            name,
+            conditional_escape(question_mark_on_none_value(localize(person['birth']) if person['birth'] else None)),
+            qualified_mark(person['is_adult']),
+            conditional_escape(question_mark_on_empty_string(user.email)),
+            conditional_escape(person['school']),
+            conditional_escape(question_mark_on_none_value(person['matura_exam_year'])),
+            render_to_string('_pastParticipation.html', {'participation_data': _visible_participation_data(request, profile)}),
+            conditional_escape(person['how_do_you_know_about']),
+        ] + [_answer_display(answer) for answer in person['form_answers']])
+    return rows
+
+
+@login_required()
+@permission_required('wwwapp.see_all_users', raise_exception=True)
+def people_data_view(request: HttpRequest) -> HttpResponse:
+    """
+    Rows of the all people table, in the format of DataTables server-side processing
+    """
+    questions = _all_people_questions()
+    profiles = _participants_queryset(None)
+    return datatables_response(request, profiles, _people_columns(questions),
+                               lambda page: _people_rows(request, page, questions))
+
+
+PARTICIPANTS_EXPORT_BATCH_SIZE = 500
+
+
+def _yes_no(value: Optional[bool]) -> Optional[str]:
+    if value is None:
+        return None
+    return 'TAK' if value else 'NIE'
+
+
+def _participants_export_rows(year: Camp) -> Iterator[List[Any]]:
+    """
+    Rows of the participants table, built in batches of PARTICIPANTS_EXPORT_BATCH_SIZE people,
+    so that only one batch is kept in memory at a time
+    """
+    ParticipantSummary.create_missing(year.pk)
+    participants = _participants_queryset(year)
+    questions = FormAnswerMatrix.questions_for_users(participants.values('user_id'))
+
+    yield ['Imię', 'Nazwisko', 'Email', 'Data urodzenia', 'Pełnoletni', 'Szkoła', 'Rok matury', 'Punkty',
+           'Suma ilości warsztatów', 'Ilość zakwalifikowanych warsztatów', 'List motywacyjny', 'Status',
+           'Skąd wiesz o WWW?', 'Komentarze'] + \
+          ['{}: {}'.format(question.form.title, question.title) for question in questions]
+
+    ids = participants.order_by('id').values_list('id', flat=True).distinct().iterator()
+    for batch in batched(ids, PARTICIPANTS_EXPORT_BATCH_SIZE):
+        batch_participants = list(_participants_queryset(year).filter(id__in=batch).order_by('id').distinct())
+        form_answers = FormAnswerMatrix(questions, [participant.user_id for participant in batch_participants])
+        for participant in batch_participants:
+            person = _participant_data(participant, year, form_answers)
+            yield [
+                person['user'].first_name,
+                person['user'].last_name,
+                person['user'].email,
+                person['birth'],
+                _yes_no(person['is_adult']),
+                person['school'],
+                person['matura_exam_year'],
+                round(person['points'], 1),
+                person['workshop_count'],
+                person['accepted_workshop_count'],
+                _yes_no(person['has_cover_letter']),
+                person['status_display'],
+                person['how_do_you_know_about'],
+                '\n'.join(person['infos']),
+            ] + [answer_display_value(answer) for answer in person['form_answers']]
+
+
+@login_required()
+@permission_required('wwwapp.see_all_users', raise_exception=True)
+def participants_export_view(request: HttpRequest, year: int, file_format: str) -> HttpResponse:
+    year = get_object_or_404(Camp, pk=year)
+    rows = _participants_export_rows(year)
+    filename = 'uczestnicy_{}.{}'.format(year.year, file_format)
+    if file_format == 'xlsx':
+        return streaming_xlsx_response(rows, filename)
+    return streaming_csv_response(rows, filename)
+
+
 @login_required()
 @permission_required('wwwapp.see_all_users', raise_exception=True)
 def lecturers_view(request: HttpRequest, year: int) -> HttpResponse:
@@ -613,7 +847,7 @@ def lecturers_view(request: HttpRequest, year: int) -> HttpResponse:
 
     workshops = Workshop.objects.filter(year=year, status=Workshop.STATUS_ACCEPTED).prefetch_related('lecturer', 'lecturer__user')
 
-    people: Dict[int, Dict[str, any]] = {}
+    people: Dict[int, Dict[str, Any]] = {}
     for workshop in workshops:
         for lecturer in workshop.lecturer.all():
             if lecturer.id in people:
@@ -627,15 +861,13 @@ def lecturers_view(request: HttpRequest, year: int) -> HttpResponse:
 
     people_list = list(people.values())
 
-    all_forms = Form.visible_objects.prefetch_related('questions').filter(questions__answers__user__in=[p['user'] for p in people_list]).distinct()
-    all_questions = [question for form in all_forms for question in form.questions.all()]
-    all_answers = FormQuestionAnswer.objects.prefetch_related('question', 'user').filter(user__in=[p['user'] for p in people_list], question__in=all_questions).all()
+    form_answers = FormAnswerMatrix.for_users([p['user'].id for p in people_list])
     for lecturer in people_list:
-        lecturer['form_answers'] = [next(filter(lambda a: a.question == question and a.user == lecturer['user'], all_answers), None) for question in all_questions]
+        lecturer['form_answers'] = form_answers.row(lecturer['user'].id)
 
     context = {}
     context['title'] = 'Prowadzący: %s' % year
-    context['form_questions'] = all_questions
+    context['form_questions'] = form_answers.questions
     context['people'] = people_list
 
     context['selected_year'] = year
@@ -813,76 +1045,90 @@ def workshop_solution_file(request, year, name, file_pk, solution_id=None):
     return sendfile(request, solution_file.file.path, mimetype=mimetype, encoding=encoding, attachment=attachment)
 
 
-@permission_required('wwwapp.export_workshop_registration')
-def data_for_plan_view(request, year: int) -> HttpResponse:
-    year = get_object_or_404(Camp, pk=year)
-
-    data = {}
-
-    participant_profiles_raw = UserProfile.objects.filter(workshop_profile__year=year, workshop_profile__status='Z')
-
-    lecturer_profiles_raw = set()
-    workshop_ids = set()
-    workshops = []
-    for workshop in Workshop.objects.filter(status='Z', year=year):
-        workshop_data = {'wid': workshop.id,
-                         'name': workshop.title,
-                         'lecturers': [lect.id for lect in
-                                       workshop.lecturer.all()]}
-        for lecturer in workshop.lecturer.all():
-            if lecturer not in participant_profiles_raw:
-                lecturer_profiles_raw.add(lecturer)
-        workshop_ids.add(workshop.id)
-        workshops.append(workshop_data)
-    data['workshops'] = workshops
-
-    users = []
-    user_ids = set()
+def _cached_plan_data(request: HttpRequest, year: int) -> Optional[Dict[str, Any]]:
+    """
+    The compact JSON of plan_data with its ETag and modification time, cached until any of the data changes
+    (see PLAN_DATA_GENERATION). None if the camp doesn't exist. Memoized on the request, because the conditional
+    request handling needs it too.
+    """
+    if not hasattr(request, '_plan_data'):
+        request._plan_data = cached('plan_data:{}:{}'.format(get_generation(PLAN_DATA_GENERATION), year),
+                                    lambda: _compute_plan_data(year))
+    return request._plan_data
 
-    def clean_date(date: datetime.date or None, min: datetime.date, max: datetime.date, default: datetime.date) -> datetime.date:
-        if date is None or (min is not None and date < min) or (max is not None and date > max):
-            return default
-        return date
 
-    current_year = Camp.current()
-    for user_type, profiles in [('Lecturer', lecturer_profiles_raw),
-                                ('Participant', participant_profiles_raw)]:
-        for up in profiles:
-            user = {
-                'uid': up.id,
-                'name': up.user.get_full_name(),
-                'type': user_type,
-            }
-            users.append(user)
-            user_ids.add(up.id)
+def _compute_plan_data(year: int) -> Optional[Dict[str, Any]]:
+    camp = Camp.objects.filter(pk=year).first()
+    if camp is None:
+        return None
+    content = json.dumps(plan_data(camp), cls=DjangoJSONEncoder, separators=(',', ':'))
+    return {
+        'content': content,
+        'etag': hashlib.sha1(content.encode()).hexdigest(),
+        'last_modified': timezone.now().replace(microsecond=0),
+    }
 
-    if year == current_year:
-        # TODO: Form data is valid for the current year only
-        start_dates = {answer.user.userprofile.id: answer.value_date for answer in FormQuestionAnswer.objects.prefetch_related('user', 'user__userprofile').filter(question=F('question__form__arrival_date'), question__form__is_visible=True, user__userprofile__in=user_ids, value_date__isnull=False)}
-        end_dates = {answer.user.userprofile.id: answer.value_date for answer in FormQuestionAnswer.objects.prefetch_related('user', 'user__userprofile').filter(question=F('question__form__departure_date'), question__form__is_visible=True, user__userprofile__in=user_ids, value_date__isnull=False)}
 
-        for user in users:
-            start_date = start_dates[user['uid']] if user['uid'] in start_dates else None
-            end_date = end_dates[user['uid']] if user['uid'] in end_dates else None
+def _plan_data_etag(request, year: int) -> Optional[str]:
+    data = _cached_plan_data(request, year)
+    return data['etag'] if data else None
 
-            user.update({
-                'start': clean_date(start_date, year.start_date, year.end_date, year.start_date),
-                'end': clean_date(end_date, year.start_date, year.end_date, year.end_date)
-            })
 
-    data['users'] = users
+def _plan_data_last_modified(request, year: int) -> Optional[datetime.datetime]:
+    data = _cached_plan_data(request, year)
+    return data['last_modified'] if data else None
 
-    participation = []
-    for wp in WorkshopParticipant.objects.filter(workshop__id__in=workshop_ids, participant__id__in=user_ids):
-        participation.append({
-            'wid': wp.workshop.id,
-            'uid': wp.participant.id,
-        })
-    data['participation'] = participation
 
-    return JsonResponse(data, json_dumps_params={'indent': 4})
+@permission_required('wwwapp.export_workshop_registration')
+@condition(etag_func=_plan_data_etag, last_modified_func=_plan_data_last_modified)
+def data_for_plan_view(request, year: int) -> HttpResponse:
+    """
+    Data for the external planning tool. Planners poll it repeatedly, so the response is cached and supports
+    conditional requests. Add ?pretty=1 for indented output.
+    """
+    data = _cached_plan_data(request, year)
+    if data is None:
+        raise Http404()
+    content = data['content']
+    if request.GET.get('pretty'):
+        content = json.dumps(json.loads(content), indent=4)
+    return HttpResponse(content, content_type='application/json')
 
 
+@permission_required('wwwapp.export_workshop_registration')
+def coregistration_view(request: HttpRequest, year: int, file_format: str) -> HttpResponse:
+    """
+    Numbers of people taking part in both workshops, for every pair of accepted workshops of the year
+    """
+    year = get_object_or_404(Camp, pk=year)
+    data = CoRegistrationMatrix.get(year.pk)
+    workshops = data['workshops']
+    matrix = CoRegistrationMatrix.as_rows(data)
+    if file_format == 'csv':
+        rows = [[''] + [title for _, title in workshops]]
+        rows += [[title] + row for (_, title), row in zip(workshops, matrix)]
+        return streaming_csv_response(rows, 'wspolne_zapisy_{}.csv'.format(year.year))
+    return JsonResponse({
+        'workshops': [{'wid': workshop_id, 'name': title} for workshop_id, title in workshops],
+        'matrix': matrix,
+    }, json_dumps_params={'separators': (',', ':')})
+
+
+def _qualification_problems_validators(request: HttpRequest, year: int, name: str) -> Optional[Validators]:
+    workshop = Workshop.objects.filter(year__pk=year, name=name) \
+        .values_list('status', 'is_qualifying', 'qualification_problems', 'updated_at').first()
+    if workshop is None:
+        return None
+    status, is_qualifying, qualification_problems, updated_at = workshop
+    if status not in (Workshop.STATUS_ACCEPTED, Workshop.STATUS_CANCELLED) or not is_qualifying \
+            or not qualification_problems:
+        return None
+    # Uploading a new file saves the workshop, which changes updated_at
+    etag = hashlib.sha1(repr([qualification_problems, updated_at]).encode('utf-8')).hexdigest()
+    return Validators(etag, updated_at)
+
+
+@conditional_page(_qualification_problems_validators)
 def qualification_problems_view(request, year, name):
     workshop = get_object_or_404(Workshop, year__pk=year, name=name)
 
@@ -900,6 +1146,14 @@ def qualification_problems_view(request, year, name):
     return sendfile(request, workshop.qualification_problems.path, mimetype='application/pdf')
 
 
+def _article_validators(request: HttpRequest, name: str) -> Optional[Validators]:
+    updated_at = Article.objects.filter(name=name).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return page_validators(request, ['article', name, updated_at])
+
+
+@conditional_page(_article_validators)
 def article_view(request, name):
     context = {}
 
@@ -907,14 +1161,9 @@ def article_view(request, name):
     title = art.title
     can_edit_article = request.user.has_perm('wwwapp.change_article')
 
-    bleach_args = get_bleach_default_options().copy()
-    if art.name == 'index':
-        bleach_args['tags'] += ['iframe']  # Allow iframe on main page for Facebook embed
-    article_content_clean = mark_safe(bleach.clean(art.content, **bleach_args))
-
     context['title'] = title
     context['article'] = art
-    context['article_content_clean'] = article_content_clean
+    context['article_content_clean'] = art.content_html
     context['can_edit'] = can_edit_article
 
     return render(request, 'article.html', context)
@@ -961,14 +1210,50 @@ def article_edit_view(request, name=None):
     return render(request, 'articleedit.html', context)
 
 
+def _cached_link_list(request: HttpRequest) -> Dict[str, Any]:
+    """
+    The links to all articles and public workshop pages, with the ETag of the list, cached until any article or
+    workshop changes. Memoized on the request, because the conditional request handling needs it too.
+    """
+    if not hasattr(request, '_link_list'):
+        request._link_list = cached('link_list:{}'.format(get_generation(LINK_LIST_GENERATION)), _compute_link_list)
+    return request._link_list
+
+
+def _compute_link_list() -> Dict[str, Any]:
+    articles = Article.objects.values_list('name', 'title')
+    workshops = Workshop.objects.filter(Q(status='Z') | Q(status='X')).order_by('-year', 'pk') \
+        .values_list('year_id', 'name', 'title')
+    links = [{'title': 'Artykuł: ' + (title or name), 'value': reverse('article', kwargs={'name': name})}
+             for name, title in articles]
+    # Camp is identified by the year, so it can be displayed without loading it
+    links += [{'title': 'Warsztaty (' + str(Camp(year=year_id)) + '): ' + title,
+               'value': reverse('workshop_page', kwargs={'year': year_id, 'name': name})}
+              for year_id, name, title in workshops]
+    return {
+        'links': links,
+        'etag': hashlib.sha1(json.dumps(links).encode()).hexdigest(),
+    }
+
+
+def _link_list_etag(request: HttpRequest) -> str:
+    prefix = request.GET.get('prefix', '')
+    etag = _cached_link_list(request)['etag']
+    return hashlib.sha1((etag + prefix).encode()).hexdigest() if prefix else etag
+
+
+@condition(etag_func=_link_list_etag)
 def article_name_list_view(request):
-    articles = Article.objects.all()
-    article_list = [{'title': 'Artykuł: ' + (article.title or article.name), 'value': reverse('article', kwargs={'name': article.name})} for article in articles]
-
-    workshops = Workshop.objects.filter(Q(status='Z') | Q(status='X')).order_by('-year')
-    workshop_list = [{'title': 'Warsztaty (' + str(workshop.year) + '): ' + workshop.title, 'value': reverse('workshop_page', kwargs={'year': workshop.year.pk, 'name': workshop.name})} for workshop in workshops]
-
-    return JsonResponse(article_list + workshop_list, safe=False)
+    """
+    Links offered by the rich-text editor (TINYMCE_DEFAULT_CONFIG['link_list']). Add ?prefix= to only get the links
+    whose title or address starts with it (case insensitive), e.g. ?prefix=/2021/ for the workshops of one camp.
+    """
+    links = _cached_link_list(request)['links']
+    prefix = request.GET.get('prefix', '').lower()
+    if prefix:
+        links = [link for link in links
+                 if link['title'].lower().startswith(prefix) or link['value'].lower().startswith(prefix)]
+    return JsonResponse(links, safe=False)
 
 
 @login_required()
@@ -1024,18 +1309,29 @@ def resource_auth_view(request):
     for intended usage.
     """
     if not request.user.is_authenticated:
-        return HttpResponseForbidden("You need to login.")
-    if request.user.has_perm('wwwapp.access_all_resources'):
-        return HttpResponse("Glory to WWW and the ELITARNY MIMUW!!!")
+        return _resource_auth_response(HttpResponseForbidden("You need to login."))
 
-    user_profile = UserProfile.objects.get(user=request.user)
+    can_access_all = cached(
+        'access_all_resources:{}:{}'.format(get_generation(PERMISSIONS_GENERATION), request.user.pk),
+        lambda: request.user.has_perm('wwwapp.access_all_resources'))
+    if can_access_all:
+        return _resource_auth_response(HttpResponse("Glory to WWW and the ELITARNY MIMUW!!!"))
 
     uri = request.META.get('HTTP_X_ORIGINAL_URI', '')
 
-    for resource in ResourceYearPermission.resources_for_uri(uri):
-        if user_profile.is_participating_in(resource.year):
-            return HttpResponse("Welcome!")
-    return HttpResponseForbidden("What about NO!")
+    if ResourceYearPermission.year_ids_for_uri(uri) & UserProfile.participation_year_ids_for_user(request.user.pk):
+        return _resource_auth_response(HttpResponse("Welcome!"))
+    return _resource_auth_response(HttpResponseForbidden("What about NO!"))
+
+
+def _resource_auth_response(response):
+    """
+    Allow nginx to cache the auth decision for a short time (the cache key in nginx.conf includes the session cookie)
+    """
+    patch_cache_control(response, private=True, max_age=settings.RESOURCE_AUTH_CACHE_SECONDS)
+    patch_vary_headers(response, ['Cookie'])
+    response['X-Accel-Expires'] = settings.RESOURCE_AUTH_CACHE_SECONDS
+    return response
 
 
 def _upload_file(request, target_dir):
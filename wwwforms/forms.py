@@ -3,9 +3,14 @@ from crispy_forms.helper import FormHelper
 from django import forms
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.forms.models import ModelChoiceIterator
+from django.utils import timezone
 
-from wwwapp.models import Camp
-from wwwforms.models import FormQuestion, FormQuestionAnswer, pesel_validate, Form, FormQuestionOption
+from wwwapp.models import Camp, invalidate_plan_data_for_answers, update_participant_summaries_for_answers
+from wwwforms.models import FormQuestion, FormQuestionAnswer, pesel_validate, Form, FormQuestionOption, \
+    prefetch_answer_values
 
 
 class TextareaField(forms.CharField):
@@ -16,15 +21,68 @@ class PESELField(forms.CharField):
     default_validators = [pesel_validate]
 
 
-class SelectChoiceField(forms.ModelChoiceField):
+class PrefetchedOptionsIterator(ModelChoiceIterator):
+    """
+    Iterates over the options given to the field instead of querying the database
+    """
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for option in self.field.options:
+            yield self.choice(option)
+
+    def __len__(self):
+        return len(self.field.options) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.options)
+
+
+class PrefetchedOptionsMixin:
+    """
+    Choice field over the already loaded options of a question, so that neither rendering nor validation
+    makes any queries
+    """
+    iterator = PrefetchedOptionsIterator
+
+    def __init__(self, queryset, *args, **kwargs):
+        # Read before the field clones the queryset, which would drop the prefetched results
+        self.options = list(queryset)
+        self.options_by_pk = {str(option.pk): option for option in self.options}
+        super().__init__(queryset, *args, **kwargs)
+
+
+class PrefetchedModelChoiceField(PrefetchedOptionsMixin, forms.ModelChoiceField):
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        option = self.options_by_pk.get(str(getattr(value, 'pk', value)))
+        if option is None:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+        return option
+
+
+class PrefetchedModelMultipleChoiceField(PrefetchedOptionsMixin, forms.ModelMultipleChoiceField):
+    def _check_values(self, value):
+        try:
+            value = frozenset(str(getattr(pk, 'pk', pk)) for pk in value)
+        except TypeError:
+            raise ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+        for pk in value:
+            if pk not in self.options_by_pk:
+                raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': pk})
+        return [option for option in self.options if str(option.pk) in value]
+
+
+class SelectChoiceField(PrefetchedModelChoiceField):
     widget = forms.widgets.Select
 
 
-class RadioChoiceField(forms.ModelChoiceField):
+class RadioChoiceField(PrefetchedModelChoiceField):
     widget = forms.widgets.RadioSelect
 
 
-class CheckboxMultipleChoiceField(forms.ModelMultipleChoiceField):
+class CheckboxMultipleChoiceField(PrefetchedModelMultipleChoiceField):
     widget = forms.widgets.CheckboxSelectMultiple
 
 
@@ -47,19 +105,23 @@ class FormForm(forms.Form):
         super().__init__(*args, **kwargs)
 
         # TODO: This is ugly - makes wwwforms have a circular reference to wwwapp, and should it even be hardcoded to 'latest'?
-        current_year = Camp.objects.latest()
+        current_year = Camp.current()
 
         self.form = form
         self.user = user
-        self.questions = form.questions.all()
-        answers_qs = FormQuestionAnswer.objects.prefetch_related('question').filter(question__in=self.questions, user=user).all()
+        self.questions = list(form.questions.all())
+        prefetch_related_objects(self.questions, 'options')
+        user_answers = {answer.question_id: answer for answer in prefetch_answer_values(
+            FormQuestionAnswer.objects.filter(question__in=self.questions, user=user), self.questions)}
         self.answers = {}
         for question in self.questions:
             field_name = self.field_name_for_question(question)
             field_type = self.FIELD_TYPES[question.data_type]
 
-            self.answers[field_name] = next(filter(lambda x: x.question == question, answers_qs), None)
+            self.answers[field_name] = user_answers.get(question.id)
             value = self.answers[field_name].value if self.answers[field_name] is not None else None
+            if question.data_type == FormQuestion.TYPE_MULTIPLE_CHOICE and value is not None:
+                value = list(value)
 
             field_kwargs = {}
             if question.data_type in (FormQuestion.TYPE_CHOICE, FormQuestion.TYPE_MULTIPLE_CHOICE, FormQuestion.TYPE_SELECT):
@@ -99,7 +161,7 @@ class FormForm(forms.Form):
         if self.form.arrival_date and self.form.departure_date:
             arrival_date_field = self.field_name_for_question(self.form.arrival_date)
             departure_date_field = self.field_name_for_question(self.form.departure_date)
-            current_year = Camp.objects.latest()
+            current_year = Camp.current()
             if current_year.start_date and current_year.end_date:
                 errors = {}
 
@@ -125,16 +187,61 @@ class FormForm(forms.Form):
 
         return cleaned_data
 
+    @transaction.atomic
     def save(self):
+        now = timezone.now()
+        created = []
+        updated = []
+        written = []
         for question in self.questions:
             field_name = self.field_name_for_question(question)
-            if not self.fields[field_name].disabled:
-                if self.answers[field_name]:
-                    if self.answers[field_name].value != self.cleaned_data[field_name]:
-                        # Call .save() only if the value actually changed to make sure last_updated updates correctly
-                        self.answers[field_name].value = self.cleaned_data[field_name]
-                        self.answers[field_name].save()
-                else:
-                    self.answers[field_name] = FormQuestionAnswer.objects.create(question=question, user=self.user)
-                    self.answers[field_name].value = self.cleaned_data[field_name]
-                    self.answers[field_name].save()
+            if self.fields[field_name].disabled:
+                continue
+            value = self.cleaned_data[field_name]
+            answer = self.answers[field_name]
+            if answer is None:
+                answer = FormQuestionAnswer(question=question, user=self.user)
+                self.answers[field_name] = answer
+                created.append(answer)
+            elif answer.has_value(value):
+                # Write only the answers that actually changed to make sure last_changed updates correctly
+                continue
+            else:
+                updated.append(answer)
+            written.append((answer, answer.set_value_fields(value)))
+            answer.last_changed = now
+            answer.clean()
+            answer.update_birth_date()
+
+        if created:
+            FormQuestionAnswer.objects.bulk_create(created)
+            if any(answer.pk is None for answer in created):
+                # Not every database returns the primary keys from a bulk insert
+                pks = dict(FormQuestionAnswer.objects
+                           .filter(user=self.user, question__in=[answer.question for answer in created])
+                           .values_list('question_id', 'pk'))
+                for answer in created:
+                    answer.pk = pks[answer.question_id]
+        if updated:
+            FormQuestionAnswer.objects.bulk_update(
+                updated, ['last_changed', 'birth_date'] +
+                [field for field in FormQuestionAnswer.ALL_VALUE_FIELDS if field != 'value_choices'])
+
+        # Replace the selected options of all the written answers at once
+        through = FormQuestionAnswer.value_choices.through
+        if updated:
+            through.objects.filter(formquestionanswer__in=updated).delete()
+        through.objects.bulk_create([
+            through(formquestionanswer_id=answer.pk, formquestionoption_id=option.pk)
+            for answer, options in written for option in options
+        ])
+
+        written_answers = [answer for answer, _ in written]
+        for answer in written_answers:
+            # The prefetched options are out of date now
+            getattr(answer, '_prefetched_objects_cache', {}).pop('value_choices', None)
+
+        # bulk_create() and bulk_update() don't send the signals that keep the derived data up to date (the birth
+        # dates were already updated above)
+        invalidate_plan_data_for_answers(written_answers)
+        update_participant_summaries_for_answers(written_answers)
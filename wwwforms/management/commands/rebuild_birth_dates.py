@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from wwwforms.models import FormQuestion, FormQuestionAnswer, pesel_extract_date
+
+
+class Command(BaseCommand):
+    help = 'Recompute the birth dates stored with the PESEL answers, or check if they are consistent with the answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Do not write anything, only report the answers that are out of date')
+
+    def handle(self, *args, **options):
+        outdated = []
+        answers = FormQuestionAnswer.objects.filter(Q(question__data_type=FormQuestion.TYPE_PESEL) | Q(birth_date__isnull=False))
+        for answer in answers.select_related('question').only('question__data_type', 'value_string', 'birth_date').iterator():
+            expected = pesel_extract_date(answer.value_string) if answer.question.data_type == FormQuestion.TYPE_PESEL else None
+            if answer.birth_date != expected:
+                answer.birth_date = expected
+                outdated.append(answer)
+
+        if options['check']:
+            for answer in outdated:
+                self.stdout.write('Birth date of FormQuestionAnswer {} is out of date'.format(answer.pk))
+            if outdated:
+                raise CommandError('{} birth dates are out of date'.format(len(outdated)))
+            self.stdout.write('All birth dates are up to date')
+            return
+
+        FormQuestionAnswer.objects.bulk_update(outdated, ['birth_date'], batch_size=1000)
+        self.stdout.write('Updated {} birth dates'.format(len(outdated)))
+        if outdated:
+            self.stdout.write('Run rebuild_participant_summaries to update the participant summaries')
@@ -0,0 +1,49 @@
+# Generated by Django 3.1.8 on 2026-10-18 19:15
+
+import datetime
+
+from django.db import migrations, models
+
+
+def pesel_extract_date(pesel):
+    # A copy of wwwforms.models.pesel_extract_date as of this migration
+    if not pesel or len(pesel) < 6:
+        return None
+
+    try:
+        year, month, day = [int(pesel[i:i+2]) for i in range(0, 6, 2)]
+    except ValueError:
+        return None
+    years_from_month = [1900, 2000, 2100, 2200, 1800]
+    count, month = divmod(month, 20)
+    year += years_from_month[count]
+    try:
+        return datetime.date(year, month, day)
+    except ValueError:
+        return None
+
+
+def fill_birth_dates(apps, schema_editor):
+    FormQuestionAnswer = apps.get_model('wwwforms', 'FormQuestionAnswer')
+    db_alias = schema_editor.connection.alias
+
+    answers = list(FormQuestionAnswer.objects.using(db_alias).filter(question__data_type='P').exclude(value_string=None))
+    for answer in answers:
+        answer.birth_date = pesel_extract_date(answer.value_string)
+    FormQuestionAnswer.objects.using(db_alias).bulk_update(answers, ['birth_date'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wwwforms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formquestionanswer',
+            name='birth_date',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_birth_dates, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,10 @@
 import datetime
-from typing import Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import OuterRef, Subquery, prefetch_related_objects
 
 
 def pesel_validate(pesel: str) -> None:
@@ -201,6 +202,8 @@ class FormQuestionAnswer(models.Model):
     value_string = models.CharField(max_length=100000, blank=True, null=True)
     value_date = models.DateField(blank=True, null=True)
     value_choices = models.ManyToManyField(FormQuestionOption, blank=True, related_name='+')
+    # Derived from value_string of PESEL answers, so that age can be checked in SQL (see user_birth_date())
+    birth_date = models.DateField(blank=True, null=True, editable=False, db_index=True)
 
     ALL_VALUE_FIELDS = ['value_number', 'value_string', 'value_date', 'value_choices']
 
@@ -214,10 +217,9 @@ class FormQuestionAnswer(models.Model):
         field_name = self.question.value_field_name()
         if field_name == 'value_choices':
             if self.question.data_type in (FormQuestion.TYPE_CHOICE, FormQuestion.TYPE_SELECT):
-                try:
-                    return getattr(self, field_name).get()
-                except FormQuestionOption.DoesNotExist:
-                    return None
+                # Not .get(), so that the prefetched options are used if available
+                options = list(getattr(self, field_name).all())
+                return options[0] if options else None
             else:
                 return getattr(self, field_name).all()
         else:
@@ -225,22 +227,49 @@ class FormQuestionAnswer(models.Model):
 
     @value.setter
     def value(self, value):
-        for field_name in self.ALL_VALUE_FIELDS:
-            if field_name == self.question.value_field_name():
-                continue
-            if field_name == 'value_choices':
-                getattr(self, field_name).set([])
-            else:
-                setattr(self, field_name, None)
+        self.value_choices.set(self.set_value_fields(value))
 
+    @property
+    def plain_value(self):
+        """
+        The value with the selected options replaced by their titles (a list of titles for multiple choice questions)
+        """
+        value = self.value
+        if self.question.value_field_name() != 'value_choices':
+            return value
+        if self.question.data_type == FormQuestion.TYPE_MULTIPLE_CHOICE:
+            return [option.title for option in value]
+        return value.title if value is not None else None
+
+    def _value_options(self, value) -> List[FormQuestionOption]:
+        if self.question.data_type in (FormQuestion.TYPE_CHOICE, FormQuestion.TYPE_SELECT):
+            return [value] if value else []
+        return list(value) if value else []
+
+    def set_value_fields(self, value) -> List[FormQuestionOption]:
+        """
+        Assigns the value to the concrete value fields, clearing the other ones. value_choices can't be written
+        before the answer is saved, so the options that should be selected are returned instead (an empty list
+        for questions without options).
+        """
         field_name = self.question.value_field_name()
+        for other_field_name in self.ALL_VALUE_FIELDS:
+            if other_field_name not in (field_name, 'value_choices'):
+                setattr(self, other_field_name, None)
         if field_name == 'value_choices':
-            options = value
-            if self.question.data_type in (FormQuestion.TYPE_CHOICE, FormQuestion.TYPE_SELECT):
-                options = [options] if options else []
-            getattr(self, field_name).set(options)
-        else:
-            setattr(self, field_name, value)
+            return self._value_options(value)
+        setattr(self, field_name, value)
+        return []
+
+    def has_value(self, value) -> bool:
+        """
+        Whether the answer already holds the given value (using the prefetched options if available)
+        """
+        field_name = self.question.value_field_name()
+        if field_name == 'value_choices':
+            return {option.pk for option in self.value_choices.all()} == \
+                {option.pk for option in self._value_options(value)}
+        return getattr(self, field_name) == value
 
     def clean(self):
         must_be_empty = self.ALL_VALUE_FIELDS.copy()
@@ -259,9 +288,114 @@ class FormQuestionAnswer(models.Model):
             except ValidationError as e:
                 raise ValidationError({self.question.value_field_name(): e})
 
+    def update_birth_date(self) -> None:
+        if self.question.data_type == FormQuestion.TYPE_PESEL:
+            self.birth_date = pesel_extract_date(self.value_string)
+        else:
+            self.birth_date = None
+
     def save(self, *args, **kwargs):
         self.clean()
+        self.update_birth_date()
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return str(self.question) + ' - ' + self.user.get_full_name()
\ No newline at end of file
+        return str(self.question) + ' - ' + self.user.get_full_name()
+
+
+def user_birth_date(user_ref: str = 'pk') -> Subquery:
+    """
+    Birth date of the user taken from the first filled in PESEL question of the visible forms, to be used
+    in annotations. user_ref is the name of the outer field holding the user id.
+    """
+    return Subquery(FormQuestionAnswer.objects
+                    .filter(user=OuterRef(user_ref), birth_date__isnull=False, question__form__is_visible=True)
+                    .order_by('question__form_id', 'question__order', 'question_id')
+                    .values('birth_date')[:1],
+                    output_field=models.DateField())
+
+
+def prefetch_answer_values(answers: Iterable[FormQuestionAnswer],
+                           questions: Iterable[FormQuestion] = ()) -> List[FormQuestionAnswer]:
+    """
+    Loads the questions and the selected options of all the answers, with one query for each of them. The given
+    questions (e.g. the ones already shown in a table) are reused instead of being fetched again. Afterwards value and
+    plain_value of the answers don't make any queries.
+    """
+    answers = list(answers)
+    questions_by_id = {question.id: question for question in questions}
+    for answer in answers:
+        if answer.question_id in questions_by_id:
+            answer.question = questions_by_id[answer.question_id]
+    prefetch_related_objects(answers, 'question', 'value_choices')
+    return answers
+
+
+def load_answer_values(answers: Iterable[FormQuestionAnswer],
+                       questions: Iterable[FormQuestion] = ()) -> Dict[int, Any]:
+    """
+    Plain values (see FormQuestionAnswer.plain_value) of the answers by answer id, in a constant number of queries
+    """
+    return {answer.pk: answer.plain_value for answer in prefetch_answer_values(answers, questions)}
+
+
+class FormAnswerMatrix:
+    """
+    Answers of a group of users to a list of questions, loaded with a single query (plus one for the selected
+    options) and indexed by (user_id, question_id), so that a table of people x questions can be built in linear time.
+
+    user_ids may be a list or a subquery (e.g. QuerySet.values('user_id')).
+    """
+    def __init__(self, questions: Iterable['FormQuestion'], user_ids: Iterable[int]):
+        self.questions: List[FormQuestion] = list(questions)
+        answers = prefetch_answer_values(
+            FormQuestionAnswer.objects.filter(question__in=self.questions, user_id__in=user_ids), self.questions)
+        self._answers: Dict[Tuple[int, int], FormQuestionAnswer] = {
+            (answer.user_id, answer.question_id): answer for answer in answers}
+
+        self._pesel_questions = [question for question in self.questions if question.data_type == FormQuestion.TYPE_PESEL]
+
+    @staticmethod
+    def questions_for_users(user_ids: Iterable[int]) -> List['FormQuestion']:
+        """
+        All questions of the visible forms that any of the given users has answered
+        """
+        forms = Form.visible_objects.prefetch_related('questions') \
+            .filter(questions__answers__user_id__in=user_ids).distinct()
+        return [question for form in forms for question in form.questions.all()]
+
+    @classmethod
+    def for_users(cls, user_ids: Iterable[int]) -> 'FormAnswerMatrix':
+        return cls(cls.questions_for_users(user_ids), user_ids)
+
+    def get(self, user_id: int, question_id: int) -> Optional['FormQuestionAnswer']:
+        return self._answers.get((user_id, question_id))
+
+    def row(self, user_id: int) -> List[Optional['FormQuestionAnswer']]:
+        """
+        Answers of the user in the order of self.questions (None where the question was not answered)
+        """
+        return [self._answers.get((user_id, question.id)) for question in self.questions]
+
+    def birth_date(self, user_id: int) -> Optional[datetime.date]:
+        """
+        Birth date extracted from the first filled in PESEL question
+        """
+        for question in self._pesel_questions:
+            answer = self._answers.get((user_id, question.id))
+            if answer and answer.birth_date:
+                return answer.birth_date
+        return None
+
+
+def answer_display_value(answer: Optional[FormQuestionAnswer]):
+    """
+    Value of the answer for displaying in tables. Selected options are read with value_choices.all(), so that
+    they come from the prefetch cache (e.g. the one filled by FormAnswerMatrix) instead of a query per answer.
+    """
+    if answer is None:
+        return None
+    value = answer.plain_value
+    if isinstance(value, list):
+        return ', '.join(value)
+    return value
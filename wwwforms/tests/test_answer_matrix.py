@@ -0,0 +1,49 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from wwwforms.models import Form, FormQuestion, FormQuestionAnswer, FormAnswerMatrix
+
+
+class FormAnswerMatrixTest(TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create_user(username='user1', email='user1@example.com', password='user123')
+        self.user_2 = User.objects.create_user(username='user2', email='user2@example.com', password='user123')
+        self.user_3 = User.objects.create_user(username='user3', email='user3@example.com', password='user123')
+
+        self.form = Form.objects.create(name='info', title='Info')
+        self.question_name = FormQuestion.objects.create(form=self.form, title='Name', data_type=FormQuestion.TYPE_STRING, order=0)
+        self.question_pesel = FormQuestion.objects.create(form=self.form, title='PESEL', data_type=FormQuestion.TYPE_PESEL, order=1)
+        self.question_diet = FormQuestion.objects.create(form=self.form, title='Diet', data_type=FormQuestion.TYPE_MULTIPLE_CHOICE, order=2)
+        self.option_vege = self.question_diet.options.create(title='Vege')
+
+        self.hidden_form = Form.objects.create(name='hidden', title='Hidden', is_visible=False)
+        self.hidden_question = FormQuestion.objects.create(form=self.hidden_form, title='Secret', data_type=FormQuestion.TYPE_STRING)
+
+        self.answer_name = FormQuestionAnswer.objects.create(question=self.question_name, user=self.user_1, value_string='Jan')
+        FormQuestionAnswer.objects.create(question=self.question_pesel, user=self.user_1, value_string='98101672714')
+        self.answer_diet = FormQuestionAnswer.objects.create(question=self.question_diet, user=self.user_1)
+        self.answer_diet.value_choices.set([self.option_vege])
+        FormQuestionAnswer.objects.create(question=self.question_pesel, user=self.user_2, value_string='')
+        FormQuestionAnswer.objects.create(question=self.hidden_question, user=self.user_2, value_string='secret')
+        FormQuestionAnswer.objects.create(question=self.question_name, user=self.user_3, value_string='Other')
+
+    def test_for_users(self):
+        with self.assertNumQueries(4):
+            matrix = FormAnswerMatrix.for_users([self.user_1.id, self.user_2.id])
+        self.assertListEqual(matrix.questions, [self.question_name, self.question_pesel, self.question_diet])
+
+        with self.assertNumQueries(0):
+            row = matrix.row(self.user_1.id)
+            self.assertEqual(row[0], self.answer_name)
+            self.assertEqual(row[0].question, self.question_name)
+            self.assertListEqual(list(row[2].value), [self.option_vege])
+            self.assertListEqual(matrix.row(self.user_2.id)[::2], [None, None])
+            self.assertIsNone(matrix.get(self.user_3.id, self.question_name.id))
+
+    def test_birth_date(self):
+        matrix = FormAnswerMatrix.for_users(User.objects.values('id'))
+        self.assertEqual(matrix.birth_date(self.user_1.id), datetime.date(1998, 10, 16))
+        self.assertIsNone(matrix.birth_date(self.user_2.id))
+        self.assertIsNone(matrix.birth_date(self.user_3.id))
@@ -0,0 +1,61 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from wwwforms.models import Form, FormQuestion, FormQuestionAnswer, user_birth_date
+
+
+class BirthDateTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='user123')
+        self.other_user = User.objects.create_user(username='other', email='other@example.com', password='user123')
+
+        self.form = Form.objects.create(name='info', title='Info')
+        self.question_pesel = self.form.questions.create(title='PESEL', data_type=FormQuestion.TYPE_PESEL, order=1)
+        self.question_string = self.form.questions.create(title='Name', data_type=FormQuestion.TYPE_STRING, order=0)
+        self.hidden_form = Form.objects.create(name='hidden', title='Hidden', is_visible=False)
+        self.hidden_question_pesel = self.hidden_form.questions.create(title='PESEL', data_type=FormQuestion.TYPE_PESEL)
+
+    def birth_dates(self):
+        return dict(User.objects.annotate(birth_date=user_birth_date()).values_list('username', 'birth_date'))
+
+    def test_stored_on_save(self):
+        answer = self.question_pesel.answers.create(user=self.user, value_string='98101672714')
+        self.assertEqual(answer.birth_date, datetime.date(1998, 10, 16))
+        answer.value_string = '02270803624'
+        answer.save()
+        answer.refresh_from_db()
+        self.assertEqual(answer.birth_date, datetime.date(2002, 7, 8))
+        answer.value_string = ''
+        answer.save()
+        answer.refresh_from_db()
+        self.assertIsNone(answer.birth_date)
+
+        # Only PESEL answers have a birth date
+        answer = self.question_string.answers.create(user=self.user, value_string='98101672714')
+        self.assertIsNone(answer.birth_date)
+
+    def test_user_birth_date(self):
+        self.hidden_question_pesel.answers.create(user=self.user, value_string='02270803624')
+        self.assertDictEqual(self.birth_dates(), {'user': None, 'other': None})
+
+        self.question_pesel.answers.create(user=self.user, value_string='98101672714')
+        self.question_pesel.answers.create(user=self.other_user, value_string='')
+        self.assertDictEqual(self.birth_dates(), {'user': datetime.date(1998, 10, 16), 'other': None})
+
+    def test_rebuild_command(self):
+        answer = self.question_pesel.answers.create(user=self.user, value_string='98101672714')
+        call_command('rebuild_birth_dates', check=True, stdout=StringIO())
+
+        # Changes that bypass save() make the birth dates inconsistent
+        FormQuestionAnswer.objects.filter(pk=answer.pk).update(value_string='02270803624')
+        with self.assertRaisesMessage(CommandError, '1 birth dates are out of date'):
+            call_command('rebuild_birth_dates', check=True, stdout=StringIO())
+
+        call_command('rebuild_birth_dates', stdout=StringIO())
+        answer.refresh_from_db()
+        self.assertEqual(answer.birth_date, datetime.date(2002, 7, 8))
+        call_command('rebuild_birth_dates', check=True, stdout=StringIO())
@@ -1,10 +1,15 @@
+import csv
 import datetime
+import io
 
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from wwwforms.models import Form, FormQuestion
+from wwwforms.models import Form, FormQuestion, FormQuestionAnswer
+from wwwforms.views import FORM_RESULTS_PAGE_SIZE
 
 
 class FormResultsTest(TestCase):
@@ -60,3 +65,61 @@ class FormResultsTest(TestCase):
     def test_view_results_unauthenticated(self):
         response = self.client.get(reverse('form_results', args=[self.form.name]))
         self.assertRedirects(response, reverse('login') + '?next=' + reverse('form_results', args=[self.form.name]))
+
+    def test_view_results_choices(self):
+        question = self.form.questions.create(title='Pets', data_type=FormQuestion.TYPE_MULTIPLE_CHOICE, is_required=False)
+        cat = question.options.create(title='Cat')
+        dog = question.options.create(title='Dog')
+        question.options.create(title='Fish')
+        for user in (self.admin_user, self.normal_user):
+            question.answers.create(user=user).value_choices.set([cat, dog])
+
+        self.client.force_login(self.admin_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('form_results', args=[self.form.name]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Cat, Dog', count=2)
+
+        # The number of queries doesn't depend on the number of respondents
+        for i in range(5):
+            user = User.objects.create_user(username='user{}'.format(i), email='user{}@example.com'.format(i))
+            self.question2.answers.create(user=user, value_string='green')
+            question.answers.create(user=user).value_choices.set([dog])
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(reverse('form_results', args=[self.form.name]))
+        self.assertContains(response, 'Cat, Dog', count=2)
+
+    def test_view_results_pagination(self):
+        users = [User.objects.create_user(username='user{}'.format(i), email='user{}@example.com'.format(i),
+                                          last_name='Zz{:03}'.format(i))
+                 for i in range(FORM_RESULTS_PAGE_SIZE)]
+        for user in users:
+            self.question1.answers.create(user=user, value_number=1)
+
+        self.client.force_login(self.admin_user)
+        response = self.client.get(reverse('form_results', args=[self.form.name]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['answers']), FORM_RESULTS_PAGE_SIZE)
+        self.assertIn(self.admin_user, response.context['answers'])
+
+        response = self.client.get(reverse('form_results', args=[self.form.name]) + '?page=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual(list(response.context['answers'].keys()), users[-2:])
+        self.assertSequenceEqual(response.context['answers'][users[-1]], [FormQuestionAnswer.objects.get(user=users[-1]), None, None, None])
+
+    def test_export_results(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(reverse('form_results_export', args=[self.form.name]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertListEqual(rows, [
+            ['Imię', 'Nazwisko', 'Email', 'Favorite number', 'Favorite color', 'Essay', 'Gimme a date'],
+            ['', '', 'admin@example.com', '1337', 'red', '', '2001-01-01'],
+            ['', '', 'user@example.com', '', 'blue', '', ''],
+        ])
+
+    def test_export_results_no_permissions(self):
+        self.client.force_login(self.normal_user)
+        response = self.client.get(reverse('form_results_export', args=[self.form.name]))
+        self.assertEqual(response.status_code, 403)
@@ -4,7 +4,9 @@ import pytz
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.messages.api import get_messages
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from freezegun import freeze_time
 
@@ -136,4 +138,106 @@ class FormSubmitTest(TestCase):
         })
         self.assertRedirects(response, reverse('login') + '?next=' + reverse('form', args=[self.form.name]))
 
+    def create_choice_questions(self):
+        self.question_single = self.form.questions.create(title='Radio', data_type=FormQuestion.TYPE_CHOICE, is_required=False)
+        self.question_single_1 = self.question_single.options.create(title='Option 1')
+        self.question_single_2 = self.question_single.options.create(title='Option 2')
+        self.question_select = self.form.questions.create(title='Select', data_type=FormQuestion.TYPE_SELECT, is_required=False)
+        self.question_select_1 = self.question_select.options.create(title='Option 1')
+        self.question_multiple = self.form.questions.create(title='Checkboxes', data_type=FormQuestion.TYPE_MULTIPLE_CHOICE, is_required=False)
+        self.question_multiple_1 = self.question_multiple.options.create(title='Option 1')
+        self.question_multiple_2 = self.question_multiple.options.create(title='Option 2')
+        self.question_multiple_3 = self.question_multiple.options.create(title='Option 3')
+
+    def choice_post_data(self, single, select, multiple):
+        return {
+            'question_{}'.format(self.question1.pk): '42',
+            'question_{}'.format(self.question2.pk): 'gold',
+            'question_{}'.format(self.question_single.pk): single.pk if single else '',
+            'question_{}'.format(self.question_select.pk): select.pk if select else '',
+            'question_{}'.format(self.question_multiple.pk): [option.pk for option in multiple],
+        }
+
+    @freeze_time('2021-01-03 12:34:56')
+    def test_submit_form_choices(self):
+        self.create_choice_questions()
+        self.client.force_login(self.normal_user)
+        with freeze_time('2021-01-01 12:00:00'):
+            response = self.client.post(reverse('form', args=[self.form.name]), self.choice_post_data(
+                self.question_single_1, self.question_select_1, [self.question_multiple_1, self.question_multiple_3]))
+        self.assertRedirects(response, reverse('form', args=[self.form.name]))
+
+        single_answer = self.question_single.answers.get(user=self.normal_user)
+        select_answer = self.question_select.answers.get(user=self.normal_user)
+        multiple_answer = self.question_multiple.answers.get(user=self.normal_user)
+        self.assertEqual(single_answer.value, self.question_single_1)
+        self.assertEqual(select_answer.value, self.question_select_1)
+        self.assertSequenceEqual(multiple_answer.value, [self.question_multiple_1, self.question_multiple_3])
+
+        response = self.client.get(reverse('form', args=[self.form.name]))
+        fields = response.context['form'].fields
+        self.assertEqual(fields['question_{}'.format(self.question_single.pk)].initial, self.question_single_1)
+        self.assertSequenceEqual(fields['question_{}'.format(self.question_multiple.pk)].initial,
+                                 [self.question_multiple_1, self.question_multiple_3])
+
+        # Only the answers that changed are written
+        response = self.client.post(reverse('form', args=[self.form.name]), self.choice_post_data(
+            self.question_single_2, self.question_select_1, [self.question_multiple_3, self.question_multiple_1]))
+        self.assertRedirects(response, reverse('form', args=[self.form.name]))
+        single_answer.refresh_from_db()
+        select_answer.refresh_from_db()
+        multiple_answer.refresh_from_db()
+        self.assertEqual(single_answer.value, self.question_single_2)
+        self.assertEqual(single_answer.last_changed, datetime.datetime(2021, 1, 3, 12, 34, 56, tzinfo=pytz.utc))
+        self.assertEqual(select_answer.last_changed, datetime.datetime(2021, 1, 1, 12, 0, 0, tzinfo=pytz.utc))
+        self.assertEqual(multiple_answer.last_changed, datetime.datetime(2021, 1, 1, 12, 0, 0, tzinfo=pytz.utc))
+
+        response = self.client.post(reverse('form', args=[self.form.name]), self.choice_post_data(
+            None, None, [self.question_multiple_2]))
+        self.assertRedirects(response, reverse('form', args=[self.form.name]))
+        self.assertIsNone(self.question_single.answers.get(user=self.normal_user).value)
+        self.assertIsNone(self.question_select.answers.get(user=self.normal_user).value)
+        self.assertSequenceEqual(self.question_multiple.answers.get(user=self.normal_user).value, [self.question_multiple_2])
+
+    def test_submit_form_invalid_choice(self):
+        self.create_choice_questions()
+        self.client.force_login(self.normal_user)
+        response = self.client.post(reverse('form', args=[self.form.name]), self.choice_post_data(
+            self.question_select_1, None, [self.question_single_1]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('question_{}'.format(self.question_single.pk), response.context['form'].errors)
+        self.assertIn('question_{}'.format(self.question_multiple.pk), response.context['form'].errors)
+        self.assertFalse(self.question_single.answers.filter(user=self.normal_user).exists())
+
+    def test_submit_form_query_count(self):
+        self.create_choice_questions()
+        self.client.force_login(self.normal_user)
+
+        def submit():
+            data = self.choice_post_data(self.question_single_1, self.question_select_1, [self.question_multiple_2])
+            for question in self.form.questions.filter(data_type=FormQuestion.TYPE_STRING):
+                data['question_{}'.format(question.pk)] = 'text'
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('form', args=[self.form.name]), data)
+            self.assertRedirects(response, reverse('form', args=[self.form.name]))
+            return len(queries)
+
+        queries = submit()
+        # Neither the first submit nor an update depends on the number of questions
+        for i in range(20):
+            question = self.form.questions.create(title='Question {}'.format(i), data_type=FormQuestion.TYPE_STRING)
+            if i % 2:
+                question.answers.create(user=self.normal_user, value_string='old')
+            multiple = self.form.questions.create(title='Checkboxes {}'.format(i), data_type=FormQuestion.TYPE_MULTIPLE_CHOICE, is_required=False)
+            multiple.options.create(title='Option')
+        self.assertEqual(submit(), queries)
+
+        with CaptureQueriesContext(connection) as render_queries:
+            self.client.get(reverse('form', args=[self.form.name]))
+        for i in range(5):
+            select = self.form.questions.create(title='Select {}'.format(i), data_type=FormQuestion.TYPE_SELECT, is_required=False)
+            select.options.create(title='Option')
+        with self.assertNumQueries(len(render_queries)):
+            self.client.get(reverse('form', args=[self.form.name]))
+
     # TODO: Test is_required validation
\ No newline at end of file
@@ -1,8 +1,10 @@
+import datetime
+
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 
-from wwwforms.models import Form, FormQuestion
+from wwwforms.models import Form, FormQuestion, FormQuestionAnswer, load_answer_values, prefetch_answer_values
 
 
 class ModelChoicesTest(TestCase):
@@ -41,4 +43,58 @@ class ModelChoicesTest(TestCase):
         single_answer.value = single_question_1
 
         multiple_answer = multiple_question.answers.create(user=self.admin_user)
-        multiple_answer.value = [multiple_question_1, multiple_question_3]
\ No newline at end of file
+        multiple_answer.value = [multiple_question_1, multiple_question_3]
+
+    def test_load_answer_values(self):
+        form = Form.objects.create(name='test_form', title='Test form')
+        single_question = form.questions.create(title='Give me one', data_type=FormQuestion.TYPE_CHOICE, is_required=False)
+        single_question_1 = single_question.options.create(title='Option 1')
+        single_question.options.create(title='Option 2')
+        multiple_question = form.questions.create(title='Give me many', data_type=FormQuestion.TYPE_MULTIPLE_CHOICE, is_required=False)
+        multiple_question_1 = multiple_question.options.create(title='Option 1')
+        multiple_question.options.create(title='Option 2')
+        multiple_question_3 = multiple_question.options.create(title='Option 3')
+        number_question = form.questions.create(title='Number', data_type=FormQuestion.TYPE_NUMBER, is_required=False)
+        date_question = form.questions.create(title='Date', data_type=FormQuestion.TYPE_DATE, is_required=False)
+
+        # Answer without any option selected
+        empty_answer = single_question.answers.create(user=self.admin_user)
+        expected = {empty_answer.pk: None}
+        for i in range(3):
+            user = User.objects.create_user(username='user{}'.format(i), email='user{}@example.com'.format(i))
+            single_answer = single_question.answers.create(user=user)
+            single_answer.value = single_question_1
+            multiple_answer = multiple_question.answers.create(user=user)
+            multiple_answer.value = [multiple_question_1, multiple_question_3]
+            number_answer = number_question.answers.create(user=user, value_number=i)
+            date_answer = date_question.answers.create(user=user, value_date=datetime.date(2000, 1, i + 1))
+            expected.update({
+                single_answer.pk: 'Option 1',
+                multiple_answer.pk: ['Option 1', 'Option 3'],
+                number_answer.pk: i,
+                date_answer.pk: datetime.date(2000, 1, i + 1),
+            })
+
+        # Answers, questions, selected options
+        with self.assertNumQueries(3):
+            values = load_answer_values(FormQuestionAnswer.objects.all())
+        self.assertDictEqual(values, expected)
+
+        # The questions that are already loaded are reused
+        questions = list(form.questions.all())
+        with self.assertNumQueries(2):
+            answers = prefetch_answer_values(FormQuestionAnswer.objects.all(), questions)
+        with self.assertNumQueries(0):
+            self.assertDictEqual({answer.pk: answer.plain_value for answer in answers}, expected)
+        self.assertTrue(all(any(answer.question is question for question in questions) for answer in answers))
+
+    def test_single_choice_value_uses_prefetched_options(self):
+        form = Form.objects.create(name='test_form', title='Test form')
+        question = form.questions.create(title='Give me one', data_type=FormQuestion.TYPE_SELECT, is_required=False)
+        option = question.options.create(title='Option 1')
+        question.answers.create(user=self.admin_user).value = option
+
+        answer = FormQuestionAnswer.objects.select_related('question').prefetch_related('value_choices').get()
+        with self.assertNumQueries(0):
+            self.assertEqual(answer.value, option)
+            self.assertEqual(answer.plain_value, 'Option 1')
@@ -1,10 +1,16 @@
+from typing import List
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db.models import Exists, OuterRef, QuerySet
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
 
+from wwwapp.export import batched, streaming_csv_response
 from wwwforms.forms import FormForm
-from wwwforms.models import Form
+from wwwforms.models import Form, FormAnswerMatrix, FormQuestion, FormQuestionAnswer, answer_display_value
 
 
 @login_required()
@@ -27,30 +33,53 @@ def form_view(request, name):
     return render(request, 'form.html', context)
 
 
+FORM_RESULTS_PAGE_SIZE = 100
+FORM_RESULTS_EXPORT_BATCH_SIZE = 500
+
+
+def _form_respondents(form: Form) -> QuerySet:
+    return User.objects \
+        .filter(Exists(FormQuestionAnswer.objects.filter(question__form=form, user=OuterRef('pk')))) \
+        .order_by('last_name', 'first_name', 'pk')
+
+
 @login_required()
 @permission_required('wwwforms.see_form_results', raise_exception=True)
 def form_results_view(request, name):
-    form = get_object_or_404(Form.objects.prefetch_related('questions', 'questions__answers', 'questions__answers__user'), name=name)
-
-    all_questions = form.questions.all()
-    all_answers = [answer for question in all_questions for answer in question.answers.all()]
-    # Group the answers by users
-    user_answers = {}
-    for answer in all_answers:
-        if answer.user not in user_answers:
-            user_answers[answer.user] = []
-        user_answers[answer.user].append(answer)
-    # Make sure the user_answers array is arranged such that the answer at index i matches the question i
-    for user in user_answers.keys():
-        user_answers[user] = [next(filter(lambda a: a.question == question, user_answers[user]), None) for question in all_questions]
+    form = get_object_or_404(Form.objects.prefetch_related('questions'), name=name)
+    all_questions = list(form.questions.all())
+
+    page = Paginator(_form_respondents(form), FORM_RESULTS_PAGE_SIZE).get_page(request.GET.get('page'))
+    # All the answers on the page are loaded at once and indexed by (user, question), the answer at index i
+    # of each row matches the question i
+    form_answers = FormAnswerMatrix(all_questions, [user.id for user in page])
 
     context = {}
     context['title'] = form.title
+    context['form_name'] = form.name
     context['questions'] = all_questions
-    context['answers'] = user_answers
+    context['answers'] = {user: form_answers.row(user.id) for user in page}
+    context['page'] = page
     return render(request, 'formresults.html', context)
 
 
+def _form_results_export_rows(form: Form, questions: List[FormQuestion]):
+    yield ['Imię', 'Nazwisko', 'Email'] + [question.title for question in questions]
+    for users in batched(_form_respondents(form).iterator(), FORM_RESULTS_EXPORT_BATCH_SIZE):
+        form_answers = FormAnswerMatrix(questions, [user.id for user in users])
+        for user in users:
+            yield [user.first_name, user.last_name, user.email] + \
+                [answer_display_value(answer) for answer in form_answers.row(user.id)]
+
+
+@login_required()
+@permission_required('wwwforms.see_form_results', raise_exception=True)
+def form_results_export_view(request, name):
+    form = get_object_or_404(Form.objects.prefetch_related('questions'), name=name)
+    questions = list(form.questions.all())
+    return streaming_csv_response(_form_results_export_rows(form, questions), '{}.csv'.format(form.name))
+
+
 @login_required()
 @permission_required('wwwforms.see_form_results', raise_exception=True)
 def form_list_view(request):